@@ -3,251 +3,279 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                            QTableWidget, QTableWidgetItem, QMessageBox,
                            QComboBox, QFileDialog, QGroupBox, QDialog, QGridLayout,
                            QDateTimeEdit)
-from PyQt5.QtCore import Qt, QDateTime
+from PyQt5.QtCore import Qt, QDateTime, QThread, QTimer, pyqtSignal
 import sys
 import csv
-import pymysql
-import time
-import random
-import string
+import bisect
 import datetime
-from functools import lru_cache  # 添加缓存装饰器
-from utils.crypto import SecurityProvider
+import logging
 import hashlib
+import threading
 import requests
 import json
 import platform
 import ctypes
-import pymysql.cursors
 from utils.protection import AntiDebug  # 添加这行导入
 from utils.db_crypto import DatabaseCrypto
+from utils.card_import import CardImporter
+from utils import key_format
+from utils.changefeed import CardChangeFeed, record_change
+from utils.sweeper import ExpirySweeper, STATUS_EXPIRED
+from utils.bloom import CardKeyShield
+from utils.rate_limit import RateLimiter
+from utils.card_cache import CardInfoCache
+from utils.metrics import MetricsRegistry
+from utils.monitor import SystemMonitor
+from utils.db_executor import DBExecutor
+from utils.stall_detector import StallDetector
+from utils.log import setup_logging
+from utils.resilience import CircuitBreaker, CircuitOpen, OPEN, CLOSED, call_with_retry
+from utils.storage import get_storage
+from config import (APP_CONFIG, SWEEPER_CONFIG, BLOOM_CONFIG, CARD_CACHE_CONFIG,
+                    MONITOR_CONFIG, DB_EXECUTOR_CONFIG)
 
-class DatabaseConnection:
-    # 修改数据库配置
-    DB_CONFIG = {
-        'host': 'localhost',     # 修改为本地测试数据库
-        'user': 'root',         # 修改为测试账号
-        'password': '******',   # 修改为测试密码
-        'database': 'exam_db',  # 修改为测试数据库名
-        'port': 3306,
-        'charset': 'utf8mb4',
-        'connect_timeout': 60
-    }
-
-    _instance = None
-    _pool = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(DatabaseConnection, cls).__new__(cls)
-        return cls._instance
+logger = logging.getLogger(__name__)
 
+class CardAuth:
     def __init__(self):
-        self._pool = None
-        
-    def get_connection(self):
-        """获取数据库连接"""
-        for attempt in range(3):  # 最多重试3次
+        self.db = get_storage()
+        self.crypto = DatabaseCrypto.get_instance()
+        self.shield = CardKeyShield.get_instance()
+        self.rate_limiter = RateLimiter.get_instance()
+        self.card_cache = CardInfoCache(
+            self._load_card_info,
+            max_size=CARD_CACHE_CONFIG['max_size'],
+            ttl=CARD_CACHE_CONFIG['ttl']
+        )
+
+    def get_card_info(self, card_key):
+        """获取卡密信息（带缓存），卡密不存在时返回 None"""
+        if not self.shield.might_exist(card_key):
+            return None
+        return self.card_cache.get(card_key)
+
+    @SystemMonitor.performance_monitor(threshold=0.5)
+    def _load_card_info(self, card_key):
+        """从数据库读取卡密信息"""
+        info = None
+        db = self.db.shard(card_key)
+        while db is not None and info is None:
+            connection = db.get_connection()
             try:
-                conn = pymysql.connect(
-                    cursorclass=pymysql.cursors.DictCursor,
-                    **self.DB_CONFIG
-                )
-                return conn
-            except Exception as e:
-                if attempt == 2:  # 最后一次尝试
-                    raise e
-                time.sleep(1)  # 等待1秒后重试
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT id, valid_days, create_time, status, use_time,
+                               device_id, device_id_enc, bind_time, expiry_time
+                        FROM card_keys 
+                        WHERE card_key = %s
+                    """, (self.crypto.card_key(card_key),))
+                    info = cursor.fetchone()
+                    if info is not None:
+                        self.crypto.decrypt_rows([info])
+            finally:
+                connection.close()
+            if info is None:
+                # 重新分片期间可能刚被迁走，到重新解析的分片上再查
+                db = self.db.reroute(card_key, db)
+        if info is None and not self.db.is_moving(card_key):
+            self.shield.remember_missing(card_key)
+        return info
 
-    def close(self):
-        """关闭连接"""
-        try:
-            if hasattr(self, '_connection') and self._connection:
-                self._connection.close()
-                self._connection = None
-        except Exception as e:
-            print(f"关闭连接错误: {str(e)}")
+    @staticmethod
+    def remaining_days(info):
+        """计算剩余天数（已使用的卡密从使用时间起算）"""
+        if info['status'] == 1 and info['use_time']:
+            expiry_time = info['use_time'] + datetime.timedelta(days=info['valid_days'])
+            return max(0, (expiry_time.date() - datetime.date.today()).days)
+        return info['valid_days']
 
-class EncryptedCursor:
-    def __init__(self, cursor, crypto):
-        self._cursor = cursor
-        self._crypto = crypto
-        
-    def execute(self, query, args=None):
-        return self._cursor.execute(query, args)
-        
-    def fetchone(self):
-        result = self._cursor.fetchone()
-        return result
+    @SystemMonitor.performance_monitor(threshold=1.0)
+    def verify_card(self, card_key, device_id=None):
+        """验证卡密"""
+        # 格式不对的卡密在本地就能发现，不消耗限流令牌，也不访问过滤器和数据库
+        card_key = key_format.normalize(card_key)
+        reason = key_format.check(card_key)
+        if reason:
+            return False, f"卡密{reason}，请检查输入", None
 
-    def fetchall(self):
-        return self._cursor.fetchall()
-        
-    def __getattr__(self, name):
-        return getattr(self._cursor, name)
+        # 按规范写法限流，大小写、连字符不同的输入共用一个令牌桶
+        retry_after = self.rate_limiter.check('verify', device_id, card_key)
+        if retry_after > 0:
+            return False, f"操作过于频繁，请 {retry_after:.0f} 秒后再试", None
+            
+        # 过滤器确定不存在的卡密不访问数据库
+        if not self.shield.might_exist(card_key):
+            return False, "无效的卡密", None
+            
+        # 只有连接类错误重试（事务随连接断开回滚）；熔断期间立即返回
+        try:
+            return call_with_retry(
+                lambda deadline: self._verify_card_once(card_key, device_id, deadline),
+                retry_on=self.db.CONNECTION_ERRORS
+            )
+        except CircuitOpen as e:
+            return False, f"数据库暂时不可用，请 {e.retry_after:.0f} 秒后再试", None
+        except Exception as e:
+            logger.error(f"验证卡密错误: {str(e)}")
+            return False, f"验证失败: {str(e)}", None
 
-class CardAuth:
-    def __init__(self):
-        self.db = DatabaseConnection()
-        self._retry_count = 3
-        self._retry_delay = 1
-
-    @lru_cache(maxsize=128)  # 添加缓存，最多缓存128个结果
-    def _get_card_info(self, card_key):
-        """获取卡密信息（带缓存）"""
-        with self.db.get_connection() as conn:
+    def _verify_card_once(self, card_key, device_id, deadline, db=None):
+        """在一个事务中验证并激活卡密；db 为要查询的分片，缺省时按卡密解析"""
+        db = db or self.db.shard(card_key)
+        with db.get_connection(deadline) as conn:
             with conn.cursor() as cursor:
+                # 首先检查表是否存在
+                cursor.execute("""
+                    SELECT COUNT(*) as table_exists 
+                    FROM information_schema.tables 
+                    WHERE table_schema = %s 
+                    AND table_name = 'card_keys'
+                """, (db.DB_CONFIG['database'],))
+                
+                if cursor.fetchone()['table_exists'] == 0:
+                    return False, "系统未初始化，请联系管理员", None
+
+                # 使用事务确保数据一致性
+                cursor.execute("START TRANSACTION")
+                
+                # 使用 SELECT FOR UPDATE 锁定行
                 cursor.execute("""
                     SELECT id, valid_days, create_time, status, use_time, device_id
                     FROM card_keys 
                     WHERE card_key = %s
-                """, (card_key,))
-                return cursor.fetchone()
-
-    def verify_card(self, card_key, device_id=None):
-        """验证卡密"""
-        for attempt in range(self._retry_count):
-            try:
-                with self.db.get_connection() as conn:
-                    with conn.cursor() as cursor:
-                        # 首先检查表是否存在
-                        cursor.execute("""
-                            SELECT COUNT(*) as table_exists 
-                            FROM information_schema.tables 
-                            WHERE table_schema = %s 
-                            AND table_name = 'card_keys'
-                        """, (self.db.DB_CONFIG['database'],))
-                        
-                        if cursor.fetchone()['table_exists'] == 0:
-                            return False, "系统未初始化，请联系管理员", None
-
-                        # 使用事务确保数据一致性
-                        cursor.execute("START TRANSACTION")
-                        
-                        # 使用 SELECT FOR UPDATE 锁定行
-                        cursor.execute("""
-                            SELECT id, valid_days, create_time, status, use_time, device_id
-                            FROM card_keys 
-                            WHERE card_key = %s
-                            FOR UPDATE
-                        """, (card_key,))
-                        
-                        result = cursor.fetchone()
-                        
-                        if not result:
+                    FOR UPDATE
+                """, (self.crypto.card_key(card_key),))
+                
+                result = cursor.fetchone()
+                
+                if not result:
+                    cursor.execute("ROLLBACK")
+                    # 重新分片期间可能刚被迁走，到重新解析的分片上再查
+                    retry = self.db.reroute(card_key, db)
+                    if retry is not None:
+                        return self._verify_card_once(card_key, device_id, deadline, retry)
+                    if not self.db.is_moving(card_key):
+                        self.shield.remember_missing(card_key)
+                    return False, "无效的卡密", None
+                    
+                card_id = result['id']
+                valid_days = result['valid_days']
+                status = result['status']
+                use_time = result['use_time']
+                bound_device = result['device_id']
+                
+                if status == STATUS_EXPIRED:
+                    cursor.execute("ROLLBACK")
+                    return False, "卡密已过期", None
+                
+                if status == 1:
+                    # 检查机器码
+                    if device_id:
+                        if bound_device and bound_device != self.crypto.device_id(device_id):
                             cursor.execute("ROLLBACK")
-                            return False, "无效的卡密", None
-                            
-                        card_id = result['id']
-                        valid_days = result['valid_days']
-                        status = result['status']
-                        use_time = result['use_time']
-                        bound_device = result['device_id']
-                        
-                        if status == 1:
-                            # 检查机器码
-                            if device_id:
-                                if bound_device and bound_device != device_id:
-                                    cursor.execute("ROLLBACK")
-                                    return False, "卡密已绑定其他机器", None
-                                elif not bound_device:
-                                    # 绑定新机器码
-                                    cursor.execute("""
-                                        UPDATE card_keys 
-                                        SET device_id = %s, bind_time = NOW() 
-                                        WHERE id = %s
-                                    """, (device_id, card_id))
-                        
-                            if use_time:
-                                expiry_time = use_time + datetime.timedelta(days=valid_days)
-                                if datetime.datetime.now() > expiry_time:
-                                    cursor.execute("ROLLBACK")
-                                    return False, "卡密已过期", None
-                                cursor.execute("COMMIT")
-                                return True, "卡密验证成功", expiry_time
+                            return False, "卡密已绑定其他机器", None
+                        elif not bound_device:
+                            # 绑定新机器码
+                            cursor.execute("""
+                                UPDATE card_keys 
+                                SET device_id = %s, device_id_enc = %s, bind_time = NOW() 
+                                WHERE id = %s
+                            """, (self.crypto.device_id(device_id),
+                                  self.crypto.encrypt('device_id', device_id), card_id))
+                
+                    if use_time:
+                        expiry_time = use_time + datetime.timedelta(days=valid_days)
+                        if datetime.datetime.now() > expiry_time:
                             cursor.execute("ROLLBACK")
-                            return False, "卡密状态异常", None
-                        
-                        # 首次使用卡密
-                        now = datetime.datetime.now()
-                        update_sql = """UPDATE card_keys 
-                                   SET status = 1, use_time = NOW(),
-                                       device_id = %s, bind_time = NOW()
-                                   WHERE id = %s"""
-                        cursor.execute(update_sql, (device_id, card_id))
-                        
-                        # 提交事务
+                            return False, "卡密已过期", None
                         cursor.execute("COMMIT")
-                        
-                        expiry_time = now + datetime.timedelta(days=valid_days)
-                        return True, "卡密激活成功", expiry_time
-                        
-            except Exception as e:
-                if attempt < self._retry_count - 1:
-                    time.sleep(self._retry_delay)
-                    continue
-                print(f"验证卡密错误: {str(e)}")
-                return False, f"验证失败: {str(e)}", None
+                        self.card_cache.invalidate(card_key)
+                        return True, "卡密验证成功", expiry_time
+                    cursor.execute("ROLLBACK")
+                    return False, "卡密状态异常", None
+                
+                # 首次使用卡密
+                now = datetime.datetime.now()
+                update_sql = """UPDATE card_keys 
+                           SET status = 1, use_time = NOW(),
+                               device_id = %s, device_id_enc = %s, bind_time = NOW()
+                           WHERE id = %s"""
+                cursor.execute(update_sql, (self.crypto.device_id(device_id),
+                                            self.crypto.encrypt('device_id', device_id), card_id))
+                
+                # 提交事务
+                cursor.execute("COMMIT")
+                self.card_cache.invalidate(card_key)
+                
+                expiry_time = now + datetime.timedelta(days=valid_days)
+                return True, "卡密激活成功", expiry_time
 
-    def generate_cards(self, days, count=1):
-        """批量生成卡密"""
+    def generate_cards(self, days, count=1, prefix=None):
+        """批量生成卡密，同一批共用一个前缀（缺省时随机）"""
         try:
-            with self.db.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    card_keys = []
-                    for _ in range(count):
-                        while True:
-                            card_key = self._generate_random_key()
-                            cursor.execute(
-                                "SELECT 1 FROM card_keys WHERE card_key = %s", 
-                                (card_key,)
-                            )
-                            if not cursor.fetchone():
-                                break
-                        
-                        cursor.execute("""
-                            INSERT INTO card_keys 
-                            (card_key, valid_days, create_time, status) 
-                            VALUES (%s, %s, NOW(), 0)
-                        """, (card_key, days))
-                        card_keys.append(card_key)
-                    
-                    conn.commit()
-                    return card_keys
+            prefix = prefix or key_format.new_prefix()
+            card_keys = []
+            # 按所在分片分组插入，与已有卡密重复的重新生成
+            while len(card_keys) < count:
+                candidates = [self._generate_random_key(prefix) for _ in range(count - len(card_keys))]
+                for db, keys in self.db.group(candidates):
+                    with db.get_connection() as conn:
+                        with conn.cursor() as cursor:
+                            for card_key, key_index, key_enc in zip(
+                                    keys, self.crypto.index_many('card_key', keys),
+                                    self.crypto.encrypt_many('card_key', keys)):
+                                cursor.execute(
+                                    "SELECT 1 FROM card_keys WHERE card_key = %s", 
+                                    (key_index,)
+                                )
+                                if cursor.fetchone():
+                                    continue
+                                
+                                cursor.execute("""
+                                    INSERT INTO card_keys 
+                                    (card_key, card_key_enc, valid_days, create_time, status, expiry_time) 
+                                    VALUES (%s, %s, %s, NOW(), 0, DATE_ADD(NOW(), INTERVAL %s DAY))
+                                """, (key_index, key_enc, days, days))
+                                card_keys.append(card_key)
+                        conn.commit()
+            
+            self.shield.add(card_keys)
+            return card_keys
                     
         except Exception as e:
-            print(f"批量生成卡密错误: {str(e)}")
+            logger.error(f"批量生成卡密错误: {str(e)}")
             return []
 
-    def _generate_random_key(self, length=16):
-        """生成随机卡密"""
-        characters = string.ascii_letters + string.digits
-        return ''.join(random.choice(characters) for _ in range(length))
+    def _generate_random_key(self, prefix=None):
+        """生成带校验位的卡密"""
+        return key_format.generate(prefix)
 
     def delete_card(self, card_key):
         """删除卡密"""
-        connection = self.db.get_connection()
+        connection = self.db.shard(card_key).get_connection()
         if not connection:
             return False, "数据库连接失败"
         
         try:
             with connection.cursor() as cursor:
-                cursor.execute("DELETE FROM card_keys WHERE card_key = %s", (card_key,))
+                cursor.execute("DELETE FROM card_keys WHERE card_key = %s", (self.crypto.card_key(card_key),))
                 if cursor.rowcount > 0:
+                    record_change(cursor, card_key, 'delete')
                     connection.commit()
+                    self.card_cache.invalidate(card_key)
                     return True, "卡密删除成功"
                 return False, "卡密不存在"
             
         except Exception as e:
-            print(f"删除卡密错误: {str(e)}")
+            logger.error(f"删除卡密错误: {str(e)}")
             return False, f"删除失败: {str(e)}"
         
         finally:
-            pass  # 不在这里关闭连接
+            connection.close()
 
     def edit_card(self, card_key, valid_days=None, status=None, use_time=None):
         """编辑卡密"""
-        connection = self.db.get_connection()
+        connection = self.db.shard(card_key).get_connection()
         if not connection:
             return False, "数据库连接失败"
         
@@ -266,14 +294,11 @@ class CardAuth:
                         updates.extend([
                             "use_time = NULL",
                             "device_id = NULL",
+                            "device_id_enc = NULL",
                             "bind_time = NULL"
                         ])
                         # 添加状态变更记录
-                        cursor.execute("""
-                            INSERT INTO card_status_change 
-                            (card_key, change_type, change_time) 
-                            VALUES (%s, 'reset', NOW())
-                        """, (card_key,))
+                        record_change(cursor, card_key, 'reset')
                     elif use_time is not None:
                         updates.append("use_time = %s")
                         params.append(use_time)
@@ -281,21 +306,43 @@ class CardAuth:
                 if not updates:
                     return False, "没有需要更新的内容"
                     
-                params.append(card_key)
+                params.append(self.crypto.card_key(card_key))
                 sql = f"UPDATE card_keys SET {', '.join(updates)} WHERE card_key = %s"
                 cursor.execute(sql, params)
                 
                 if cursor.rowcount > 0:
                     connection.commit()
+                    self.card_cache.invalidate(card_key)
                     return True, "卡密更新成功"
                 return False, "卡密不存在"
                 
         except Exception as e:
-            print(f"编辑卡密错误: {str(e)}")
+            logger.error(f"编辑卡密错误: {str(e)}")
             return False, f"编辑失败: {str(e)}"
             
         finally:
-            pass  # 在这里关闭连接
+            connection.close()
+
+class ImportWorker(QThread):
+    """后台导入卡密线程"""
+    progress = pyqtSignal(int, int)
+    succeeded = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db, file_path, default_days, parent=None):
+        super().__init__(parent)
+        self.importer = CardImporter(db, shield=CardKeyShield.get_instance())
+        self.file_path = file_path
+        self.default_days = default_days
+
+    def run(self):
+        try:
+            result = self.importer.import_file(
+                self.file_path, self.default_days, self.progress.emit
+            )
+            self.succeeded.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
 
 class LoginDialog(QDialog):
     def __init__(self, parent=None):
@@ -367,13 +414,41 @@ class LoginDialog(QDialog):
             self.password_input.clear()
 
 class AdminPanel(QMainWindow):
+    # 一次同步中新增行超过该数量时改为全量刷新
+    SYNC_RELOAD_THRESHOLD = 200
+    # 熔断状态变化（名称, 新状态），可能从工作线程发出
+    breaker_changed = pyqtSignal(str, str)
+
     def __init__(self):
         super().__init__()
         self.auth = CardAuth()
+        # 全量刷新读副本（配置了副本时），增量同步、写入和 FOR UPDATE 走主库
+        self.feed = CardChangeFeed(self.auth.db, snapshot_db=self.auth.db.reader())
+        
+        # 表格行索引：卡密 -> 行号 / 版本 / 状态
+        self.row_index = {}
+        self.row_versions = {}
+        self.row_status = {}
+        
+        # 数据库查询在线程池中执行，界面线程只处理结果
+        self.db_executor = DBExecutor.get_instance()
+        self._reload_pending = None  # 同步期间收到的全量刷新请求（是否提示）
+        self.stall_detector = None
+        if DB_EXECUTOR_CONFIG['stall_detector']:
+            self.stall_detector = StallDetector(parent=self)
+            self.stall_detector.start()
         
         # 先初始化UI
         self.init_ui()
         
+        # 数据库熔断期间在状态栏显示降级提示
+        self.degraded_label = QLabel('数据库不可用，正在自动重试')
+        self.degraded_label.setStyleSheet('color: #F56C6C; padding: 0 8px;')
+        self.degraded_label.hide()
+        self.statusBar().addPermanentWidget(self.degraded_label)
+        self.breaker_changed.connect(self.on_breaker_changed)
+        CircuitBreaker.watch(lambda name, old, new: self.breaker_changed.emit(name, new))
+        
         # 显示登录对话框
         login_dialog = LoginDialog(self)
         if login_dialog.exec_() != QDialog.Accepted:
@@ -382,6 +457,29 @@ class AdminPanel(QMainWindow):
         # 登录成功后更新数据
         self.update_database()
         
+        # 定时拉取其他管理员/客户端产生的变更
+        self.sync_timer = QTimer(self)
+        self.sync_timer.timeout.connect(self.poll_changes)
+        self.sync_timer.start(APP_CONFIG['admin']['sync_interval'])
+        
+        # 后台重建卡密布隆过滤器
+        self.rebuild_card_filter()
+        self.filter_timer = QTimer(self)
+        self.filter_timer.timeout.connect(self.rebuild_card_filter)
+        self.filter_timer.start(BLOOM_CONFIG['rebuild_interval'] * 1000)
+        
+        # 后台分批清理过期卡密
+        self.sweeper = ExpirySweeper.from_config(self.auth.db, SWEEPER_CONFIG,
+                                                 on_change=self.auth.card_cache.clear)
+        if SWEEPER_CONFIG['enabled']:
+            self.sweeper.start()
+        
+        # 本地指标服务
+        MetricsRegistry.get_instance().register_gauges('card_cache', self.auth.card_cache.stats)
+        self.monitor = SystemMonitor(db=self.auth.db)
+        if MONITOR_CONFIG['enabled']:
+            self.monitor.start(MONITOR_CONFIG['admin_port'])
+        
         # 显示主窗口
         self.show()
 
@@ -480,14 +578,18 @@ class AdminPanel(QMainWindow):
         self.count_input.setFixedWidth(100)
         gen_layout.addWidget(self.count_input)
         
-        gen_btn = QPushButton('生成卡密')
-        gen_btn.clicked.connect(self.generate_cards)
-        gen_layout.addWidget(gen_btn)
+        self.gen_btn = QPushButton('生成卡密')
+        self.gen_btn.clicked.connect(self.generate_cards)
+        gen_layout.addWidget(self.gen_btn)
         
         export_btn = QPushButton('导出卡密')
         export_btn.clicked.connect(self.export_cards)
         gen_layout.addWidget(export_btn)
         
+        self.import_btn = QPushButton('导入卡密')
+        self.import_btn.clicked.connect(self.import_cards)
+        gen_layout.addWidget(self.import_btn)
+        
         gen_layout.addStretch()
         gen_group.setLayout(gen_layout)
         layout.addWidget(gen_group)
@@ -686,91 +788,210 @@ class AdminPanel(QMainWindow):
             }
         """)
 
+    def rebuild_card_filter(self):
+        """在后台线程中重建卡密布隆过滤器"""
+        def rebuild():
+            try:
+                self.auth.shield.rebuild(self.auth.db)
+            except Exception as e:
+                logger.error(f"重建卡密过滤器失败: {str(e)}")
+        threading.Thread(target=rebuild, daemon=True).start()
+
+    def closeEvent(self, event):
+        """关闭窗口时停止后台清理、指标服务和数据库任务"""
+        self.sweeper.stop(timeout=5)
+        self.monitor.stop()
+        self.db_executor.shutdown()
+        if self.stall_detector:
+            self.stall_detector.stop()
+        super().closeEvent(event)
+
+    def on_breaker_changed(self, name, state):
+        """数据库熔断时显示降级提示，恢复后立即同步一次"""
+        if name.startswith('mysql_replica'):
+            return  # 只读副本熔断时读取自动退回主库
+        if state == OPEN:
+            self.degraded_label.show()
+        elif state == CLOSED and self.degraded_label.isVisible():
+            self.degraded_label.hide()
+            self.statusBar().showMessage('数据库连接已恢复', 3000)
+            self.poll_changes()
+
     def create_button_handler(self, func, card_key):
         def handler():
             func(card_key)
         return handler
 
-    def update_database(self):
-        """更新数据显示"""
-        try:
-            connection = self.auth.db.get_connection()
-            if not connection:
-                QMessageBox.warning(self, '错误', '数据库连接失败')
-                return
+    def update_database(self, notify=False):
+        """全量更新数据显示（在后台读取，读取完成后填充表格）"""
+        # 增量同步进行中时等它结束再读，两者共用变更游标
+        if self.db_executor.in_flight('feed'):
+            self._reload_pending = bool(self._reload_pending or notify)
+            return
+        self.db_executor.submit(
+            self.feed.snapshot, key='feed',
+            timeout=0,  # 全量读取耗时与卡密数量有关，不设超时
+            on_success=lambda cards: self.on_snapshot(cards, notify),
+            on_error=self.on_snapshot_failed
+        )
 
-            with connection.cursor() as cursor:
-                # 修改卡密列表显示
-                cursor.execute("""
-                    SELECT 
-                        card_key, 
-                        valid_days, 
-                        create_time,
-                        CASE 
-                            WHEN status = 1 THEN '已使用'
-                            WHEN expiry_time < NOW() THEN '已过期'
-                            ELSE '未使用'
-                        END as status,
-                        use_time,
-                        CASE 
-                            WHEN expiry_time < NOW() THEN 0
-                            ELSE DATEDIFF(expiry_time, NOW())
-                        END as remaining_days,
-                        COALESCE(device_id, '-') as device_id,
-                        bind_time
-                    FROM card_keys 
-                    ORDER BY create_time DESC
-                """)
-                
-                cards = cursor.fetchall()
-                
-                # 更新表格显示
-                self.table.setRowCount(len(cards))
-                for row, card in enumerate(cards):
-                    self.table.setItem(row, 0, QTableWidgetItem(card['card_key']))
-                    self.table.setItem(row, 1, QTableWidgetItem(str(card['valid_days'])))
-                    self.table.setItem(row, 2, QTableWidgetItem(str(card['create_time'])))
-                    self.table.setItem(row, 3, QTableWidgetItem(card['status']))
-                    self.table.setItem(row, 4, QTableWidgetItem(str(card['use_time'] or '-')))
-                    self.table.setItem(row, 5, QTableWidgetItem(str(card['remaining_days'])))
-                    self.table.setItem(row, 6, QTableWidgetItem(card['device_id']))
-                    self.table.setItem(row, 7, QTableWidgetItem(str(card['bind_time'] or '-')))
-                    
-                # 更新统计信息
-                cursor.execute("SELECT COUNT(*) as total FROM card_keys")
-                total = cursor.fetchone()['total']
-                
-                cursor.execute("""
-                    SELECT COUNT(*) as used 
-                    FROM card_keys 
-                    WHERE status = 1
-                """)
-                used = cursor.fetchone()['used']
-                
-                self.stats_labels['总数'].setText(f"总数: {total}")
-                self.stats_labels['已用'].setText(f"已用: {used}")
-                self.stats_labels['未用'].setText(f"未用: {total - used}")
-                
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'更新数据显示失败: {str(e)}')
+    def on_snapshot(self, cards, notify=False):
+        """全量数据读取完成"""
+        if self._run_pending_reload():
+            return
+        
+        # 更新表格显示
+        self.table.setRowCount(len(cards))
+        self.row_index = {}
+        self.row_versions = {}
+        self.row_status = {}
+        for row, card in enumerate(cards):
+            self._set_row(row, card)
+            
+        self.update_stats()
+        self.filter_table()
+        if notify:
+            self.statusBar().showMessage('数据刷新成功', 3000)
+
+    def on_snapshot_failed(self, error):
+        self._run_pending_reload()
+        if isinstance(error, CircuitOpen):
+            QMessageBox.warning(self, '提示', f'数据库暂时不可用，请 {error.retry_after:.0f} 秒后再试')
+            return
+        QMessageBox.critical(self, '错误', f'更新数据显示失败: {str(error)}')
+
+    def _run_pending_reload(self):
+        """同步期间有全量刷新请求时立即执行，返回是否已执行"""
+        if self._reload_pending is None:
+            return False
+        notify, self._reload_pending = self._reload_pending, None
+        self.update_database(notify)
+        return True
+
+    def poll_changes(self):
+        """增量同步：只拉取游标之后变化的卡密并原地更新表格"""
+        if self.db_executor.in_flight('feed'):
+            return
+        self.db_executor.submit(
+            self.feed.poll, key='feed',
+            on_success=self.on_changes,
+            on_error=self.on_poll_failed
+        )
+
+    def on_changes(self, result):
+        """增量数据读取完成"""
+        if self._run_pending_reload():
+            return
+        changed, removed = result
+        if changed is None or not self.apply_changes(changed, removed):
+            self.update_database()
+
+    def on_poll_failed(self, error):
+        if self._run_pending_reload():
+            return
+        # 熔断期间已显示降级提示；定时任务不弹窗，避免打断操作
+        if isinstance(error, CircuitOpen):
+            return
+        logger.error(f"同步卡密变更失败: {str(error)}")
+        self.statusBar().showMessage(f'同步卡密变更失败: {str(error)}', 5000)
+
+    def apply_changes(self, changed, removed):
+        """把变更合并进表格，新增行过多时返回 False 由调用方全量刷新"""
+        # 其他管理员或客户端修改过的卡密，本地缓存一并失效
+        self.auth.card_cache.invalidate(*(card['card_key'] for card in changed), *removed)
+        
+        new_cards = [card for card in changed if card['card_key'] not in self.row_index]
+        if len(new_cards) > self.SYNC_RELOAD_THRESHOLD:
+            return False
+        
+        self.table.setUpdatesEnabled(False)
+        try:
+            # 先删除、插入，最后一次性重算行号（逐行平移是 O(变化数 × 行数)）
+            removed_rows = []
+            for card_key in removed:
+                row = self.row_index.pop(card_key, None)
+                if row is None:
+                    continue
+                removed_rows.append(row)
+                self.row_versions.pop(card_key, None)
+                self.row_status.pop(card_key, None)
+            removed_rows.sort()
+            for row in reversed(removed_rows):
+                self.table.removeRow(row)
+            
+            if removed_rows or new_cards:
+                self.row_index = {
+                    key: index - bisect.bisect_left(removed_rows, index) + len(new_cards)
+                    for key, index in self.row_index.items()
+                }
+            
+            # 新卡密创建时间最晚，插到表格顶部
+            for _ in new_cards:
+                self.table.insertRow(0)
+            for row, card in enumerate(new_cards):
+                self._set_row(row, card)
+                self._filter_row(row)
+            
+            for card in changed:
+                row = self.row_index[card['card_key']]
+                if self.row_versions.get(card['card_key']) == card['version']:
+                    continue
+                self._set_row(row, card)
+                self._filter_row(row)
         finally:
-            if connection:
-                connection.close()
+            self.table.setUpdatesEnabled(True)
+        
+        self.update_stats()
+        return True
+
+    def _set_row(self, row, card):
+        """填充表格的一行"""
+        self.table.setItem(row, 0, QTableWidgetItem(card['card_key']))
+        self.table.setItem(row, 1, QTableWidgetItem(str(card['valid_days'])))
+        self.table.setItem(row, 2, QTableWidgetItem(str(card['create_time'])))
+        self.table.setItem(row, 3, QTableWidgetItem(card['status']))
+        self.table.setItem(row, 4, QTableWidgetItem(str(card['use_time'] or '-')))
+        self.table.setItem(row, 5, QTableWidgetItem(str(card['remaining_days'])))
+        self.table.setItem(row, 6, QTableWidgetItem(card['device_id']))
+        self.table.setItem(row, 7, QTableWidgetItem(str(card['bind_time'] or '-')))
+        
+        self.row_index[card['card_key']] = row
+        self.row_versions[card['card_key']] = card['version']
+        self.row_status[card['card_key']] = card['status']
+
+    def update_stats(self):
+        """根据表格数据更新统计信息"""
+        total = len(self.row_status)
+        used = expired = 0
+        for status in self.row_status.values():
+            if status == '已使用':
+                used += 1
+            elif status == '已过期':
+                expired += 1
+        
+        self.stats_labels['总数'].setText(f"总数: {total}")
+        self.stats_labels['已用'].setText(f"已用: {used}")
+        self.stats_labels['未用'].setText(f"未用: {total - used}")
+        self.stats_labels['已过期'].setText(f"已过期: {expired}")
 
     def filter_table(self):
         """筛选表格内容"""
+        for row in range(self.table.rowCount()):
+            self._filter_row(row)
+
+    def _filter_row(self, row):
+        """按搜索条件显示/隐藏一行"""
         search_text = self.search_input.text().lower()
         status_filter = self.status_filter.currentText()
         
-        for row in range(self.table.rowCount()):
-            card_key = self.table.item(row, 0).text().lower()
-            status = self.table.item(row, 3).text()
-            
-            # 检查是否匹配搜索条件
-            matches_search = search_text in card_key
-            matches_status = status_filter == '全部' or status == status_filter
-            
-            self.table.setRowHidden(row, not (matches_search and matches_status))
+        card_key = self.table.item(row, 0).text().lower()
+        status = self.table.item(row, 3).text()
+        
+        # 检查是否匹配搜索条件
+        matches_search = search_text in card_key
+        matches_status = status_filter == '全部' or status == status_filter
+        
+        self.table.setRowHidden(row, not (matches_search and matches_status))
 
     def export_cards(self):
         """导出卡密"""
@@ -802,162 +1023,174 @@ class AdminPanel(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, '错误', f'导出卡密失败: {str(e)}')
 
+    def import_cards(self):
+        """导入外部卡密（CSV：卡密[,有效期]）"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "导入卡密", "", "CSV Files (*.csv *.txt);;All Files (*)"
+        )
+        if not file_path:
+            return
+
+        # 文件中未写有效期的卡密使用输入框中的天数
+        default_days = None
+        if self.days_input.text().strip():
+            try:
+                default_days = int(self.days_input.text())
+            except ValueError:
+                QMessageBox.warning(self, '错误', '请输入有效的数字')
+                return
+
+        self.import_btn.setEnabled(False)
+        self.statusBar().showMessage('正在导入卡密...')
+
+        self.import_worker = ImportWorker(self.auth.db, file_path, default_days, self)
+        self.import_worker.progress.connect(self.on_import_progress)
+        self.import_worker.succeeded.connect(self.on_import_finished)
+        self.import_worker.failed.connect(self.on_import_failed)
+        self.import_worker.start()
+
+    def on_import_progress(self, done, total):
+        """导入进度"""
+        self.statusBar().showMessage(f'正在导入卡密... {done}/{total}')
+
+    def on_import_finished(self, result):
+        """导入完成"""
+        self.import_btn.setEnabled(True)
+        self.statusBar().clearMessage()
+
+        message = (f"导入完成（{result['method']}，耗时 {result['elapsed']:.1f} 秒）\n"
+                   f"成功导入: {result['inserted']}\n"
+                   f"已存在: {result['existing']}\n"
+                   f"格式错误/重复: {result['rejected']}")
+        if result['reject_file']:
+            message += f"\n被拒绝的卡密已写入: {result['reject_file']}"
+        QMessageBox.information(self, '成功', message)
+        self.update_database()
+
+    def on_import_failed(self, error):
+        """导入失败"""
+        self.import_btn.setEnabled(True)
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, '错误', f'导入卡密失败: {error}')
+
     def generate_cards(self):
         """生成卡密"""
         try:
             days = int(self.days_input.text())
             count = int(self.count_input.text())
-            
-            if days <= 0 or count <= 0:
-                QMessageBox.warning(self, '错误', '有效期和数量必须大于0')
-                return
-                
-            connection = self.auth.db.get_connection()
-            if not connection:
-                QMessageBox.warning(self, '错误', '数据库连接失败')
-                return
-
-            with connection.cursor() as cursor:
-                for i in range(count):
-                    while True:
-                        # 生成16位随机卡密
-                        card_key = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
-                        cursor.execute(
-                            "SELECT 1 FROM card_keys WHERE card_key = %s", 
-                            (card_key,)
-                        )
-                        if not cursor.fetchone():
-                            break
-                    
-                    # 修改SQL语句，添加expiry_time字段
-                    cursor.execute("""
-                        INSERT INTO card_keys 
-                        (card_key, valid_days, create_time, status, expiry_time) 
-                        VALUES (%s, %s, NOW(), 0, DATE_ADD(NOW(), INTERVAL %s DAY))
-                    """, (card_key, days, days))
-                
-                connection.commit()
-                QMessageBox.information(self, '成功', f'成功生成{count}个卡密')
-                self.update_database()
-                
         except ValueError:
             QMessageBox.warning(self, '错误', '请输入有效的数字')
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'生成卡密失败: {str(e)}')
-        finally:
-            if connection:
-                connection.close()
+            return
+            
+        if days <= 0 or count <= 0:
+            QMessageBox.warning(self, '错误', '有效期和数量必须大于0')
+            return
+        
+        self.gen_btn.setEnabled(False)
+        self.statusBar().showMessage(f'正在生成{count}个卡密...')
+        self.db_executor.submit(
+            self._generate_cards_task, days, count,
+            timeout=0,  # 大批量生成耗时与数量有关，不设超时
+            on_success=self.on_cards_generated,
+            on_error=self.on_generate_failed
+        )
+
+    def _generate_cards_task(self, days, count):
+        """在工作线程中生成卡密"""
+        card_keys = self.auth.generate_cards(days, count)
+        if not card_keys:
+            raise RuntimeError('写入数据库失败，详见日志')
+        return card_keys
+
+    def on_cards_generated(self, card_keys):
+        self.gen_btn.setEnabled(True)
+        self.statusBar().clearMessage()
+        QMessageBox.information(self, '成功', f'成功生成{len(card_keys)}个卡密')
+        self.poll_changes()
+
+    def on_generate_failed(self, error):
+        self.gen_btn.setEnabled(True)
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, '错误', f'生成卡密失败: {str(error)}')
 
     def delete_card(self, card_key):
         """删除卡密"""
-        try:
-            reply = QMessageBox.question(self, '确认', 
-                                       f'确定要删除卡密 {card_key} 吗？',
-                                       QMessageBox.Yes | QMessageBox.No)
-            
-            if reply == QMessageBox.Yes:
-                success, message = self.auth.delete_card(card_key)
-                if success:
-                    QMessageBox.information(self, '成功', message)
-                    self.update_database()
-                else:
-                    QMessageBox.warning(self, '错误', message)
-                    
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'删除卡密失败: {str(e)}')
+        reply = QMessageBox.question(self, '确认', 
+                                   f'确定要删除卡密 {card_key} 吗？',
+                                   QMessageBox.Yes | QMessageBox.No)
+        
+        if reply == QMessageBox.Yes:
+            self.db_executor.submit(
+                self.auth.delete_card, card_key, key=('delete', card_key),
+                on_success=self.on_card_action_done,
+                on_error=lambda error: QMessageBox.critical(self, '错误', f'删除卡密失败: {str(error)}')
+            )
+
+    def on_card_action_done(self, result):
+        """删除/编辑/解绑完成，result 为 (是否成功, 提示)"""
+        success, message = result
+        if success:
+            QMessageBox.information(self, '成功', message)
+            self.poll_changes()
+        else:
+            QMessageBox.warning(self, '错误', message)
 
     def unbind_device(self, card_key):
         """解绑机器码"""
-        try:
-            reply = QMessageBox.question(
-                self, '确认', 
-                f'确定要解绑卡密 {card_key} 的机器码吗？\n解绑后不会重置卡密状态和时间。',
-                QMessageBox.Yes | QMessageBox.No
+        reply = QMessageBox.question(
+            self, '确认', 
+            f'确定要解绑卡密 {card_key} 的机器码吗？\n解绑后不会重置卡密状态和时间。',
+            QMessageBox.Yes | QMessageBox.No
+        )
+        
+        if reply == QMessageBox.Yes:
+            self.db_executor.submit(
+                self._unbind_device_task, card_key, key=('unbind', card_key),
+                on_success=self.on_card_action_done,
+                on_error=self.on_unbind_failed
             )
-            
-            if reply == QMessageBox.Yes:
-                connection = self.auth.db.get_connection()
-                if not connection:
-                    QMessageBox.warning(self, '错误', '数据库连接失败')
-                    return
 
-                with connection.cursor() as cursor:
-                    cursor.execute("""
-                        UPDATE card_keys 
-                        SET device_id = NULL, bind_time = NULL 
-                        WHERE card_key = %s
-                    """, (card_key,))
-                    connection.commit()
-                    
-                    if cursor.rowcount > 0:
-                        QMessageBox.information(self, '成功', '机器码解绑成功')
-                        self.update_database()
-                    else:
-                        QMessageBox.warning(self, '错误', '卡密不存在')
-                        
-        except Exception as e:
-            print(f"解绑机器码失败: {str(e)}")
-            QMessageBox.critical(self, '错误', f'解绑机器码失败: {str(e)}')
+    def _unbind_device_task(self, card_key):
+        """在工作线程中解绑机器码"""
+        connection = self.auth.db.shard(card_key).get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE card_keys 
+                    SET device_id = NULL, device_id_enc = NULL, bind_time = NULL 
+                    WHERE card_key = %s
+                """, (self.auth.crypto.card_key(card_key),))
+                unbound = cursor.rowcount > 0
+                if unbound:
+                    record_change(cursor, card_key, 'unbind')
+                connection.commit()
+                self.auth.card_cache.invalidate(card_key)
+        finally:
+            connection.close()
+        return (True, '机器码解绑成功') if unbound else (False, '卡密不存在')
+
+    def on_unbind_failed(self, error):
+        logger.error(f"解绑机器码失败: {str(error)}")
+        QMessageBox.critical(self, '错误', f'解绑机器码失败: {str(error)}')
 
     def refresh_data(self):
         """刷新数据"""
-        try:
-            # 保存当前的搜索和筛选条件
-            search_text = self.search_input.text()
-            status_filter = self.status_filter.currentText()
-            
-            # 设置鼠标待状
-            QApplication.setOverrideCursor(Qt.WaitCursor)
-            
-            try:
-                # 确保据库连接已关闭
-                self.auth.db.close()
-                
-                # 更新数据
-                self.update_database()
-                
-                # 恢复搜索和筛选条件
-                self.search_input.setText(search_text)
-                self.status_filter.setCurrentText(status_filter)
-                
-                # 应用筛选
-                self.filter_table()
-                
-                QMessageBox.information(self, '成功', '数据刷新成功')
-                
-            except Exception as e:
-                print(f"刷新数据失败: {str(e)}")
-                QMessageBox.critical(self, '错误', f'刷新数据失败: {str(e)}')
-                
-            finally:
-                # 恢复鼠标状态
-                QApplication.restoreOverrideCursor()
-                
-        except Exception as e:
-            print(f"刷新操作失败: {str(e)}")
-            QMessageBox.critical(self, '错误', f'刷新操作失败: {str(e)}')
+        # 更新数据，搜索和筛选条件保持不变
+        self.statusBar().showMessage('正在刷新数据...')
+        self.update_database(notify=True)
 
     def edit_card_dialog(self, card_key):
-        """编辑卡密对话框"""
+        """编辑卡密对话框（卡密信息在后台读取）"""
+        # 获取卡密信息（与 CardAuth 共用缓存）
+        self.db_executor.submit(
+            self.auth.get_card_info, card_key, key=('card_info', card_key),
+            on_success=lambda card_info: self.show_edit_dialog(card_key, card_info),
+            on_error=lambda error: QMessageBox.critical(self, '错误', f'打开编辑对话框失败: {str(error)}')
+        )
+
+    def show_edit_dialog(self, card_key, card_info):
+        """显示编辑卡密对话框"""
         try:
-            # 获取卡密信息
-            connection = self.auth.db.get_connection()
-            if not connection:
-                QMessageBox.warning(self, '错误', '数据库连接失败')
-                return
-            
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT valid_days, status, device_id, use_time,
-                           CASE 
-                               WHEN status = 1 AND use_time IS NOT NULL THEN
-                                   GREATEST(0, DATEDIFF(use_time + INTERVAL valid_days DAY, NOW()))
-                               ELSE valid_days
-                           END as remaining_days
-                    FROM card_keys WHERE card_key = %s
-                """, (card_key,))
-                card_info = cursor.fetchone()
-            
             if not card_info:
                 QMessageBox.warning(self, '错误', '卡密不存在')
                 return
@@ -1004,9 +1237,9 @@ class AdminPanel(QMainWindow):
             
             info_items = [
                 ('卡密:', card_key),
-                ('状态:', '已使用' if card_info['status'] == 1 else '未使用'),
+                ('状态:', {1: '已使用', STATUS_EXPIRED: '已过期'}.get(card_info['status'], '未使用')),
                 ('有效期:', f"{card_info['valid_days']}天"),
-                ('剩余天数:', f"{card_info['remaining_days']}天"),
+                ('剩余天数:', f"{self.auth.remaining_days(card_info)}天"),
                 ('使用时间:', str(card_info['use_time']) if card_info['use_time'] else '-'),
                 ('机器码:', card_info['device_id'] if card_info['device_id'] else '-')
             ]
@@ -1088,9 +1321,6 @@ class AdminPanel(QMainWindow):
             
         except Exception as e:
             QMessageBox.critical(self, '错误', f'打开编辑对话框失败: {str(e)}')
-        finally:
-            if connection:
-                self.auth.db.close()
 
     def save_card_edit(self, dialog, card_key, start_time, end_time, status_combo):
         """保存卡密编辑"""
@@ -1113,23 +1343,28 @@ class AdminPanel(QMainWindow):
                 status = 1 if status_combo.currentText() == '已使用' else 0
             
             # 更新卡密
-            success, message = self.auth.edit_card(
-                card_key, 
+            self.db_executor.submit(
+                self.auth.edit_card, card_key,
                 valid_days=valid_days,
                 status=status,
-                use_time=start_datetime.strftime('%Y-%m-%d %H:%M:%S')
+                use_time=start_datetime.strftime('%Y-%m-%d %H:%M:%S'),
+                key=('edit', card_key),
+                on_success=lambda result: self.on_card_edited(dialog, result),
+                on_error=lambda error: QMessageBox.critical(self, '错误', f'保存编辑失败: {str(error)}')
             )
-            
-            if success:
-                QMessageBox.information(self, '成功', message)
-                self.update_database()
-                dialog.accept()
-            else:
-                QMessageBox.warning(dialog, '错误', message)
                 
         except Exception as e:
             QMessageBox.critical(self, '错误', f'保存编辑失败: {str(e)}')
 
+    def on_card_edited(self, dialog, result):
+        success, message = result
+        if success:
+            QMessageBox.information(self, '成功', message)
+            self.poll_changes()
+            dialog.accept()
+        else:
+            QMessageBox.warning(dialog, '错误', message)
+
     def edit_selected_card(self):
         """编辑选中的卡密"""
         selected_items = self.table.selectedItems()
@@ -1164,30 +1399,34 @@ class AdminPanel(QMainWindow):
 
     def clear_status_records(self):
         """清空状态变更记录"""
-        try:
-            reply = QMessageBox.question(
-                self, '确认', 
-                '确定要清空所有状态变更记录吗？\n此操作不可恢复。',
-                QMessageBox.Yes | QMessageBox.No
+        reply = QMessageBox.question(
+            self, '确认', 
+            '确定要清空所有状态变更记录吗？\n此操作不可恢复。',
+            QMessageBox.Yes | QMessageBox.No
+        )
+        
+        if reply == QMessageBox.Yes:
+            self.db_executor.submit(
+                self._clear_status_records_task, key='clear_status',
+                on_success=lambda _: QMessageBox.information(self, '成功', '状态变更记录已清空'),
+                on_error=self.on_clear_status_failed
             )
-            
-            if reply == QMessageBox.Yes:
-                connection = self.auth.db.get_connection()
-                if not connection:
-                    QMessageBox.warning(self, '错误', '数据库连接失败')
-                    return
 
+    def _clear_status_records_task(self):
+        """在工作线程中清空状态变更记录（所有分片）"""
+        def clear(db):
+            connection = db.get_connection()
+            try:
                 with connection.cursor() as cursor:
                     cursor.execute("TRUNCATE TABLE card_status_change")
                     connection.commit()
-                    QMessageBox.information(self, '成功', '状态变更记录已清空')
-                    
-        except Exception as e:
-            print(f"清空状态记录失败: {str(e)}")
-            QMessageBox.critical(self, '错误', f'清空状态记录失败: {str(e)}')
-        finally:
-            if connection:
+            finally:
                 connection.close()
+        self.auth.db.fan_out(clear)
+
+    def on_clear_status_failed(self, error):
+        logger.error(f"清空状态记录失败: {str(error)}")
+        QMessageBox.critical(self, '错误', f'清空状态记录失败: {str(error)}')
 
 def check_integrity():
     """检查程序完整性"""
@@ -1203,6 +1442,7 @@ def check_integrity():
         return True
 
 def main():
+    setup_logging()
     app = QApplication(sys.argv)
     
     try:
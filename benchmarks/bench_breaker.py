@@ -0,0 +1,225 @@
+"""数据库熔断的故障注入检查
+
+在本地启动一个 TCP 代理代替数据库服务器，依次切换为:
+  pass      正常（有 --upstream 时转发到真实 MySQL，否则只发送握手包）
+  blackhole 接受连接但不回任何数据（网络分区、服务器挂起）
+  reset     接受连接后立即关闭（服务器重启中）
+每种故障下先调用到熔断器打开，再检查熔断期间的调用在毫秒级失败且没有任何
+连接到达代理；最后恢复代理，等待 reset_timeout 后确认半开探测成功、熔断关闭。
+单次调用（含重试）超过截止时间、熔断期间调用过慢或熔断未恢复时以非零状态退出。
+tests/test_resilience.py 用较短的截止时间运行同样的检查。
+
+用法:
+    python -m benchmarks.bench_breaker [--deadline 2] [--reset 1] [--budget-ms 5]
+    python -m benchmarks.bench_breaker --upstream 127.0.0.1:3306
+"""
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+
+from benchmarks.fixtures import percentile
+from utils.resilience import (CircuitBreaker, CircuitOpen, RetryPolicy, call_with_retry,
+                              OPEN, CLOSED)
+from config import RESILIENCE_CONFIG
+
+# 最小的 MySQL 握手包头（长度 + 序号），客户端只检查是否收到数据
+GREETING = b'\x4a\x00\x00\x00'
+
+FAULT_MODES = ('blackhole', 'reset')
+
+
+class FaultProxy:
+    """可切换故障模式的本地 TCP 代理"""
+
+    def __init__(self, upstream=None):
+        self.upstream = upstream
+        self.mode = 'pass'
+        self.accepted = 0
+        self._held = []
+        self._server = socket.create_server(('127.0.0.1', 0))
+        self.port = self._server.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, name='fault-proxy', daemon=True)
+        self._thread.start()
+
+    def set_mode(self, mode):
+        self.mode = mode
+        # 切换模式时断开挂起的连接
+        for conn in self._held:
+            conn.close()
+        self._held = []
+
+    def close(self):
+        self.set_mode('pass')
+        self._server.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            if self.mode == 'blackhole':
+                self._held.append(conn)
+            elif self.mode == 'reset':
+                conn.close()
+            elif self.upstream:
+                threading.Thread(target=self._forward, args=(conn,), daemon=True).start()
+            else:
+                conn.sendall(GREETING)
+                self._held.append(conn)
+
+    def _forward(self, conn):
+        try:
+            upstream = socket.create_connection(self.upstream)
+        except OSError:
+            conn.close()
+            return
+        for src, dst in ((conn, upstream), (upstream, conn)):
+            threading.Thread(target=self._pipe, args=(src, dst), daemon=True).start()
+
+    @staticmethod
+    def _pipe(src, dst):
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            src.close()
+            dst.close()
+
+
+def make_connect(port):
+    """与数据库驱动相同的连接方式：连接超时不超过剩余时间，然后等待服务器握手"""
+    def connect(deadline):
+        timeout = deadline.timeout(RESILIENCE_CONFIG['connect_timeout'])
+        with socket.create_connection(('127.0.0.1', port), timeout=timeout) as sock:
+            if not sock.recv(4):
+                raise ConnectionResetError('服务器关闭了连接')
+    return connect
+
+
+def timed_call(connect, breaker, policy):
+    started = time.perf_counter()
+    error = None
+    try:
+        call_with_retry(connect, breaker=breaker, policy=policy)
+    except Exception as e:
+        error = e
+    return time.perf_counter() - started, error
+
+
+def run_fault(mode, proxy, connect, breaker, policy, args):
+    """注入一种故障，返回该阶段的统计"""
+    proxy.set_mode(mode)
+    tripping = []
+    while breaker.state != OPEN and len(tripping) < breaker.failure_threshold * policy.attempts:
+        elapsed, _ = timed_call(connect, breaker, policy)
+        tripping.append(elapsed)
+
+    time.sleep(0.1)  # 等代理线程处理完最后一个连接再计数
+    accepted = proxy.accepted
+    open_calls = []
+    rejected = 0
+    for _ in range(args.calls):
+        elapsed, error = timed_call(connect, breaker, policy)
+        open_calls.append(elapsed)
+        rejected += isinstance(error, CircuitOpen)
+    open_connections = proxy.accepted - accepted
+
+    proxy.set_mode('pass')
+    time.sleep(breaker.reset_timeout)
+    _, error = timed_call(connect, breaker, policy)
+    return {
+        'calls_to_open': len(tripping),
+        'max_call_ms': round(max(tripping, default=0) * 1000, 1),
+        'open_p50_ms': round(percentile(open_calls, 50) * 1000, 3),
+        'open_p99_ms': round(percentile(open_calls, 99) * 1000, 3),
+        'open_rejected': rejected,
+        'open_connections': open_connections,
+        'recovered': error is None and breaker.state == CLOSED
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='数据库熔断故障注入检查')
+    parser.add_argument('--upstream', help='转发到的真实数据库 host:port（不指定时只模拟握手）')
+    parser.add_argument('--deadline', type=float, default=2, help='每次调用的截止时间(秒)')
+    parser.add_argument('--attempts', type=int, default=2)
+    parser.add_argument('--threshold', type=int, default=3, help='熔断的连续失败次数')
+    parser.add_argument('--reset', type=float, default=1, help='熔断多久后探测(秒)')
+    parser.add_argument('--calls', type=int, default=1000, help='熔断期间的调用次数')
+    parser.add_argument('--budget-ms', type=float, default=5, help='熔断期间单次调用的 p99 上限')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    return parser.parse_args(argv)
+
+
+def run(args):
+    """依次注入各种故障，返回统计结果"""
+    upstream = None
+    if args.upstream:
+        host, port = args.upstream.rsplit(':', 1)
+        upstream = (host, int(port))
+    proxy = FaultProxy(upstream)
+    breaker = CircuitBreaker('bench', failure_threshold=args.threshold, reset_timeout=args.reset,
+                             failure_types=(OSError,))
+    policy = RetryPolicy(attempts=args.attempts, base=0.05, cap=0.2, deadline=args.deadline)
+    connect = make_connect(proxy.port)
+
+    try:
+        healthy = [timed_call(connect, breaker, policy) for _ in range(20)]
+        assert all(error is None for _, error in healthy), '代理正常时调用失败'
+        result = {
+            'args': vars(args),
+            'healthy_p50_ms': round(percentile([elapsed for elapsed, _ in healthy], 50) * 1000, 3)
+        }
+        for mode in FAULT_MODES:
+            result[mode] = run_fault(mode, proxy, connect, breaker, policy, args)
+    finally:
+        proxy.close()
+    return result
+
+
+def check(args, result):
+    """检查结果，返回失败列表"""
+    failures = []
+    # 截止时间按整秒传给驱动，允许 1 秒误差
+    slack_ms = (args.deadline + 1) * 1000
+    for mode in FAULT_MODES:
+        stats = result[mode]
+        if stats['max_call_ms'] > slack_ms:
+            failures.append(f"{mode}: 单次调用 {stats['max_call_ms']}ms 超过截止时间")
+        if stats['open_rejected'] != args.calls:
+            failures.append(f"{mode}: 熔断期间只有 {stats['open_rejected']}/{args.calls} 次调用被立即拒绝")
+        if stats['open_connections']:
+            failures.append(f"{mode}: 熔断期间仍有 {stats['open_connections']} 个连接到达服务器")
+        if stats['open_p99_ms'] > args.budget_ms:
+            failures.append(f"{mode}: 熔断期间调用 p99 {stats['open_p99_ms']}ms 超出预算")
+        if not stats['recovered']:
+            failures.append(f"{mode}: 故障恢复后熔断没有关闭")
+    return failures
+
+
+def main():
+    args = parse_args()
+    result = run(args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failures = check(args, result)
+    for failure in failures:
+        print(f"失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
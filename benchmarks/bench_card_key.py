@@ -0,0 +1,74 @@
+"""卡密格式校验基准：批量校验的吞吐，以及对常见输入错误的检出率
+
+对随机生成的新格式卡密做全部单字符替换和相邻字符交换，统计校验位没有发现、
+被当成另一个新卡密的个数（应为 0；其余按旧卡密交给数据库判断），并对比本地
+校验与旧版只用正则检查格式的耗时。
+
+用法: python -m benchmarks.bench_card_key [--keys 100000] [--typo-keys 2000]
+"""
+import re
+import sys
+import json
+import time
+import argparse
+
+from utils import key_format
+
+
+def typos(card_key):
+    """单字符替换和相邻字符交换（交换后不变的跳过）"""
+    for index, char in enumerate(card_key):
+        for other in key_format.ALPHABET:
+            if other != char:
+                yield card_key[:index] + other + card_key[index + 1:]
+    for index in range(len(card_key) - 1):
+        a, b = card_key[index], card_key[index + 1]
+        if a != b:
+            yield card_key[:index] + b + a + card_key[index + 2:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='卡密格式校验基准')
+    parser.add_argument('--keys', type=int, default=100000, help='测吞吐用的卡密数')
+    parser.add_argument('--typo-keys', type=int, default=2000, help='测检出率用的卡密数')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    keys = [key_format.generate() for _ in range(args.keys)]
+
+    legacy = re.compile(r'^[A-Za-z0-9]{8,32}$').match
+    started = time.perf_counter()
+    for card_key in keys:
+        legacy(card_key)
+    regex_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = key_format.check_many(keys)
+    check_seconds = time.perf_counter() - started
+    invalid = sum(1 for result in results if result)
+
+    checked = 0
+    missed = 0
+    for card_key in keys[:args.typo_keys]:
+        candidates = list(typos(card_key))
+        checked += len(candidates)
+        missed += sum(1 for candidate in candidates if key_format.is_structured(key_format.normalize(candidate)))
+
+    result = {
+        'keys': len(keys),
+        'regex_keys_per_second': round(len(keys) / regex_seconds),
+        'check_keys_per_second': round(len(keys) / check_seconds),
+        'check_us_per_key': round(check_seconds / len(keys) * 1e6, 2),
+        'generated_invalid': invalid,
+        'typos_checked': checked,
+        'typos_missed': missed
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if invalid or missed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""缓存编解码基准：对比旧版 json.dumps 与 CacheCodec 的体积和耗时
+
+用法: python -m benchmarks.bench_codec [--repeat 20] [--scale 1 10 100]
+"""
+import argparse
+import glob
+import json
+import time
+
+from utils.codec import CacheCodec, JsonCodec, SERIALIZER_JSON, SERIALIZER_MSGPACK, msgpack
+from utils.question_parser import parse_questions
+
+
+def load_sample_banks():
+    """读取仓库中的示例题库"""
+    banks = {}
+    for path in sorted(glob.glob('*题库例子.txt')):
+        with open(path, 'r', encoding='utf-8') as f:
+            banks[path] = parse_questions(f.read())
+    return banks
+
+
+def measure(codec, value, repeat):
+    """返回 (字节数, 编码耗时ms, 解码耗时ms)"""
+    data = codec.encode(value)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        codec.encode(value)
+    encode_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        codec.decode(data)
+    decode_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    assert codec.decode(data) == value
+    return len(data), encode_ms, decode_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='缓存编解码基准')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100],
+                        help='把示例题库重复的倍数')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    codecs = {
+        'json(旧)': JsonCodec(),
+        'json+zlib': CacheCodec('zlib', serializer=SERIALIZER_JSON),
+        'json+lzma': CacheCodec('lzma', serializer=SERIALIZER_JSON),
+    }
+    if msgpack is not None:
+        codecs['msgpack+zlib'] = CacheCodec('zlib', serializer=SERIALIZER_MSGPACK)
+        codecs['msgpack+lzma'] = CacheCodec('lzma', serializer=SERIALIZER_MSGPACK)
+
+    results = []
+    for bank_name, questions in load_sample_banks().items():
+        for scale in args.scale:
+            value = questions * scale
+            print(f"\n{bank_name} x{scale} ({len(value)} 题)")
+            print(f"{'编码':<14}{'字节数':>12}{'编码ms':>10}{'解码ms':>10}")
+            for codec_name, codec in codecs.items():
+                size, encode_ms, decode_ms = measure(codec, value, args.repeat)
+                print(f"{codec_name:<14}{size:>12}{encode_ms:>10.2f}{decode_ms:>10.2f}")
+                results.append({
+                    'bank': bank_name, 'scale': scale, 'questions': len(value),
+                    'codec': codec_name, 'bytes': size,
+                    'encode_ms': encode_ms, 'decode_ms': decode_ms
+                })
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
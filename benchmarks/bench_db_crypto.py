@@ -0,0 +1,132 @@
+"""列加密基准：取回结果时的解密吞吐，以及盲索引查询与逐行解密比较的对比
+
+同一批卡密分别按明文和加密（盲索引 + AES-GCM）写入两个 SQLite 库，报告:
+  - 取回全部行的速度（行/秒）：明文、加密后批量解密、加密后逐行解密
+  - 管理端全量读取（CardChangeFeed.snapshot）的耗时
+  - 按卡密查询：盲索引走唯一索引 vs 没有盲索引时取回全表逐行解密比较
+
+用法:
+    python -m benchmarks.bench_db_crypto [--cards 100000] [--lookups 1000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from benchmarks.fixtures import SQLiteDatabase, seed_cards
+from utils.changefeed import CardChangeFeed
+from utils.crypto import new_key
+from utils.db_crypto import DatabaseCrypto
+
+FETCH_SQL = "SELECT id, card_key, card_key_enc, device_id, device_id_enc FROM card_keys"
+
+
+def fetch_rows(db):
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(FETCH_SQL)
+            return list(cursor.fetchall())
+    finally:
+        connection.close()
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def decrypt_each(crypto, rows):
+    """不批量：每行单独解密（对照）"""
+    for row in rows:
+        crypto.decrypt_rows([row])
+    return rows
+
+
+def lookup_seek(db, crypto, card_keys):
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            for card_key in card_keys:
+                cursor.execute("SELECT id FROM card_keys WHERE card_key = %s", (crypto.card_key(card_key),))
+                assert cursor.fetchone() is not None
+    finally:
+        connection.close()
+
+
+def lookup_scan(db, crypto, card_keys):
+    """没有盲索引时的等值查询：取回全表、解密后比较"""
+    for card_key in card_keys:
+        rows = crypto.decrypt_rows(fetch_rows(db))
+        assert any(row['card_key'] == card_key for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列加密基准')
+    parser.add_argument('--cards', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=1000, help='盲索引查询次数')
+    parser.add_argument('--scans', type=int, default=3, help='逐行解密比较的查询次数')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    plain = DatabaseCrypto(config={'enabled': False})
+    crypto = DatabaseCrypto(key=new_key())
+    failures = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_db = SQLiteDatabase(os.path.join(tmp, 'plain.db'))
+        encrypted_db = SQLiteDatabase(os.path.join(tmp, 'encrypted.db'))
+        cards, seed_plain = timed(seed_cards, plain_db, args.cards, 10000, plain)
+        _, seed_encrypted = timed(seed_cards, encrypted_db, args.cards, 10000, crypto)
+
+        rows, fetch_plain = timed(fetch_rows, plain_db)
+        rows, fetch_encrypted = timed(fetch_rows, encrypted_db)
+        rows, decrypt_batch = timed(crypto.decrypt_rows, rows)
+        expected = {card_key: device_id for card_key, device_id, _ in cards}
+        if {row['card_key']: row['device_id'] for row in rows} != expected:
+            failures.append('解密结果与写入的卡密/设备ID不一致')
+        _, decrypt_single = timed(decrypt_each, crypto, fetch_rows(encrypted_db))
+
+        feed = CardChangeFeed(plain_db)
+        feed.crypto = plain
+        _, snapshot_plain = timed(feed.snapshot)
+        feed = CardChangeFeed(encrypted_db)
+        feed.crypto = crypto
+        snapshot, snapshot_encrypted = timed(feed.snapshot)
+        if sorted(card['card_key'] for card in snapshot) != sorted(expected):
+            failures.append('加密库全量读取的卡密不正确')
+
+        rng = random.Random(0)
+        keys = [rng.choice(cards)[0] for _ in range(args.lookups)]
+        _, seek_seconds = timed(lookup_seek, encrypted_db, crypto, keys)
+        _, scan_seconds = timed(lookup_scan, encrypted_db, crypto, keys[:args.scans])
+
+    result = {
+        'cards': args.cards,
+        'seed_seconds': {'plain': round(seed_plain, 2), 'encrypted': round(seed_encrypted, 2)},
+        'fetch_rows_per_second': {
+            'plain': round(args.cards / fetch_plain),
+            'encrypted_batch_decrypt': round(args.cards / (fetch_encrypted + decrypt_batch)),
+            'encrypted_row_by_row_decrypt': round(args.cards / (fetch_encrypted + decrypt_single))
+        },
+        'decrypt_rows_per_second': round(args.cards / decrypt_batch),
+        'snapshot_ms': {'plain': round(snapshot_plain * 1000, 1),
+                        'encrypted': round(snapshot_encrypted * 1000, 1)},
+        'lookup_ms': {'blind_index': round(seek_seconds / len(keys) * 1000, 3),
+                      'decrypt_and_compare': round(scan_seconds / min(args.scans, len(keys)) * 1000, 1)}
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    for failure in failures:
+        print(f"失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
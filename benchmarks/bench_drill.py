@@ -0,0 +1,96 @@
+"""快速刷题基准：作答后到下一题可操作的耗时
+
+用离屏 QApplication 比较两种换题方式（都包含同步重绘）:
+  - 单面板：作答后在同一块面板上重新填入下一题
+  - 双面板：读题期间已在隐藏的面板上排好下一题，作答后只切换
+报告 p50/p99（毫秒）以及是否在 APP_CONFIG['exam']['next_question_budget'] 以内。
+
+用法:
+    python -m benchmarks.bench_drill [--questions 2000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication, QStackedWidget
+
+from benchmarks.fixtures import synthetic_bank, percentile
+from config import APP_CONFIG
+from exam import QuestionPanel
+from utils.question_parser import parse_questions
+
+
+def percentiles(samples):
+    return {f'p{p}': round(percentile(samples, p) * 1000, 3) for p in (50, 99)}
+
+
+def refill(stack, questions):
+    """单面板：每题都在显示中的面板上重新填入"""
+    samples = []
+    panel = stack.widget(0)
+    stack.setCurrentWidget(panel)
+    total = len(questions)
+    for number, question in enumerate(questions, 1):
+        started = time.perf_counter()
+        panel.set_question(question, number, total)
+        stack.repaint()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def swap(stack, questions):
+    """双面板：下一题提前排好（不计时），作答后只切换"""
+    samples = []
+    total = len(questions)
+    stack.setCurrentIndex(0)
+    stack.currentWidget().set_question(questions[0], 1, total)
+    for number, question in enumerate(questions[1:], 2):
+        back = stack.widget(1 - stack.currentIndex())
+        back.set_question(question, number, total)
+        QApplication.processEvents()
+
+        started = time.perf_counter()
+        stack.setCurrentWidget(back)
+        stack.repaint()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='快速刷题换题耗时')
+    parser.add_argument('--questions', type=int, default=2000)
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    questions = [question for question in parse_questions(synthetic_bank(args.questions))
+                 if question['answer'] and len(question['options']) > 1]
+
+    stack = QStackedWidget()
+    for _ in range(2):
+        stack.addWidget(QuestionPanel())
+    stack.resize(600, 400)
+    stack.show()
+    app.processEvents()
+
+    budget = APP_CONFIG['exam']['next_question_budget']
+    result = {
+        'questions': len(questions),
+        'budget_ms': budget,
+        'refill_ms': percentiles(refill(stack, questions)),
+        'swap_ms': percentiles(swap(stack, questions))
+    }
+    result['within_budget'] = result['swap_ms']['p99'] <= budget
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if result['within_budget'] else 1)
+
+
+if __name__ == '__main__':
+    main()
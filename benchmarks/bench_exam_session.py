@@ -0,0 +1,102 @@
+"""答题状态机模拟：不创建 QApplication，直接驱动 ExamSession 跑大量答题
+
+每次模拟按给定正确率随机作答，途中随机回看和暂停/继续，检查:
+  - 得分等于答对的记录数，错题数等于答错数
+  - 暂停后继续时题号接着上次，不重复计分
+  - 回看不改变得分和当前题目
+  - 提前排版的下一题（upcoming）与实际显示的一致
+并报告每秒完成的答题次数和平均正确率。
+
+用法:
+    python -m benchmarks.bench_exam_session [--sessions 5000] [--questions 100] [--accuracy 0.7]
+"""
+import sys
+import json
+import time
+import random
+import argparse
+
+from benchmarks.fixtures import synthetic_bank
+from utils.exam_session import ExamSession, OPTION_LETTERS
+from utils.question_parser import parse_questions
+
+
+def run_session(questions, rng, accuracy, failures):
+    """跑完一次答题（中途可能暂停一次再继续），返回结束时的得分"""
+    session = ExamSession(questions)
+    wrong = session.wrong_questions
+    expected_score = 0
+    pause_at = rng.randrange(len(questions)) if rng.random() < 0.2 else None
+
+    while not session.finished:
+        if session.answered == pause_at:
+            progress = json.loads(json.dumps(session.progress()))
+            session = ExamSession.resume(questions, progress, wrong)
+            pause_at = None
+            if session.number != progress['answered'] + 1:
+                failures.append(f"继续答题后题号为 {session.number}，应为 {progress['answered'] + 1}")
+
+        question = session.current_question
+        number = session.number
+        if rng.random() < accuracy:
+            letter = question['answer']
+        else:
+            letter = rng.choice([c for c in OPTION_LETTERS[:len(question['options'])] if c != question['answer']])
+        item = session.answer(letter)
+        expected_score += item['is_correct']
+
+        # 显示对错期间回看
+        if rng.random() < 0.05:
+            while session.previous() is not None:
+                pass
+            if session.score != expected_score:
+                failures.append('回看改变了得分')
+        upcoming = session.upcoming()
+        session.next_question()
+        if upcoming != (None if session.finished else (session.number, session.current_question)):
+            failures.append(f"第 {number} 题之后提前排版的题目与实际显示的不一致")
+        if not session.finished and session.number != number + 1:
+            failures.append(f"第 {number} 题之后显示的是第 {session.number} 题")
+
+    if session.score != expected_score:
+        failures.append(f"得分 {session.score}，应为 {expected_score}")
+    if len(wrong) != session.total_questions - session.score:
+        failures.append(f"错题 {len(wrong)} 道，应为 {session.total_questions - session.score}")
+    return session.score
+
+
+def main():
+    parser = argparse.ArgumentParser(description='答题状态机模拟')
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--questions', type=int, default=100, help='每次答题的题目数')
+    parser.add_argument('--accuracy', type=float, default=0.7, help='模拟作答的正确率')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    questions = [question for question in parse_questions(synthetic_bank(args.questions))
+                 if question['answer'] and len(question['options']) > 1]
+    rng = random.Random(0)
+    failures = []
+
+    started = time.perf_counter()
+    scores = [run_session(questions, rng, args.accuracy, failures) for _ in range(args.sessions)]
+    elapsed = time.perf_counter() - started
+
+    result = {
+        'args': vars(args),
+        'questions': len(questions),
+        'sessions_per_second': round(args.sessions / elapsed),
+        'answers_per_second': round(args.sessions * len(questions) / elapsed),
+        'mean_accuracy': round(sum(scores) / (len(scores) * len(questions)), 4)
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    for failure in sorted(set(failures))[:10]:
+        print(f"失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""客户端集群负载测试：模拟大量 ExamSystem 实例同时在线
+
+每个模拟客户端与真实客户端一样持有两个数据库连接（常驻的 db_connection 和
+连接池中用于状态检查的一个），启动时执行 verify_card 的查询，之后每隔
+--interval 秒执行一次 check_card_status 的查询。update_time_display 每秒运行
+但不访问数据库，这里不模拟。客户端在 --ramp 秒内陆续启动，--ramp 0 即启动风暴。
+
+报告数据库 QPS、连接数、各操作的 p50/p99 延迟和错误率；调度延迟过大说明
+压测机本身已成为瓶颈，需要增加 --workers 或拆分到多台机器。
+
+用法:
+    python -m benchmarks.bench_fleet --clients 2000 --duration 60 --ramp 0
+    python -m benchmarks.bench_fleet --mysql bench_db --clients 5000 --workers 128 --json fleet.json
+"""
+import os
+import json
+import time
+import heapq
+import argparse
+import datetime
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixtures import SQLiteDatabase, MySQLDatabase, seed_cards, percentile
+from utils.card_queries import fetch_card, activate_card, fetch_card_status
+from utils.db_stats import QueryStats
+
+
+class FleetStats:
+    """按操作汇总延迟和错误"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.lateness = []  # 实际开始时间 - 计划时间
+        self.connections = 0
+        self.max_connections = 0
+        self._lock = threading.Lock()
+
+    def record(self, op, latency_ms, lateness_ms, error=None):
+        with self._lock:
+            self.latencies.setdefault(op, []).append(latency_ms)
+            self.lateness.append(lateness_ms)
+            if error is not None:
+                self.errors.setdefault(op, {})
+                self.errors[op][error] = self.errors[op].get(error, 0) + 1
+
+    def opened(self, count):
+        with self._lock:
+            self.connections += count
+            self.max_connections = max(self.max_connections, self.connections)
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for op, samples in self.latencies.items():
+                samples = sorted(samples)
+                errors = sum(self.errors.get(op, {}).values())
+                result[op] = {
+                    'count': len(samples),
+                    'p50_ms': percentile(samples, 50),
+                    'p99_ms': percentile(samples, 99),
+                    'max_ms': samples[-1],
+                    'error_rate': errors / len(samples),
+                    'errors': self.errors.get(op, {})
+                }
+            lateness = sorted(self.lateness)
+        return result, {'p50_ms': percentile(lateness, 50), 'p99_ms': percentile(lateness, 99)}
+
+
+class SimulatedClient:
+    """一个客户端实例的数据库行为"""
+
+    def __init__(self, db, card_key, device_id):
+        self.db = db
+        self.card_key = card_key
+        self.device_id = device_id
+        self.db_connection = None
+        self.pool_connection = None
+        self.activated = False
+        self.lock = threading.Lock()  # 同一客户端的操作不并发（与界面线程一致）
+
+    def start(self, stats):
+        """ExamSystem.__init__ + verify_card"""
+        self.db_connection = self.db.get_connection()
+        self.pool_connection = self.db.get_connection()
+        stats.opened(2)
+
+        cursor = self.db.tuple_cursor(self.db_connection)
+        try:
+            result = fetch_card(cursor, self.card_key)
+            if not result:
+                raise LookupError('卡密不存在')
+            status, bound_device, expiry_time = result
+            if status == 1 and bound_device != self.device_id:
+                raise LookupError('卡密已被其他设备使用')
+            if datetime.datetime.now() > expiry_time:
+                raise LookupError('卡密已过期')
+            if status == 0:
+                activate_card(cursor, self.card_key, self.device_id)
+                self.db_connection.commit()
+            self.activated = True
+        finally:
+            cursor.close()
+
+    def check_status(self):
+        """check_card_status"""
+        cursor = self.db.tuple_cursor(self.pool_connection)
+        try:
+            if fetch_card_status(cursor, self.card_key) is None:
+                raise LookupError('卡密已被删除')
+        finally:
+            cursor.close()
+
+    def close(self, stats):
+        for connection in (self.db_connection, self.pool_connection):
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                stats.opened(-1)
+
+
+def _execute(client, op, due, stats):
+    started = time.perf_counter()
+    error = None
+    with client.lock:
+        try:
+            if op == 'verify':
+                client.start(stats)
+            elif client.activated:
+                client.check_status()
+            else:
+                return
+        except Exception as e:
+            error = type(e).__name__ if not isinstance(e, LookupError) else str(e)
+    finished = time.perf_counter()
+    stats.record(op, (finished - started) * 1000, (started - due) * 1000, error)
+
+
+def _query_count():
+    return sum(s.histogram.count for s in list(QueryStats.get_instance().statements.values()))
+
+
+def _server_connections(db):
+    """MySQL 服务端的连接数，SQLite 返回 None"""
+    if db.name != 'mysql':
+        return None
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW GLOBAL STATUS WHERE Variable_name IN "
+                           "('Threads_connected', 'Max_used_connections', 'Aborted_connects')")
+            return {row['Variable_name']: int(row['Value']) for row in cursor.fetchall()}
+    finally:
+        connection.close()
+
+
+def run(args, db, cards):
+    stats = FleetStats()
+    clients = [SimulatedClient(db, card_key, device_id or f"fleet-device-{n}")
+               for n, (card_key, device_id, _) in enumerate(cards[:args.clients])]
+
+    # (计划时间, 客户端序号, 操作)，状态检查与 QTimer 一样按固定间隔触发
+    start = time.perf_counter() + 0.5
+    end = start + args.duration
+    schedule = []
+    for n in range(len(clients)):
+        first = start + (args.ramp * n / len(clients) if args.ramp else 0)
+        heapq.heappush(schedule, (first, n, 'verify'))
+
+    timeline = []
+    next_report = start + args.report_interval
+    last_queries, last_report = _query_count(), start
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        while schedule:
+            due, n, op = heapq.heappop(schedule)
+            if due >= end:
+                break
+            while next_report <= min(due, end):
+                time.sleep(max(0.0, next_report - time.perf_counter()))
+                queries = _query_count()
+                qps = (queries - last_queries) / (next_report - last_report)
+                timeline.append({'t': round(next_report - start, 1), 'qps': round(qps, 1),
+                                 'connections': stats.connections})
+                print(f"[{next_report - start:6.1f}s] QPS {qps:8.1f}  连接 {stats.connections}")
+                last_queries, last_report = queries, next_report
+                next_report += args.report_interval
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+            executor.submit(_execute, clients[n], op, due, stats)
+            heapq.heappush(schedule, (due + args.interval, n, 'status'))
+
+        time.sleep(max(0.0, end - time.perf_counter()))
+        elapsed = time.perf_counter() - start
+        server = _server_connections(db)
+
+    for client in clients:
+        client.close(stats)
+
+    operations, lateness = stats.summary()
+    return {
+        'clients': len(clients),
+        'duration_s': round(elapsed, 1),
+        'qps': round(_query_count() / elapsed, 1),
+        'max_client_connections': stats.max_connections,
+        'server_connections': server,
+        'operations': operations,
+        'schedule_lateness': lateness,
+        'timeline': timeline
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='客户端集群负载测试')
+    parser.add_argument('--clients', type=int, default=1000, help='模拟的客户端数量')
+    parser.add_argument('--duration', type=float, default=60, help='持续时间(秒)')
+    parser.add_argument('--ramp', type=float, default=10, help='客户端在多少秒内全部启动，0 为启动风暴')
+    parser.add_argument('--interval', type=float, default=10, help='状态检查间隔(秒)，同 ExamSystem.CHECK_INTERVAL')
+    parser.add_argument('--workers', type=int, default=64, help='执行查询的线程数')
+    parser.add_argument('--report-interval', type=float, default=5)
+    parser.add_argument('--mysql', metavar='DATABASE', help='使用本地 MySQL 的测试库（不能是正式库）')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = MySQLDatabase(args.mysql) if args.mysql else SQLiteDatabase(os.path.join(tmp, 'fleet.db'))
+        # 多出的卡密保持未使用，覆盖首次激活路径
+        cards = seed_cards(db, args.clients * 2)
+        QueryStats.get_instance().statements.clear()
+        result = run(args, db, cards)
+
+    print(f"\n客户端 {result['clients']}  持续 {result['duration_s']}s  平均 QPS {result['qps']}  "
+          f"最大连接数 {result['max_client_connections']}")
+    if result['server_connections']:
+        print(f"服务端: {result['server_connections']}")
+    for op, summary in result['operations'].items():
+        print(f"{op:<8} 次数 {summary['count']:>8}  p50 {summary['p50_ms']:>8.2f}ms  "
+              f"p99 {summary['p99_ms']:>8.2f}ms  错误率 {summary['error_rate']:.2%}")
+    lateness = result['schedule_lateness']
+    print(f"调度延迟 p50 {lateness['p50_ms']:.1f}ms p99 {lateness['p99_ms']:.1f}ms")
+    if lateness['p99_ms'] > 100:
+        print("警告: 调度延迟过大，压测机可能已成为瓶颈")
+
+    if args.json:
+        result['args'] = vars(args)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
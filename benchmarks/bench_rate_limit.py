@@ -0,0 +1,105 @@
+"""限流负载测试：滥用客户端存在时正常客户端的 p99 延迟
+
+模拟一个并发能力有限的数据库，若干正常客户端按固定间隔检查卡密状态，
+另有一个客户端不间断地请求。分别在不限流和限流两种情况下运行并对比。
+
+用法: python -m benchmarks.bench_rate_limit [--duration 5] [--clients 20]
+"""
+import argparse
+import json
+import threading
+import time
+
+from benchmarks.fixtures import percentile
+from utils.rate_limit import RateLimiter
+
+
+class SimulatedDatabase:
+    """并发连接数有限、每次查询耗时固定的数据库"""
+
+    def __init__(self, connections, service_ms):
+        self._slots = threading.BoundedSemaphore(connections)
+        self.service_time = service_ms / 1000
+
+    def query(self):
+        with self._slots:
+            time.sleep(self.service_time)
+
+
+def run(args, limiter):
+    db = SimulatedDatabase(args.connections, args.service_ms)
+    stop_at = time.perf_counter() + args.duration
+    latencies = []
+    abusive = {'allowed': 0, 'throttled': 0}
+    lock = threading.Lock()
+
+    def good_client(index):
+        device_id, card_key = f"device-{index}", f"card-{index}"
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            if not limiter or limiter.check('status', device_id, card_key) == 0:
+                db.query()
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(args.interval_ms / 1000)
+
+    def abusive_client():
+        while time.perf_counter() < stop_at:
+            retry_after = limiter.check('status', 'abuser', 'abuser-card') if limiter else 0
+            if retry_after == 0:
+                db.query()
+                abusive['allowed'] += 1
+            else:
+                abusive['throttled'] += 1
+                # 不遵守 retry-after 立即重试，但被限流的请求不会到达数据库
+                time.sleep(0.001)
+
+    threads = [threading.Thread(target=good_client, args=(i,)) for i in range(args.clients)]
+    threads += [threading.Thread(target=abusive_client) for _ in range(args.abusers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'requests': len(latencies),
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'abusive_allowed': abusive['allowed'],
+        'abusive_throttled': abusive['throttled']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='限流负载测试')
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--clients', type=int, default=20, help='正常客户端数量')
+    parser.add_argument('--abusers', type=int, default=8, help='滥用客户端线程数')
+    parser.add_argument('--interval-ms', type=float, default=200, help='正常客户端请求间隔')
+    parser.add_argument('--connections', type=int, default=4, help='数据库并发连接数')
+    parser.add_argument('--service-ms', type=float, default=5, help='单次查询耗时')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    # 正常客户端的请求频率在限额之内
+    config = {
+        'enabled': True,
+        'backend': 'local',
+        'status': {'rate': 2000 / args.interval_ms, 'burst': 5}
+    }
+
+    results = {
+        'no_limit': run(args, None),
+        'token_bucket': run(args, RateLimiter(config))
+    }
+    for name, result in results.items():
+        print(f"{name:<14} 正常客户端 p50 {result['p50_ms']:.1f}ms p99 {result['p99_ms']:.1f}ms  "
+              f"滥用客户端 放行 {result['abusive_allowed']} 限流 {result['abusive_throttled']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
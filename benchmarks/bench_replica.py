@@ -0,0 +1,205 @@
+"""读写分离检查
+
+用两个 SQLite 文件模拟主库和只读副本：复制线程每隔 --replication-delay 秒把主库
+整体备份到副本，副本因此最多落后这么久。检查:
+  - 副本延迟合格时 reader() 的连接来自副本
+  - 写入后 sticky_seconds 内的读取走主库，能读到刚写入的数据
+  - 复制停止、副本落后超过 max_lag 后读取退回主库，恢复复制后重新使用副本
+  - 变更订阅从副本全量读取后在主库上增量同步：能拿到副本尚未复制的删除，
+    且不会因读取在主库/副本之间切换而判定游标失效
+任一检查失败时以非零状态退出。
+
+两台 MySQL（主从复制）在 STORAGE_CONFIG['replicas'] 中配置副本即可，路由逻辑相同。
+
+用法: python -m benchmarks.bench_replica [--replication-delay 0.5] [--max-lag 1] [--sticky 1]
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+from benchmarks.fixtures import SQLiteDatabase, seed_cards
+from utils.changefeed import CardChangeFeed, record_change
+from utils.storage import ReplicatedStorage, SQLiteStorage
+
+
+class Replicator:
+    """定期把主库文件备份到副本文件"""
+
+    def __init__(self, primary_path, replica_path, delay):
+        self.primary_path = primary_path
+        self.replica_path = replica_path
+        self.delay = delay
+        self.paused = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='replicator', daemon=True)
+
+    def copy(self):
+        source = sqlite3.connect(self.primary_path)
+        target = sqlite3.connect(self.replica_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    def start(self):
+        self.copy()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.delay):
+            if not self.paused:
+                self.copy()
+
+
+def served_by(connection):
+    """连接所在的数据库文件"""
+    return os.path.basename(connection.execute("PRAGMA database_list").fetchone()[2])
+
+
+def write_card(storage, card_key, device_id):
+    """与客户端首次激活相同的写入"""
+    connection = storage.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE card_keys
+                SET status = 1, use_time = NOW(), device_id = %s, bind_time = NOW()
+                WHERE card_key = %s
+            """, (device_id, card_key))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def read_device(storage, card_key):
+    connection = storage.reader().get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT device_id FROM card_keys WHERE card_key = %s", (card_key,))
+            return served_by(connection), cursor.fetchone()['device_id']
+    finally:
+        connection.close()
+
+
+def check_routing(storage, replicator, cards, args):
+    """路由检查，返回失败列表"""
+    failures = []
+    primary_name = os.path.basename(storage.primary.path)
+    replica_name = os.path.basename(storage.replicas[0].path)
+
+    time.sleep(args.sticky + args.lag_check)
+    source, _ = read_device(storage, cards[0][0])
+    if source != replica_name:
+        failures.append(f"副本延迟合格时读取走了 {source}")
+
+    # 读己之写
+    write_card(storage, cards[1][0], 'sticky-device')
+    source, device_id = read_device(storage, cards[1][0])
+    if source != primary_name or device_id != 'sticky-device':
+        failures.append(f"写入后读取走了 {source}，读到 {device_id}")
+
+    # 复制停止后持续写入，副本落后超过 max_lag
+    replicator.paused = True
+    deadline = time.monotonic() + args.max_lag + args.sticky + args.lag_check + 0.5
+    n = 2
+    while time.monotonic() < deadline:
+        write_card(storage, cards[n % len(cards)][0], f"lag-{n}")
+        n += 1
+        time.sleep(0.05)
+    time.sleep(args.sticky)
+    source, _ = read_device(storage, cards[0][0])
+    if source != primary_name:
+        failures.append(f"副本落后 {storage.lags[0]:.1f}s 时读取仍走 {source}")
+
+    # 恢复复制
+    replicator.paused = False
+    time.sleep(args.replication_delay + args.lag_check + 0.2)
+    source, _ = read_device(storage, cards[0][0])
+    if source != replica_name:
+        failures.append(f"复制恢复后读取走了 {source}（延迟 {storage.lags[0]}）")
+    return failures
+
+
+def delete_card(storage, card_key):
+    """与管理端删除卡密相同的写入（只产生事件，不改变 updated_at，副本延迟仍显示为 0）"""
+    connection = storage.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM card_keys WHERE card_key = %s", (card_key,))
+            record_change(cursor, card_key, 'delete')
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def check_feed(storage, replicator, cards, args):
+    """变更订阅检查，返回失败列表"""
+    failures = []
+    feed = CardChangeFeed(storage, snapshot_db=storage.reader())
+
+    replicator.paused = True
+    time.sleep(args.sticky + args.lag_check)
+    feed.snapshot()
+    card_key = cards[-1][0]
+    delete_card(storage, card_key)
+    for label in ('删除后（粘滞期内）', '粘滞期结束后（副本尚未复制删除）'):
+        changed, removed = feed.poll()
+        if changed is None:
+            failures.append(f"{label}增量同步被判定为游标失效")
+        elif label.startswith('删除后') and card_key not in removed:
+            failures.append(f"{label}增量同步没有拿到删除")
+        time.sleep(args.sticky + args.lag_check)
+
+    replicator.paused = False
+    time.sleep(args.replication_delay + args.lag_check + 0.2)
+    feed.snapshot()
+    if feed.poll()[0] is None:
+        failures.append("从副本全量读取后，主库上的增量同步被判定为游标失效")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='读写分离检查')
+    parser.add_argument('--cards', type=int, default=1000)
+    parser.add_argument('--replication-delay', type=float, default=0.5)
+    parser.add_argument('--max-lag', type=float, default=1)
+    parser.add_argument('--sticky', type=float, default=1)
+    parser.add_argument('--lag-check', type=float, default=0.2, help='副本延迟检查间隔(秒)')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        primary = SQLiteDatabase(os.path.join(tmp, 'primary.db'))
+        cards = seed_cards(primary, args.cards)
+        replica_path = os.path.join(tmp, 'replica.db')
+        replicator = Replicator(primary.path, replica_path, args.replication_delay)
+        replicator.start()
+        storage = ReplicatedStorage(primary, [SQLiteStorage(replica_path)], max_lag=args.max_lag,
+                                    sticky_seconds=args.sticky, lag_check_interval=args.lag_check)
+
+        failures = check_routing(storage, replicator, cards, args)
+        failures += check_feed(storage, replicator, cards, args)
+        replicator.stop()
+        result = {'args': vars(args), 'stats': storage.stats()}
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    for failure in failures:
+        print(f"失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""分片与在线重新分片检查
+
+用几个 SQLite 文件（或本地 MySQL 上的几个测试库）作为分片：先按 2 个分片建立
+槽位表并写入卡密，再加入第 3 个分片，把一部分槽在线迁移过去。迁移期间多个线程
+持续按客户端激活的方式修改卡密（加行锁、更新设备、提交）。检查:
+  - 迁移前后每个卡密都只在一个分片上，且就在 shard(card_key) 返回的分片上
+  - 迁移期间成功提交的修改一个不丢，修改时不会因卡密刚被迁走而找不到
+  - 全量读取（扇出到各分片后合并）与卡密总数一致
+并报告迁移期间修改的延迟。tests/test_shard.py 以较小的规模运行同样的检查。
+
+用法:
+    python -m benchmarks.bench_shard [--cards 20000] [--writers 4]
+    python -m benchmarks.bench_shard --mysql bench_shard    # 使用 bench_shard_0..2 三个库
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+from benchmarks.fixtures import SQLiteDatabase, MySQLDatabase, seed_cards, percentile
+from utils.changefeed import CardChangeFeed
+from utils.reshard import Resharder
+from utils.storage import ShardedStorage
+
+SLOTS = 64
+
+
+def open_shards(args, tmp):
+    if args.mysql:
+        shards = [MySQLDatabase(f"{args.mysql}_{index}") for index in range(3)]
+        # 槽位表在第一个分片上，每次从 2 个分片的初始分配开始
+        with shards[0].get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM card_shard_slots")
+            connection.commit()
+        return shards
+    return [SQLiteDatabase(os.path.join(tmp, f"shard_{index}.db")) for index in range(3)]
+
+
+def activate(db, card_key, device_id):
+    """与管理端验证相同的加锁修改（查不到时按 reroute() 再查），卡密不存在时返回 False"""
+    shard = db.shard(card_key)
+    while shard is not None:
+        with shard.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("START TRANSACTION")
+                cursor.execute("SELECT id FROM card_keys WHERE card_key = %s FOR UPDATE", (card_key,))
+                row = cursor.fetchone()
+                if row is not None:
+                    cursor.execute("UPDATE card_keys SET status = 1, device_id = %s WHERE id = %s",
+                                   (device_id, row['id']))
+                    cursor.execute("COMMIT")
+                    return True
+                cursor.execute("ROLLBACK")
+        shard = db.reroute(card_key, shard)
+    return False
+
+
+def locations(db):
+    """每个卡密所在的分片下标列表"""
+    def keys(shard):
+        with shard.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT card_key, device_id FROM card_keys")
+                return cursor.fetchall()
+
+    found = {}
+    devices = {}
+    for index, rows in enumerate(db.fan_out(keys)):
+        for row in rows:
+            found.setdefault(row['card_key'], []).append(index)
+            devices[row['card_key']] = row['device_id']
+    return found, devices
+
+
+def check_placement(db, cards, stage):
+    failures = []
+    found, devices = locations(db)
+    shards = db.shards()
+    for card_key, _, _ in cards:
+        where = found.get(card_key, [])
+        if len(where) != 1:
+            failures.append(f"{stage}: {card_key} 在分片 {where}")
+        elif shards[where[0]] is not db.shard(card_key):
+            failures.append(f"{stage}: {card_key} 在分片 {where[0]}，路由到了别处")
+    return failures[:10], devices
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='分片与在线重新分片检查')
+    parser.add_argument('--cards', type=int, default=20000)
+    parser.add_argument('--writers', type=int, default=4, help='迁移期间修改卡密的线程数')
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--mysql', help='使用本地 MySQL 上的 <前缀>_0..2 测试库')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    return parser.parse_args(argv)
+
+
+def run(args):
+    """建库、迁移并检查，返回 (结果, 失败列表)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        shards = open_shards(args, tmp)
+        # 先按 2 个分片建立槽位表并写入，再加入第 3 个分片
+        cards = seed_cards(ShardedStorage(shards[:2], slots=SLOTS, map_refresh=0.5), args.cards)
+        shards[2].reset()
+        db = ShardedStorage(shards, slots=SLOTS, map_refresh=0.5)
+        failures, _ = check_placement(db, cards, '迁移前')
+
+        stop = threading.Event()
+        latencies = []
+        missing = [0]
+        expected = {}
+        lock = threading.Lock()
+
+        def writer(index):
+            rng = random.Random(index)
+            keys = [card[0] for card in cards[index::args.writers]]
+            n = 0
+            while not stop.is_set():
+                card_key = rng.choice(keys)
+                device_id = f"w{index}-{n}"
+                started = time.perf_counter()
+                ok = activate(db, card_key, device_id)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if ok:
+                        expected[card_key] = device_id
+                    else:
+                        missing[0] += 1
+                n += 1
+
+        threads = [threading.Thread(target=writer, args=(index,), daemon=True) for index in range(args.writers)]
+        for thread in threads:
+            thread.start()
+        # 从两个原分片各迁移一段槽，新分片分到约三分之一
+        started = time.perf_counter()
+        resharder = Resharder(db, batch_size=args.batch, batch_pause=0)
+        moved = resharder.move(SLOTS // 2 - SLOTS // 6, SLOTS // 2 + SLOTS // 6 - 1, 2)
+        reshard_seconds = time.perf_counter() - started
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        placement, devices = check_placement(db, cards, '迁移后')
+        failures += placement
+        lost = [card_key for card_key, device_id in expected.items() if devices.get(card_key) != device_id]
+        if lost:
+            failures.append(f"{len(lost)} 个卡密的修改丢失，如 {lost[:5]}")
+        if missing[0]:
+            failures.append(f"迁移期间有 {missing[0]} 次修改找不到卡密")
+
+        started = time.perf_counter()
+        snapshot = CardChangeFeed(db).snapshot()
+        snapshot_ms = (time.perf_counter() - started) * 1000
+        if len(snapshot) != len(cards):
+            failures.append(f"全量读取得到 {len(snapshot)} 个卡密，应为 {len(cards)}")
+
+        _, _, counts = resharder.status()
+        result = {
+            'args': vars(args),
+            'moved': moved,
+            'reshard_seconds': round(reshard_seconds, 2),
+            'cards_per_shard': counts,
+            'writes': len(latencies),
+            'write_p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'write_p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'missing_during_move': missing[0],
+            'snapshot_ms': round(snapshot_ms, 1)
+        }
+    return result, failures
+
+
+def main():
+    args = parse_args()
+    result, failures = run(args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    for failure in failures:
+        print(f"失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
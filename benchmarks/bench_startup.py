@@ -0,0 +1,120 @@
+"""启动耗时预算检查
+
+1. 用 python -X importtime 测量 import exam 的耗时，并确认 wmi、数据库驱动、
+   redis 等重模块没有在导入阶段被加载；
+2. 以离屏模式多次启动 run.py，读取 utils.startup 记录的首屏时间。
+
+超出预算或重模块被提前导入时以非零状态退出。tests/test_startup.py 在 CI 中
+运行同样的检查（没有 PyQt5 时跳过）。
+
+用法: python -m benchmarks.bench_startup [--runs 5] [--import-budget-ms 400]
+                                         [--paint-budget-ms 1500] [--json out.json]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# 这些模块只允许在后台初始化时导入
+DEFERRED_MODULES = ('wmi', 'pythoncom', 'mysql.connector', 'dbutils', 'pymysql', 'redis',
+                    'psutil', 'msgpack', 'utils.bloom', 'utils.rate_limit', 'utils.monitor')
+
+
+def import_profile(module='exam'):
+    """返回 (总耗时ms, {模块: 自身耗时ms})"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True)
+    self_times = {}
+    total_ms = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = [part.strip() for part in line[len('import time:'):].split('|')]
+        if not parts[0].isdigit():
+            continue
+        name = parts[2].strip()
+        self_times[name] = int(parts[0]) / 1000
+        if name == module:
+            total_ms = int(parts[1]) / 1000
+    if total_ms is None:
+        raise RuntimeError(f"import {module} 失败:\n{proc.stderr[-2000:]}")
+    return total_ms, self_times
+
+
+def first_paint(runs, probe='first_paint'):
+    """以离屏模式启动 run.py，返回每次的启动阶段记录"""
+    env = dict(os.environ, EXAM_STARTUP_PROBE=probe, QT_QPA_PLATFORM='offscreen')
+    results = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, 'run.py'], capture_output=True, text=True,
+                              env=env, timeout=60)
+        lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+        if not lines:
+            raise RuntimeError(f"run.py 未输出启动记录:\n{proc.stdout[-2000:]}{proc.stderr[-2000:]}")
+        results.append(json.loads(lines[-1]))
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='启动耗时预算检查')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget-ms', type=float, default=400)
+    parser.add_argument('--paint-budget-ms', type=float, default=1500)
+    parser.add_argument('--skip-paint', action='store_true', help='只检查导入（无图形环境时）')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    return parser.parse_args(argv)
+
+
+def run(args):
+    """测量导入和首屏耗时，返回统计结果"""
+    total_ms, self_times = import_profile()
+    eager = sorted(name for name in self_times
+                   if any(name == module or name.startswith(module + '.') for module in DEFERRED_MODULES))
+    slowest = sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:15]
+    result = {'import_ms': total_ms, 'eager_modules': eager, 'slowest_imports': slowest,
+              'first_paint': None}
+    if not args.skip_paint:
+        runs = first_paint(args.runs)
+        paints = sorted(run['first_paint'] for run in runs)
+        result['first_paint'] = {'median_ms': paints[len(paints) // 2], 'runs': runs}
+    return result
+
+
+def check(args, result):
+    """检查结果，返回失败列表"""
+    failures = []
+    if result['import_ms'] > args.import_budget_ms:
+        failures.append(f"import exam 耗时 {result['import_ms']:.1f}ms 超出预算 {args.import_budget_ms:.0f}ms")
+    if result['eager_modules']:
+        failures.append(f"以下模块应延迟导入: {', '.join(result['eager_modules'])}")
+    first_paint = result['first_paint']
+    if first_paint and first_paint['median_ms'] > args.paint_budget_ms:
+        failures.append(f"首屏耗时 {first_paint['median_ms']:.1f}ms 超出预算 {args.paint_budget_ms:.0f}ms")
+    return failures
+
+
+def main():
+    args = parse_args()
+    result = run(args)
+    print(f"import exam: {result['import_ms']:.1f}ms (预算 {args.import_budget_ms:.0f}ms)")
+    print("自身耗时最多的模块:")
+    for name, ms in result['slowest_imports']:
+        print(f"  {ms:8.1f}ms  {name}")
+    first_paint = result['first_paint']
+    if first_paint:
+        print(f"首屏: 中位数 {first_paint['median_ms']:.1f}ms (预算 {args.paint_budget_ms:.0f}ms)，"
+              f"各阶段 {first_paint['runs'][0]}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failures = check(args, result)
+    for failure in failures:
+        print(f"失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""基准测试套件：题库解析、卡密验证/状态检查、批量生成卡密、管理端全量刷新
+
+默认使用 SQLite 替身（无需数据库服务），--mysql 指定本地 MySQL 上的独立测试库。
+结果写成 JSON，--compare 与之前某次提交的结果对比。
+
+用法:
+    python -m benchmarks.bench_suite [--json out.json] [--compare base.json]
+    python -m benchmarks.bench_suite --full            # 含 100 万题/100 万行
+    python -m benchmarks.bench_suite --mysql bench_db --only verify_card card_status
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from benchmarks.fixtures import SEED, SQLiteDatabase, MySQLDatabase, seed_cards, synthetic_bank
+from utils.card_queries import fetch_card_status
+from utils.changefeed import CardChangeFeed
+from utils.question_parser import parse_questions
+
+
+def measure(func, iterations, warmup=0):
+    """多次调用 func，返回耗时统计（毫秒）"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    total = sum(samples)
+    return {
+        'iterations': iterations,
+        'median_ms': samples[len(samples) // 2],
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'mean_ms': total / len(samples),
+        'ops_per_sec': len(samples) * 1000 / total if total else 0.0
+    }
+
+
+def _card_auth(db):
+    """使用指定数据库、不限流的 CardAuth（需要 PyQt5 才能导入 admin）"""
+    from admin import CardAuth
+    from utils.rate_limit import RateLimiter
+
+    auth = CardAuth()
+    auth.db = db
+    auth.rate_limiter = RateLimiter({'enabled': False})
+    return auth
+
+
+# ---- 各项测试，返回 {结果名: 统计} ----
+
+def bench_parse(args, db):
+    results = {}
+    for count in args.questions:
+        content = synthetic_bank(count)
+        questions = []
+        stats = measure(lambda: questions.append(parse_questions(content)),
+                        iterations=3 if count <= 100000 else 1)
+        assert len(questions[-1]) == count, f"解析结果 {len(questions[-1])} 题，应为 {count}"
+        stats['questions'] = count
+        stats['bytes'] = len(content.encode('utf-8'))
+        results[f"parse_{_scale_name(count)}"] = stats
+    return results
+
+
+def bench_verify_card(args, db):
+    cards = seed_cards(db, args.cards)
+    used = [(key, device) for key, device, status in cards if status == 1]
+    rng = random.Random(SEED)
+    auth = _card_auth(db)
+
+    def verify_used():
+        card_key, device_id = rng.choice(used)
+        ok, message, _ = auth.verify_card(card_key, device_id)
+        assert ok, message
+
+    stats = measure(verify_used, args.iterations, warmup=10)
+    stats['cards'] = args.cards
+    return {'verify_card': stats}
+
+
+def bench_card_status(args, db):
+    cards = seed_cards(db, args.cards)
+    rng = random.Random(SEED)
+    connection = db.get_connection()
+    try:
+        cursor = db.tuple_cursor(connection)
+
+        def check():
+            assert fetch_card_status(cursor, rng.choice(cards)[0]) is not None
+
+        stats = measure(check, args.iterations, warmup=10)
+    finally:
+        connection.close()
+    stats['cards'] = args.cards
+    return {'card_status': stats}
+
+
+def bench_generate_cards(args, db):
+    seed_cards(db, args.cards)
+    auth = _card_auth(db)
+    count = args.generate
+
+    def generate():
+        assert len(auth.generate_cards(30, count)) == count
+
+    stats = measure(generate, 3)
+    stats['cards_per_batch'] = count
+    stats['ms_per_card'] = stats['median_ms'] / count
+    return {'generate_cards': stats}
+
+
+def bench_update_database(args, db):
+    """管理端全量刷新：快照查询 + 行处理，可导入 PyQt5 时包括填充表格"""
+    fill = _table_filler()
+    results = {}
+    for rows in args.rows:
+        seed_cards(db, rows)
+        feed = CardChangeFeed(db)
+        snapshot = []
+        stats = measure(lambda: snapshot.append(feed.snapshot()), iterations=3 if rows <= 100000 else 1)
+        assert len(snapshot[-1]) == rows
+        stats['rows'] = rows
+        results[f"update_database_snapshot_{_scale_name(rows)}"] = stats
+
+        if fill is not None:
+            stats = measure(lambda: fill(snapshot[-1]), iterations=1)
+            stats['rows'] = rows
+            results[f"update_database_table_{_scale_name(rows)}"] = stats
+    return results
+
+
+def _table_filler():
+    """用 AdminPanel._set_row 填充离屏 QTableWidget；无 PyQt5 时返回 None"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt5.QtWidgets import QApplication, QTableWidget
+        from admin import AdminPanel
+    except ImportError:
+        return None
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    class Holder:
+        _set_row = AdminPanel._set_row
+
+    def fill(cards):
+        holder = Holder()
+        holder.table = QTableWidget()
+        holder.table.setColumnCount(8)
+        holder.row_index, holder.row_versions, holder.row_status = {}, {}, {}
+        holder.table.setRowCount(len(cards))
+        for row, card in enumerate(cards):
+            holder._set_row(row, card)
+        app.processEvents()
+
+    return fill
+
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'verify_card': bench_verify_card,
+    'card_status': bench_card_status,
+    'generate_cards': bench_generate_cards,
+    'update_database': bench_update_database,
+}
+
+
+def _scale_name(n):
+    if n >= 1000000 and n % 1000000 == 0:
+        return f"{n // 1000000}m"
+    if n >= 1000 and n % 1000 == 0:
+        return f"{n // 1000}k"
+    return str(n)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """打印与基准结果的对比（中位数耗时）"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n对比 {baseline['meta'].get('commit')} -> {results['meta'].get('commit')}")
+    print(f"{'测试':<36}{'基准ms':>12}{'当前ms':>12}{'变化':>10}")
+    for name, stats in results['results'].items():
+        base = baseline['results'].get(name)
+        if not base or 'median_ms' not in base or 'median_ms' not in stats:
+            continue
+        change = (stats['median_ms'] - base['median_ms']) / base['median_ms'] * 100 if base['median_ms'] else 0
+        print(f"{name:<36}{base['median_ms']:>12.3f}{stats['median_ms']:>12.3f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基准测试套件')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='只运行指定的测试')
+    parser.add_argument('--mysql', metavar='DATABASE', help='使用本地 MySQL 的测试库（不能是正式库）')
+    parser.add_argument('--questions', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000])
+    parser.add_argument('--cards', type=int, default=10000, help='验证/状态检查/生成测试的卡密数')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--generate', type=int, default=1000, help='每批生成的卡密数')
+    parser.add_argument('--full', action='store_true', help='加入 100 万题和 100 万行')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    parser.add_argument('--compare', help='与之前的 JSON 结果对比')
+    args = parser.parse_args()
+    if args.full:
+        args.questions = sorted(set(args.questions) | {1000000})
+        args.rows = sorted(set(args.rows) | {1000000})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = MySQLDatabase(args.mysql) if args.mysql else SQLiteDatabase(os.path.join(tmp, 'bench.db'))
+        results = {
+            'meta': {
+                'commit': _git_commit(),
+                'backend': db.name,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'args': {key: value for key, value in vars(args).items() if key not in ('json', 'compare')}
+            },
+            'results': {}
+        }
+
+        for name in args.only or BENCHMARKS:
+            try:
+                outcome = BENCHMARKS[name](args, db)
+            except ImportError as e:
+                outcome = {name: {'skipped': f"缺少依赖: {e.name}"}}
+            for result_name, stats in outcome.items():
+                results['results'][result_name] = stats
+                if 'skipped' in stats:
+                    print(f"{result_name:<36}跳过（{stats['skipped']}）")
+                else:
+                    print(f"{result_name:<36}中位数 {stats['median_ms']:>10.3f}ms  "
+                          f"p95 {stats['p95_ms']:>10.3f}ms  {stats['ops_per_sec']:>10.1f}/s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
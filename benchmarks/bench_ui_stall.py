@@ -0,0 +1,217 @@
+"""界面线程卡顿检查
+
+在离屏 QApplication 中运行 StallDetector，同时通过 DBExecutor 反复提交与客户端、
+管理端相同的查询（状态检查每 10ms 触发一次、增量同步、全量读取），每次取连接都
+注入固定延迟模拟缓慢的 MySQL。另外检查超时回调、取消和同 key 合并是否生效。
+界面线程最长卡顿超过预算时以非零状态退出。
+
+--control 在界面线程中同步执行同样的查询，用来确认检测器确实能发现卡顿。
+tests/test_ui_stall.py 用较短的时间运行这两种检查（没有 PyQt5 时跳过）。
+
+用法: python -m benchmarks.bench_ui_stall [--latency 0.5] [--duration 5] [--budget-ms 100]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+
+from benchmarks.fixtures import SQLiteDatabase, seed_cards
+from utils.card_queries import fetch_card_status
+from utils.changefeed import CardChangeFeed
+from utils.db_executor import DBExecutor, DBTaskTimeout
+from utils.stall_detector import StallDetector
+from utils.storage import Storage
+
+
+class SlowDatabase(Storage):
+    """每次取连接都等待 latency 秒，模拟网络往返慢的数据库"""
+
+    def __init__(self, db, latency):
+        self.db = db
+        self.latency = latency
+        self.name = db.name
+
+    def get_connection(self, deadline=None, **overrides):
+        time.sleep(self.latency)
+        return self.db.get_connection(deadline, **overrides)
+
+    def tuple_cursor(self, connection):
+        return self.db.tuple_cursor(connection)
+
+
+class Scenario:
+    def __init__(self, args, db, cards):
+        self.args = args
+        self.db = db
+        self.card_key = cards[0][0]
+        self.feed = CardChangeFeed(db)
+        self.executor = DBExecutor(workers=args.workers, timeout=args.latency * 10)
+        self.detector = StallDetector(threshold=args.budget_ms / 1000)
+
+        self.lock = threading.Lock()
+        self.executed = {'status': 0, 'poll': 0, 'cancelled': 0}
+        self.submitted = {'status': 0, 'poll': 0}
+        self.results = {'status': 0, 'snapshot_rows': None, 'timeouts': 0}
+        self.timers = []
+
+    def _count(self, name):
+        with self.lock:
+            self.executed[name] += 1
+
+    # ---- 任务（工作线程） ----
+
+    def check_status(self):
+        self._count('status')
+        connection = self.db.get_connection()
+        try:
+            cursor = self.db.tuple_cursor(connection)
+            return fetch_card_status(cursor, self.card_key)
+        finally:
+            connection.close()
+
+    def poll(self):
+        self._count('poll')
+        return self.feed.poll()
+
+    def never_runs(self):
+        self._count('cancelled')
+
+    # ---- 定时提交（界面线程） ----
+
+    def submit_status(self):
+        self.submitted['status'] += 1
+        if self.args.control:
+            self.check_status()
+            return
+        self.executor.submit(self.check_status, key=('status', self.card_key),
+                             on_success=lambda _: self._result('status'))
+
+    def submit_poll(self):
+        self.submitted['poll'] += 1
+        if not self.executor.in_flight('feed'):
+            self.executor.submit(self.poll, key='feed')
+
+    def _result(self, name):
+        self.results[name] += 1
+
+    def _on_snapshot(self, cards):
+        self.results['snapshot_rows'] = len(cards)
+
+    def _on_timeout(self, error):
+        if isinstance(error, DBTaskTimeout):
+            self.results['timeouts'] += 1
+
+    def _every(self, interval_ms, func):
+        timer = QTimer()
+        timer.timeout.connect(func)
+        timer.start(interval_ms)
+        self.timers.append(timer)
+
+    def start(self):
+        self.detector.start()
+        self.executor.submit(self.feed.snapshot, key='feed', timeout=0, on_success=self._on_snapshot)
+        self._every(10, self.submit_status)
+        self._every(100, self.submit_poll)
+
+        # 超时：任务比超时时间长，应收到 DBTaskTimeout 且界面不等待
+        self.executor.submit(time.sleep, self.args.latency * 2, timeout=self.args.latency,
+                             name='slow_task', on_error=self._on_timeout)
+        # 取消：排在所有工作线程之后的任务取消后不应执行
+        for _ in range(self.args.workers):
+            self.executor.submit(time.sleep, self.args.latency)
+        queued = [self.executor.submit(self.never_runs) for _ in range(10)]
+        for task in queued:
+            task.cancel()
+
+    def stop(self):
+        for timer in self.timers:
+            timer.stop()
+        self.detector.stop()
+        self.executor.shutdown()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='界面线程卡顿检查')
+    parser.add_argument('--latency', type=float, default=0.5, help='每次取连接的延迟(秒)')
+    parser.add_argument('--duration', type=float, default=5, help='运行时间(秒)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--cards', type=int, default=10000)
+    parser.add_argument('--budget-ms', type=float, default=100, help='允许的界面线程最长卡顿')
+    parser.add_argument('--control', action='store_true', help='在界面线程中同步查询（应检测到卡顿）')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    return parser.parse_args(argv)
+
+
+def run(args):
+    """运行一次场景，返回 (场景, 统计结果)"""
+    app = QApplication.instance() or QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        base = SQLiteDatabase(os.path.join(tmp, 'stall.db'))
+        cards = seed_cards(base, args.cards)
+        scenario = Scenario(args, SlowDatabase(base, args.latency), cards)
+
+        scenario.start()
+        QTimer.singleShot(int(args.duration * 1000), app.quit)
+        app.exec_()
+        scenario.stop()
+
+    detector = scenario.detector
+    result = {
+        'args': vars(args),
+        'max_stall_ms': round(detector.max_stall * 1000, 1),
+        'max_lag_ms': round(detector.max_lag * 1000, 1),
+        'stalls': len(detector.stalls),
+        'submitted': scenario.submitted,
+        'executed': scenario.executed,
+        'results': scenario.results
+    }
+    return scenario, result
+
+
+def check(args, scenario, result):
+    """检查结果，返回失败列表"""
+    detector = scenario.detector
+    failures = []
+    if args.control:
+        if not detector.stalls:
+            failures.append('同步查询没有被检测为卡顿')
+        return failures
+
+    if detector.max_stall * 1000 > args.budget_ms:
+        failures.append(f"界面线程卡顿 {result['max_stall_ms']}ms 超出预算")
+    # 合并后状态检查的执行次数受延迟限制，远少于提交次数
+    if scenario.executed['status'] > args.duration / args.latency + 1:
+        failures.append(f"状态检查执行了 {scenario.executed['status']} 次，合并没有生效")
+    if scenario.results['timeouts'] != 1:
+        failures.append('超时任务没有收到 DBTaskTimeout')
+    if scenario.executed['cancelled']:
+        failures.append(f"{scenario.executed['cancelled']} 个已取消的任务仍被执行")
+    if scenario.results['snapshot_rows'] != args.cards:
+        failures.append('全量读取没有完成')
+    return failures
+
+
+def main():
+    args = parse_args()
+    scenario, result = run(args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failures = check(args, scenario, result)
+    for failure in failures:
+        print(f"失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""基准测试数据
+
+- synthetic_bank: 由示例题库生成指定题数的题库文本
+- SQLiteDatabase: 临时文件中的 SQLite 测试库（utils.storage.SQLiteStorage），无需数据库服务
+- MySQLDatabase: 连接本地 MySQL 的独立测试库（不允许使用正式库）
+- seed_cards: 按固定随机种子写入卡密，结果可在不同提交之间对比
+- percentile: 延迟样本的百分位数（样本无需排序）
+"""
+import re
+import glob
+import random
+import string
+import datetime
+
+from utils.question_parser import parse_question
+from utils.storage import SQLiteStorage, MySQLStorage
+from utils.db_crypto import DatabaseCrypto
+from config import DB_CONFIG
+
+SEED = 20240101
+
+
+# ---- 题库 ----
+
+def sample_blocks():
+    """示例题库中能被正确解析的题目块（去掉题号）"""
+    blocks = []
+    for path in sorted(glob.glob('*题库例子.txt')):
+        with open(path, 'r', encoding='utf-8') as f:
+            for block in f.read().split('\n\n'):
+                lines = [line for line in block.strip().split('\n') if line.strip()]
+                if lines and lines[0].strip() in ('一、单选题', '二、单选题', '单选题'):
+                    lines = lines[1:]
+                if parse_question('\n'.join(lines)):
+                    lines[0] = re.sub(r'^\d+\.\s*', '', lines[0].strip())
+                    blocks.append(lines)
+    if not blocks:
+        raise RuntimeError('未找到示例题库（*题库例子.txt），请在项目根目录下运行')
+    return blocks
+
+
+def synthetic_bank(question_count):
+    """生成 question_count 道题的题库文本，题号连续、题干不重复"""
+    blocks = sample_blocks()
+    parts = ['一、单选题']
+    for n in range(question_count):
+        lines = blocks[n % len(blocks)]
+        title = f"{n + 1}.{lines[0]}"
+        if n >= len(blocks):
+            title += f"（{n // len(blocks)}）"
+        parts.append('\n'.join([title] + lines[1:]))
+    return '\n\n'.join(parts) + '\n'
+
+
+# ---- 数据库 ----
+
+class SQLiteDatabase(SQLiteStorage):
+    """临时文件中的 SQLite 测试库"""
+
+    def reset(self):
+        with self.get_connection() as connection:
+            connection.execute("DELETE FROM card_keys")
+            connection.execute("DELETE FROM card_status_change")
+            connection.commit()
+
+
+class MySQLDatabase(MySQLStorage):
+    """本地 MySQL 上的独立测试库，表结构来自 database.sql"""
+
+    def __init__(self, database):
+        if database == DB_CONFIG['database']:
+            raise ValueError(f"不能在正式库 {database} 上运行基准测试")
+        super().__init__(dict(DB_CONFIG, database=database))
+        self.database = database
+
+        connection = self.get_connection(database=None)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}` DEFAULT CHARACTER SET utf8mb4")
+            connection.commit()
+        finally:
+            connection.close()
+        self._create_schema()
+
+    def _create_schema(self):
+        with open('database.sql', 'r', encoding='utf-8') as f:
+            script = '\n'.join(line for line in f if not line.lstrip().startswith('--'))
+        connection = self.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                for statement in script.split(';'):
+                    statement = statement.strip()
+                    if statement and not statement.upper().startswith(('CREATE DATABASE', 'USE ')):
+                        cursor.execute(statement)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def reset(self):
+        connection = self.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("TRUNCATE TABLE card_keys")
+                cursor.execute("TRUNCATE TABLE card_status_change")
+            connection.commit()
+        finally:
+            connection.close()
+
+
+# ---- 统计 ----
+
+def percentile(samples, p):
+    """样本的第 p 百分位数（内部排序，调用方无需预先排序），没有样本时为 0"""
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+# ---- 卡密 ----
+
+def seed_cards(db, count, batch_size=10000, crypto=None):
+    """清空并写入 count 个卡密：约一半已使用并绑定设备，返回 [(卡密, 设备ID, 状态)]
+
+    db 为分片存储时按卡密所在分片写入；crypto 开启列加密时写入盲索引和密文。
+    """
+    crypto = crypto or DatabaseCrypto.get_instance()
+    rng = random.Random(SEED)
+    alphabet = string.ascii_letters + string.digits
+    now = datetime.datetime.now().replace(microsecond=0)
+    cards = []
+    rows = []
+    for n in range(count):
+        card_key = ''.join(rng.choices(alphabet, k=16))
+        # 100 万行也只跨约 12 天，所有卡密都在有效期内
+        valid_days = rng.choice((30, 90, 365))
+        create_time = now - datetime.timedelta(seconds=n)
+        if rng.random() < 0.5:
+            device_id = f"device-{n:08d}"
+            rows.append((card_key, valid_days, create_time, 1, create_time, device_id,
+                         create_time, create_time + datetime.timedelta(days=valid_days)))
+            cards.append((card_key, device_id, 1))
+        else:
+            rows.append((card_key, valid_days, create_time, 0, None, None, None,
+                         create_time + datetime.timedelta(days=valid_days)))
+            cards.append((card_key, None, 0))
+
+    for shard in db.shards():
+        shard.reset()
+    for shard, shard_rows in db.group(rows, key=lambda row: row[0]):
+        connection = shard.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                for start in range(0, len(shard_rows), batch_size):
+                    cursor.executemany("""
+                        INSERT INTO card_keys
+                        (card_key, valid_days, create_time, status, use_time, device_id, bind_time, expiry_time,
+                         card_key_enc, device_id_enc)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """, _encrypt_rows(crypto, shard_rows[start:start + batch_size]))
+            connection.commit()
+        finally:
+            connection.close()
+    return cards
+
+
+def _encrypt_rows(crypto, rows):
+    """卡密和设备ID换成盲索引，并追加两列密文"""
+    if not crypto.enabled:
+        return [row + (None, None) for row in rows]
+    card_keys = [row[0] for row in rows]
+    devices = [row[5] for row in rows]
+    return [(key_index,) + row[1:5] + (device_index,) + row[6:] + (key_enc, device_enc)
+            for row, key_index, device_index, key_enc, device_enc in zip(
+                rows, crypto.index_many('card_key', card_keys), crypto.index_many('device_id', devices),
+                crypto.encrypt_many('card_key', card_keys), crypto.encrypt_many('device_id', devices))]
@@ -15,7 +15,16 @@ APP_CONFIG = {
     'exam': {
         'time_limit': 7200,
         'pass_score': 60,
-        'questions_file': "1231.txt"
+        'questions_file': "1231.txt",
+        'check_delay': 200,             # 选中选项后多久判定(毫秒)
+        'feedback_delay': 800,          # 显示对错多久后进入下一题(毫秒)
+        'drill_mode': False,            # 默认关闭快速刷题，可在答题界面勾选开启
+        'drill_check_delay': 0,         # 快速刷题: 选中即判定
+        'drill_feedback_delay': 0,      # 快速刷题: 立即进入下一题，对错显示在下一题下方
+        'next_question_budget': 16      # 作答到下一题可操作的目标耗时(毫秒，不含上面的延迟)
+    },
+    'admin': {
+        'sync_interval': 5000       # 管理端增量同步间隔(毫秒)
     }
 }
 
@@ -26,14 +35,159 @@ DB_CONFIG = {
     'user': 'root',         # 修改为测试账号
     'password': '******',   # 修改为测试密码
     'database': 'exam_db',  # 修改为测试数据库名
-    'pool_size': 5,
-    'auth_plugin': 'mysql_native_password',
-    'charset': 'utf8mb4',
-    'connect_timeout': 30,
-    'connection_attempts': 3,
-    'connection_timeout': 10000,
-    'pool_reset_session': True
+    'charset': 'utf8mb4'
+}
+
+# 存储后端配置（utils/storage.py）
+STORAGE_CONFIG = {
+    'backend': 'mysql',         # mysql / sqlite（单机部署，无需数据库服务）
+    'sqlite_path': 'data/exam.db',
+    # 管理端只读查询使用的副本：MySQL 为覆盖 DB_CONFIG 的字典（如 {'host': 'replica1'}），
+    # SQLite 为文件路径
+    'replicas': [],
+    'max_replica_lag': 2,       # 副本延迟超过该值(秒)时不使用，不应超过变更同步的回看窗口(2秒)
+    'sticky_seconds': 5,        # 管理端写入后该时间(秒)内读取仍走主库，应大于 max_replica_lag
+    'lag_check_interval': 5,    # 副本延迟检查间隔(秒)
+    # 分片：写法与 replicas 相同，为空时不分片。槽位表在第一个分片上，分片部署不使用 replicas
+    'shards': [],
+    'slots': 1024,              # 哈希槽数量，部署后不能修改
+    'slot_map_refresh': 10,     # 槽位表重新读取的间隔(秒)，重新分片时据此等待各进程生效
+    'sqlite_pragmas': {
+        'journal_mode': 'WAL',      # 读写互不阻塞
+        'synchronous': 'NORMAL',    # WAL 下只在检查点时 fsync
+        'busy_timeout': 5000,       # 等待写锁的时间(毫秒)
+        'cache_size': -16000,       # 页缓存 16MB
+        'temp_store': 'MEMORY',
+        'mmap_size': 268435456      # 256MB 内存映射读
+    }
+}
+
+# 数据库列加密配置（utils/db_crypto.py）：card_key/device_id 保存盲索引，原值 AES-GCM 加密
+DB_CRYPTO_CONFIG = {
+    'enabled': False,           # 开启前先生成密钥并执行 python -m utils.db_crypto --migrate
+    'key_env': 'EXAM_DB_KEY',   # 主密钥（base64）环境变量，优先于密钥文件
+    'key_file': 'db.key'        # 主密钥文件（32 字节）
+}
+
+# Redis缓存配置
+REDIS_CONFIG = {
+    'host': 'localhost',
+    'port': 6379,
+    'db': 0,
+    'password': None,
+    'decode_responses': False,
+    'socket_timeout': 0.5,      # Redis 操作超时(秒)，超时后按不可用处理
+    'expire_time': 3600,        # Redis 缓存过期时间(秒)
+    'l1_max_size': 1024,        # 进程内缓存最大条目数
+    'l1_ttl': 30,               # 进程内缓存过期时间(秒)
+    'retry_interval': 30,       # Redis 出错后多久再重试(秒)
+    'compression': 'zlib',      # 缓存压缩方式: none / zlib / lzma
+    'compress_threshold': 1024  # 超过该字节数才压缩
+}
+
+# 卡密布隆过滤器配置
+BLOOM_CONFIG = {
+    'enabled': True,
+    'error_rate': 0.001,        # 过滤器误判率
+    'min_capacity': 100000,     # 过滤器最小容量
+    'negative_ttl': 30,         # 负缓存过期时间(秒)
+    'negative_max_size': 10000, # 负缓存最大条目数
+    'rebuild_interval': 3600    # 管理端全量重建间隔(秒)
+}
+
+# 卡密信息缓存配置（管理端 CardAuth）
+CARD_CACHE_CONFIG = {
+    'max_size': 1024,           # 最多缓存的卡密数量
+    'ttl': 60                   # 缓存过期时间(秒)
+}
+
+# 限流配置（rate: 每秒补充的令牌数，burst: 桶容量）
+RATE_LIMIT_CONFIG = {
+    'enabled': True,
+    'backend': 'redis',         # redis / local，Redis 不可用时自动使用 local
+    'max_local_keys': 10000,    # 进程内最多保留的令牌桶数量
+    'verify': {'rate': 0.2, 'burst': 5},    # 卡密验证
+    'status': {'rate': 0.2, 'burst': 3}     # 卡密状态检查（正常每10秒一次）
+}
+
+# 过期卡密清理配置
+SWEEPER_CONFIG = {
+    'enabled': True,
+    'interval': 3600,           # 两轮清理之间的间隔(秒)
+    'batch_size': 1000,         # 每批处理的行数
+    'batch_pause': 0.5,         # 批次之间的暂停(秒)
+    'archive_after_days': 30    # 过期多少天后移入归档表
+}
+
+# 性能指标配置
+METRICS_CONFIG = {
+    'flush_interval': 10,           # 指标批量刷新间隔(秒)
+    'sink': 'redis',                # redis 或 file；Redis 不可用时自动写文件
+    'file': 'logs/metrics.jsonl'    # 文件输出路径
+}
+
+# 系统监控配置
+MONITOR_CONFIG = {
+    'enabled': True,
+    'host': '127.0.0.1',        # 指标服务只监听本机
+    'admin_port': 9108,         # 管理端指标端口
+    'client_port': 9109,        # 客户端指标端口
+    'sample_interval': 15,      # 资源采样间隔(秒)
+    'thresholds': {
+        'memory_percent': 90,   # 系统内存占用(%)
+        'cpu_percent': 90,      # 系统CPU占用(%)
+        'disk_percent': 90,     # 磁盘占用(%)
+        'rss_mb': 500           # 进程常驻内存(MB)
+    }
+}
+
+# SQL 语句统计配置
+QUERY_STATS_CONFIG = {
+    'enabled': True,
+    'slow_threshold': 0.2,              # 慢查询阈值(秒)，超过时写入 slow_query 日志（参数已脱敏）
+    'max_statements': 500               # 最多统计的不同语句数
+}
+
+# 设备指纹配置
+FINGERPRINT_CONFIG = {
+    'providers': ['wmi', 'linux', 'node'],  # 按顺序尝试，不适用于当前平台的自动跳过
+    'cache_file': 'device_id.json',         # 封签后的指纹缓存
+    'revalidate_after': 7 * 24 * 3600       # 缓存超过该时间(秒)后在后台重新核对
+}
+
+# 数据库任务执行器配置（界面线程不直接访问数据库）
+DB_EXECUTOR_CONFIG = {
+    'workers': 4,               # 执行数据库任务的线程数
+    'timeout': 15,              # 任务超时(秒)，超时后丢弃结果并提示
+    'stall_detector': True,     # 检测界面线程卡顿并记录调用栈
+    'stall_threshold': 0.2      # 界面线程超过该时间(秒)无响应记为一次卡顿
+}
+
+# 数据库熔断与重试配置
+RESILIENCE_CONFIG = {
+    'failure_threshold': 3,     # 连续失败多少次后熔断
+    'reset_timeout': 15,        # 熔断多久后放行一次探测(秒)
+    'attempts': 3,              # 每次调用最多尝试次数
+    'backoff_base': 0.2,        # 退避基数(秒)，第 n 次重试前随机等待 [0, base * 2^n]
+    'backoff_cap': 2.0,         # 单次退避上限(秒)
+    'deadline': 8,              # 每次调用（含重试）的截止时间(秒)
+    'connect_timeout': 5        # 建立连接的超时(秒)，不超过剩余截止时间
 }
 
 # 日志配置
-LOG_DIR = 'logs' 
\ No newline at end of file
+LOG_DIR = 'logs'
+
+LOGGING_CONFIG = {
+    'file': 'logs/app.jsonl',   # 唯一的日志文件（JSON 行），由后台线程写入
+    'max_bytes': 5 * 1024 * 1024,
+    'backup_count': 5,
+    'console': False,           # 同时输出到控制台
+    'queue_size': 10000,        # 队列满时丢弃新日志，不阻塞调用方
+    'level': 'INFO',
+    'levels': {                 # 按模块设置级别
+        'slow_query': 'INFO',
+        'utils.monitor': 'INFO',
+        'utils.db_executor': 'INFO',
+        'urllib3': 'WARNING'
+    }
+}
\ No newline at end of file
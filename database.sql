@@ -4,19 +4,69 @@ USE exam_db;
 
 CREATE TABLE IF NOT EXISTS card_keys (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    card_key VARCHAR(32) NOT NULL UNIQUE,
+    card_key VARCHAR(32) NOT NULL UNIQUE,       -- 开启列加密时为盲索引（utils/db_crypto.py）
+    card_key_enc VARBINARY(64) NULL,            -- AES-GCM 密文，未开启列加密时为 NULL
     valid_days INT NOT NULL,
     create_time DATETIME NOT NULL,
     status TINYINT NOT NULL DEFAULT 0,
     use_time DATETIME NULL,
     device_id VARCHAR(64) NULL,
+    device_id_enc VARBINARY(128) NULL,
     bind_time DATETIME NULL,
-    expiry_time DATETIME NULL
+    expiry_time DATETIME NULL,
+    version INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+    INDEX idx_updated_at (updated_at),
+    INDEX idx_status_expiry (status, expiry_time)
+);
+
+-- 过期较久的卡密由清理器(utils/sweeper.py)分批移入此表
+CREATE TABLE IF NOT EXISTS card_keys_archive (
+    id INT PRIMARY KEY,
+    card_key VARCHAR(32) NOT NULL,
+    card_key_enc VARBINARY(64) NULL,
+    valid_days INT NOT NULL,
+    create_time DATETIME NOT NULL,
+    status TINYINT NOT NULL,
+    use_time DATETIME NULL,
+    device_id VARCHAR(64) NULL,
+    device_id_enc VARBINARY(128) NULL,
+    bind_time DATETIME NULL,
+    expiry_time DATETIME NULL,
+    archived_at DATETIME NOT NULL,
+    INDEX idx_card_key (card_key)
 );
 
 CREATE TABLE IF NOT EXISTS card_status_change (
     id INT AUTO_INCREMENT PRIMARY KEY,
     card_key VARCHAR(32) NOT NULL,
     change_type VARCHAR(20) NOT NULL,
-    change_time DATETIME NOT NULL
-); 
\ No newline at end of file
+    change_time DATETIME NOT NULL,
+    INDEX idx_card_key (card_key)
+);
+
+-- 分片部署时每个哈希槽所在的分片（只在第一个分片上使用），由 utils/reshard.py 维护
+CREATE TABLE IF NOT EXISTS card_shard_slots (
+    slot INT PRIMARY KEY,
+    shard INT NOT NULL,
+    moving_to INT NULL
+);
+
+-- 每次修改卡密时递增版本号，管理端据此跳过未变化的行
+DROP TRIGGER IF EXISTS card_keys_version;
+CREATE TRIGGER card_keys_version BEFORE UPDATE ON card_keys
+FOR EACH ROW SET NEW.version = OLD.version + 1;
+
+-- 旧库升级（已有 card_keys 表时执行一次）:
+-- ALTER TABLE card_keys
+--     ADD COLUMN version INT NOT NULL DEFAULT 0,
+--     ADD COLUMN updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+--     ADD INDEX idx_updated_at (updated_at),
+--     ADD INDEX idx_status_expiry (status, expiry_time);
+-- ALTER TABLE card_status_change ADD INDEX idx_card_key (card_key); 
+-- ALTER TABLE card_keys
+--     ADD COLUMN card_key_enc VARBINARY(64) NULL AFTER card_key,
+--     ADD COLUMN device_id_enc VARBINARY(128) NULL AFTER device_id;
+-- ALTER TABLE card_keys_archive
+--     ADD COLUMN card_key_enc VARBINARY(64) NULL AFTER card_key,
+--     ADD COLUMN device_id_enc VARBINARY(128) NULL AFTER device_id;
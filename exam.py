@@ -1,115 +1,213 @@
 import sys
+import time
 import random
 import json
 import os
-import mysql.connector
+import logging
 import datetime
-import wmi
-import uuid
-import hashlib
 from PyQt5 import QtCore, QtGui
-from PyQt5.QtWidgets import *
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont
-from dbutils.pooled_db import PooledDB
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                             QLabel, QPushButton, QLineEdit, QCheckBox, QMessageBox,
+                             QFileDialog, QGroupBox, QFrame, QScrollArea, QButtonGroup,
+                             QAction, QStackedWidget, QShortcut)
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
+from PyQt5.QtGui import QFont, QKeySequence
+from utils import startup
 from utils.protection import AntiDebug
-from config import APP_CONFIG
-
-class DatabasePool:
-    _instance = None
-    _pool = None
-    
-    DB_CONFIG = {
-        'host': 'localhost',     # 修改为本地测试数据库
-        'user': 'root',         # 修改为测试账号
-        'password': '******',   # 修改为测试密码
-        'database': 'exam_db',  # 修改为测试数据库名
-        'port': 3306,
-        'charset': 'utf8mb4',
-        'connect_timeout': 60
-    }
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(DatabasePool, cls).__new__(cls)
-        return cls._instance
-        
-    def __init__(self):
-        if self._pool is None:
-            try:
-                for attempt in range(self.DB_CONFIG.get('connection_attempts', 3)):
-                    try:
-                        self._pool = PooledDB(
-                            creator=mysql.connector,
-                            maxconnections=20,
-                            mincached=2,
-                            maxcached=5,
-                            blocking=True,
-                            maxusage=None,
-                            ping=1,
-                            host=self.DB_CONFIG['host'],
-                            user=self.DB_CONFIG['user'],
-                            password=self.DB_CONFIG['password'],
-                            database=self.DB_CONFIG['database'],
-                            port=self.DB_CONFIG['port'],
-                            charset=self.DB_CONFIG['charset'],
-                            auth_plugin='mysql_native_password',
-                            use_pure=True,
-                            connect_timeout=self.DB_CONFIG.get('connect_timeout', 30),
-                            connection_timeout=self.DB_CONFIG.get('connection_timeout', 10000),
-                            pool_reset_session=self.DB_CONFIG.get('pool_reset_session', True)
-                        )
-                        print(f"数据库连接成功 (尝试 {attempt + 1})")
-                        break
-                    except Exception as e:
-                        if attempt == self.DB_CONFIG.get('connection_attempts', 3) - 1:
-                            raise
-                        print(f"连接失败 (尝试 {attempt + 1}): {str(e)}")
-                        import time
-                        time.sleep(2)  # 等待2秒后重试
-            except Exception as e:
-                print(f"初始化连接池失败: {str(e)}")
-                raise
-    
-    def get_connection(self):
-        """获取数据库连接"""
+from utils.question_parser import parse_questions
+from utils.exam_session import ExamSession
+from utils.fingerprint import DeviceFingerprint
+from utils import key_format
+from utils.card_queries import fetch_card, activate_card, fetch_card_status, is_bound_to
+from utils.db_executor import DBExecutor, DBTaskTimeout
+from utils.stall_detector import StallDetector
+from utils.log import setup_logging
+from utils.resilience import CircuitBreaker, CircuitOpen, OPEN, CLOSED
+from utils.storage import get_storage
+from utils.metrics import MetricsRegistry
+from config import APP_CONFIG, MONITOR_CONFIG, DB_EXECUTOR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 答题快捷键: A-D 或 1-4 选择选项，左右方向键回看
+ANSWER_KEYS = ('A', 'B', 'C', 'D')
+
+# wmi、mysql.connector、dbutils、redis 等较重的模块在后台初始化时才导入，
+# 让窗口先显示出来
+
+class StartupWorker(QThread):
+    """后台初始化：机器码、数据库连接池、卡密过滤器和限流器"""
+    succeeded = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, get_machine_code, parent=None):
+        super().__init__(parent)
+        self.get_machine_code = get_machine_code
+
+    def run(self):
         try:
-            return self._pool.connection()
+            from utils.bloom import CardKeyShield
+            from utils.rate_limit import RateLimiter
+
+            # 指纹在自己的线程中计算，与建立连接池并行
+            db_pool = get_storage(pooled=True)
+            device_id = self.get_machine_code()
+            for shard in db_pool.shards():
+                shard.get_connection().close()  # 确认数据库可用
+            self.succeeded.emit({
+                'device_id': device_id,
+                'db_pool': db_pool,
+                'key_shield': CardKeyShield.get_instance(),
+                'rate_limiter': RateLimiter.get_instance()
+            })
         except Exception as e:
-            print(f"获取数据库连接失败: {str(e)}")
-            raise
+            self.failed.emit(str(e))
+
+
+class QuestionPanel(QWidget):
+    """题目、选项按钮和选项文本
+
+    答题界面有两块交替显示：作答时另一块已排好下一题，作答后只需切换。
+    """
+    option_clicked = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.question = None
+        
+        # 题目标签
+        self.question_label = QLabel()
+        self.question_label.setWordWrap(True)
+        self.question_label.setStyleSheet("""
+            QLabel {
+                font-size: 14px;
+                padding: 10px;
+                background: white;
+                border-radius: 4px;
+            }
+        """)
+        layout.addWidget(self.question_label)
+        
+        # 选项按钮
+        self.option_group = QButtonGroup(self)
+        self.option_buttons = []
+        option_layout = QHBoxLayout()
+        
+        for i, letter in enumerate(ANSWER_KEYS):
+            btn = QPushButton(letter)
+            btn.setCheckable(True)
+            btn.setFixedSize(50, 50)
+            self.option_buttons.append(btn)
+            self.option_group.addButton(btn, i)
+            option_layout.addWidget(btn)
+            btn.clicked.connect(self.option_clicked)
+        
+        layout.addLayout(option_layout)
+        
+        # 选项文本
+        self.option_labels = []
+        for i in range(len(ANSWER_KEYS)):
+            label = QLabel()
+            label.setWordWrap(True)
+            label.setStyleSheet("padding: 5px;")
+            self.option_labels.append(label)
+            layout.addWidget(label)
+
+    def set_question(self, question, number, total, answer=None):
+        """填入题目；answer 不为空时为回看，选中该选项并禁止作答"""
+        self.question = question
+        progress = f'进度: {number}/{total} ({number / total * 100:.1f}%)\n\n'
+        self.question_label.setText(progress + f'题目 {number}:\n{question["title"]}')
+        for i, label in enumerate(self.option_labels):
+            label.setText(question['options'][i] if i < len(question['options']) else '')
+        
+        # 互斥的按钮组不允许直接取消选中
+        self.option_group.setExclusive(False)
+        for letter, btn in zip(ANSWER_KEYS, self.option_buttons):
+            btn.setChecked(letter == answer)
+            btn.setEnabled(answer is None)
+        self.option_group.setExclusive(True)
+        
+        # 隐藏时也完成排版，切换过来后无需再计算
+        self.layout().activate()
+
+    def checked_answer(self):
+        button = self.option_group.checkedButton()
+        return ANSWER_KEYS[self.option_group.id(button)] if button else None
+
+    def select(self, index):
+        """用键盘选择选项，选项不存在或不可用时返回 False"""
+        btn = self.option_buttons[index]
+        if index >= len(self.question['options']) or not btn.isEnabled():
+            return False
+        btn.setChecked(True)
+        return True
+
+    def lock(self):
+        for btn in self.option_buttons:
+            btn.setEnabled(False)
+
 
 class ExamSystem(QMainWindow):
+    # 卡密状态检查间隔(毫秒)
+    CHECK_INTERVAL = 10000
+    # 被限流时最多退避 2^5 倍检查间隔
+    MAX_CHECK_BACKOFF = 5
+    # 熔断状态变化（名称, 新状态），可能从工作线程发出
+    breaker_changed = pyqtSignal(str, str)
+
     def __init__(self):
         super().__init__()
         
         # 启动保护
         AntiDebug.start_protection()
         
-        # 使用数据库连接池
-        self.db_pool = DatabasePool()
-        self.db_connection = self.db_pool.get_connection()
+        # 尽早开始计算设备指纹（有缓存时只做校验）
+        DeviceFingerprint.get_instance().prefetch()
+        
+        # 数据库连接池、机器码等由 StartupWorker 在后台初始化
+        self.db_pool = None
+        self.startup_worker = None
+        
+        # 数据库查询在线程池中执行，界面线程只处理结果
+        self.db_executor = DBExecutor.get_instance()
+        self.stall_detector = None
+        if DB_EXECUTOR_CONFIG['stall_detector']:
+            self.stall_detector = StallDetector(parent=self)
+            self.stall_detector.start()
         
         # 验证相关属性
         self.is_activated = False
         self.expiry_time = None
         self.current_card_key = None
-        self.device_id = self.get_machine_code()
+        self.device_id = None
+        self.key_shield = None
+        self.rate_limiter = None
+        self.check_backoff = 0
+        self._painted = False
         
         # 考试相关属性
         self.questions = []
         self.wrong_questions = []
-        self.current_question = None
-        self.score = 0
-        self.answered = 0
-        self.total_questions = 10
-        self.question_history = []
-        self.current_index = -1
+        self.session = None   # 进行中的答题（utils/exam_session.py）
+        self.drill_mode = APP_CONFIG['exam']['drill_mode']
+        self._answered_at = None
+        self._next_question_latency = MetricsRegistry.get_instance().histogram('exam_next_question')
         self.current_subject = "题库"
         
         # 初始化UI
         self.init_ui()
         
+        # 数据库熔断期间在状态栏显示离线提示，已激活的卡密继续可用
+        self.degraded_label = QLabel('服务器暂时不可用，正在自动重试')
+        self.degraded_label.setStyleSheet('color: #F56C6C; padding: 0 8px;')
+        self.degraded_label.hide()
+        self.statusBar().addPermanentWidget(self.degraded_label)
+        self.breaker_changed.connect(self.on_breaker_changed)
+        CircuitBreaker.watch(lambda name, old, new: self.breaker_changed.emit(name, new))
+        
         # 状态更新计时器
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_time_display)
@@ -118,17 +216,77 @@ class ExamSystem(QMainWindow):
         # 卡密状态检查计时器
         self.check_timer = QTimer()
         self.check_timer.timeout.connect(self.check_card_status)
-        self.check_timer.start(10000)
+        self.check_timer.start(self.CHECK_INTERVAL)
+        
+        self.start_background_init()
+        
+        # 添加菜单栏
+        self.create_menu()
+
+    def start_background_init(self):
+        """在后台线程中连接数据库、计算机器码"""
+        if self.startup_worker and self.startup_worker.isRunning():
+            return
+        self.auth_btn.setEnabled(False)
+        self.statusBar().showMessage('正在连接服务器...')
+        self.startup_worker = StartupWorker(self.get_machine_code, self)
+        self.startup_worker.succeeded.connect(self.on_startup_ready)
+        self.startup_worker.failed.connect(self.on_startup_failed)
+        self.startup_worker.start()
+
+    def on_startup_ready(self, resources):
+        """后台初始化完成"""
+        self.device_id = resources['device_id']
+        self.db_pool = resources['db_pool']
+        self.key_shield = resources['key_shield']
+        self.rate_limiter = resources['rate_limiter']
+        self.auth_btn.setEnabled(True)
+        self.statusBar().showMessage('服务器连接成功', 3000)
+        startup.mark('ready')
+        
+        # 本地指标服务
+        from utils.metrics import MetricsRegistry
+        from utils.monitor import SystemMonitor
+        MetricsRegistry.get_instance().register_gauges('db_pool', self.db_pool.stats)
+        self.monitor = SystemMonitor(db=self.db_pool)
+        if MONITOR_CONFIG['enabled']:
+            self.monitor.start(MONITOR_CONFIG['client_port'])
         
         # 加载保存的卡密
         saved_card = self.load_config()
         if saved_card:
+            saved_card = key_format.normalize(saved_card)
             self.card_input.setText(saved_card)
             self.remember_checkbox.setChecked(True)  # 如果有保存的卡密，自动勾选复选框
-            QTimer.singleShot(500, lambda: self.verify_card(saved_card, self.device_id))
-        
-        # 添加菜单栏
-        self.create_menu()
+            self.verify_card(saved_card, self.device_id)
+
+    def on_startup_failed(self, message):
+        """后台初始化失败，点击验证按钮时重试"""
+        self.auth_btn.setEnabled(True)
+        self.statusBar().showMessage(f'连接服务器失败: {message}')
+        startup.mark('startup_failed')
+
+    def on_breaker_changed(self, name, state):
+        """数据库熔断时显示离线提示，恢复后立即检查一次卡密状态"""
+        if state == OPEN:
+            self.degraded_label.show()
+        elif state == CLOSED and self.degraded_label.isVisible():
+            self.degraded_label.hide()
+            self.statusBar().showMessage('服务器连接已恢复', 3000)
+            self.check_card_status()
+
+    def closeEvent(self, event):
+        """关闭窗口时丢弃未完成的数据库任务"""
+        self.db_executor.shutdown()
+        if self.stall_detector:
+            self.stall_detector.stop()
+        super().closeEvent(event)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            startup.mark('first_paint')
 
     def init_ui(self):
         self.setWindowTitle("考试刷题系统 - By 记得晚安")
@@ -187,8 +345,8 @@ class ExamSystem(QMainWindow):
         self.card_input.setPlaceholderText('请输入卡密...')
         self.card_input.setFixedWidth(200)
         
-        auth_btn = QPushButton('验证卡密')
-        auth_btn.clicked.connect(self.verify_card_clicked)
+        self.auth_btn = QPushButton('验证卡密')
+        self.auth_btn.clicked.connect(self.verify_card_clicked)
         
         # 添加记住卡密复选框
         self.remember_checkbox = QCheckBox('记住卡密')
@@ -204,7 +362,7 @@ class ExamSystem(QMainWindow):
         
         auth_layout.addWidget(QLabel('卡密:'))
         auth_layout.addWidget(self.card_input)
-        auth_layout.addWidget(auth_btn)
+        auth_layout.addWidget(self.auth_btn)
         auth_layout.addWidget(self.remember_checkbox)  # 添加到布局
         auth_layout.addStretch()
         
@@ -261,43 +419,14 @@ class ExamSystem(QMainWindow):
         self.exam_widget = QWidget()
         self.exam_layout = QVBoxLayout(self.exam_widget)
         
-        # 题目标签
-        self.question_label = QLabel()
-        self.question_label.setWordWrap(True)
-        self.question_label.setStyleSheet("""
-            QLabel {
-                font-size: 14px;
-                padding: 10px;
-                background: white;
-                border-radius: 4px;
-            }
-        """)
-        self.exam_layout.addWidget(self.question_label)
-        
-        # 选项按钮
-        self.option_group = QButtonGroup()
-        self.option_buttons = []
-        option_layout = QHBoxLayout()
-        
-        for i, letter in enumerate(['A', 'B', 'C', 'D']):
-            btn = QPushButton(letter)
-            btn.setCheckable(True)
-            btn.setFixedSize(50, 50)
-            self.option_buttons.append(btn)
-            self.option_group.addButton(btn, i)
-            option_layout.addWidget(btn)
-            btn.clicked.connect(self.auto_check_answer)
-        
-        self.exam_layout.addLayout(option_layout)
-        
-        # 选项文本
-        self.option_labels = []
-        for i in range(4):
-            label = QLabel()
-            label.setWordWrap(True)
-            label.setStyleSheet("padding: 5px;")
-            self.option_labels.append(label)
-            self.exam_layout.addWidget(label)
+        # 题目和选项（两块交替显示，见 QuestionPanel）
+        self.question_stack = QStackedWidget()
+        for _ in range(2):
+            panel = QuestionPanel()
+            panel.option_clicked.connect(self.auto_check_answer)
+            self.question_stack.addWidget(panel)
+        self.exam_layout.addWidget(self.question_stack)
+        self._prefetched = None
         
         # 结果标签
         self.result_label = QLabel()
@@ -320,6 +449,24 @@ class ExamSystem(QMainWindow):
         
         self.exam_layout.addLayout(nav_layout)
         
+        # 快速刷题：不等待（或按配置缩短）判定和显示对错的时间
+        self.drill_checkbox = QCheckBox('快速刷题（A-D/1-4 作答，←→ 回看）')
+        self.drill_checkbox.setChecked(APP_CONFIG['exam']['drill_mode'])
+        self.drill_checkbox.toggled.connect(self.set_drill_mode)
+        self.exam_layout.addWidget(self.drill_checkbox)
+        
+        # 答题快捷键，只在答题区域有焦点时生效
+        self.exam_widget.setFocusPolicy(Qt.StrongFocus)
+        for index, letter in enumerate(ANSWER_KEYS):
+            for key in (letter, str(index + 1)):
+                shortcut = QShortcut(QKeySequence(key), self.exam_widget)
+                shortcut.setContext(Qt.WidgetWithChildrenShortcut)
+                shortcut.activated.connect(lambda index=index: self.answer_with_key(index))
+        for key, slot in ((Qt.Key_Left, self.show_previous), (Qt.Key_Right, self.show_next)):
+            shortcut = QShortcut(QKeySequence(key), self.exam_widget)
+            shortcut.setContext(Qt.WidgetWithChildrenShortcut)
+            shortcut.activated.connect(slot)
+        
         # 暂停按钮
         self.pause_btn = QPushButton('暂停答题')
         self.pause_btn.clicked.connect(self.pause_exam)
@@ -341,188 +488,250 @@ class ExamSystem(QMainWindow):
         layout.addWidget(author_label)
 
     def get_machine_code(self):
-        """获取机器码"""
-        try:
-            c = wmi.WMI()
-            cpu = c.Win32_Processor()[0].ProcessorId.strip()
-            board = c.Win32_BaseBoard()[0].SerialNumber.strip()
-            bios = c.Win32_BIOS()[0].SerialNumber.strip()
-            machine_code = f"{cpu}-{board}-{bios}"
-            return hashlib.md5(machine_code.encode()).hexdigest()
-        except:
-            return hashlib.md5(str(uuid.getnode()).encode()).hexdigest()
+        """获取机器码：缓存有效时立即返回，否则等待后台线程枚举硬件"""
+        return DeviceFingerprint.get_instance().device_id()
 
     def verify_card(self, card_key, device_id):
-        """验证卡密"""
-        try:
-            cursor = self.db_connection.cursor()
+        """验证卡密（查询在后台线程中执行，完成后回到界面线程）"""
+        self.auth_btn.setEnabled(False)
+        self.statusBar().showMessage('正在验证卡密...')
+        self.db_executor.submit(
+            self._verify_card_task, card_key, device_id,
+            key=('verify', card_key),
+            on_success=lambda outcome: self.on_card_verified(card_key, outcome),
+            on_error=self.on_verify_failed
+        )
+
+    def _verify_card_task(self, card_key, device_id):
+        """在工作线程中验证卡密，返回 (是否成功, 提示, 到期时间)
+
+        只访问数据库、过滤器和限流器，不能操作界面控件。
+        """
+        # 保存的卡密也会走到这里（可能是旧版保存的小写或带连字符的写法），
+        # 格式不对的不访问限流器和数据库
+        card_key = key_format.normalize(card_key)
+        reason = key_format.check(card_key)
+        if reason:
+            return False, f'卡密{reason}', None
+
+        self.rate_limiter.enforce('verify', device_id, card_key)
             
-            # 检查卡密是否存在
-            cursor.execute("""
-                SELECT status, device_id, expiry_time 
-                FROM card_keys 
-                WHERE card_key = %s
-            """, (card_key,))
+        # 过滤器确定不存在的卡密直接拒绝，不访问数据库
+        if not self.key_shield.might_exist(card_key):
+            return False, '卡密不存在', None
             
-            result = cursor.fetchone()
-            if not result:
-                QMessageBox.warning(self, '错误', '卡密不存在')
-                return
+        shard = self.db_pool.shard(card_key)
+        while shard is not None:
+            connection = shard.get_connection()
+            cursor = None
+            try:
+                cursor = self.db_pool.tuple_cursor(connection)
                 
-            status, bound_device, expiry_time = result
+                # 检查卡密是否存在（重新分片期间可能刚被迁走，到重新解析的分片上再查）
+                result = fetch_card(cursor, card_key)
+                if not result:
+                    shard = self.db_pool.reroute(card_key, shard)
+                    continue
+                    
+                status, bound_device, expiry_time = result
+                
+                # 检查是否已使用
+                if status == 1:
+                    # 如果已使用，检查是否是当前设备
+                    if not is_bound_to(bound_device, device_id):
+                        return False, '卡密已被其他设备使用', None
+                
+                # 检查是否过期
+                if datetime.datetime.now() > expiry_time:
+                    return False, '卡密已过期', None
+                    
+                # 如果未使用，进行首次激活
+                if status == 0:
+                    activate_card(cursor, card_key, device_id)
+                    connection.commit()
+                
+                return True, '卡密验证成功!', expiry_time
+            finally:
+                if cursor:
+                    cursor.close()
+                connection.close()
+
+        if not self.db_pool.is_moving(card_key):
+            self.key_shield.remember_missing(card_key)
+        return False, '卡密不存在', None
+
+    def on_card_verified(self, card_key, outcome):
+        """卡密验证完成"""
+        self.auth_btn.setEnabled(True)
+        self.statusBar().clearMessage()
+        
+        ok, message, expiry_time = outcome
+        if not ok:
+            QMessageBox.warning(self, '错误', message)
+            return
             
-            # 检查是否已使用
-            if status == 1:
-                # 如果已使用，检查是否是当前设备
-                if bound_device != device_id:
-                    QMessageBox.warning(self, '错误', '卡密已被其他设备使用')
-                    return
+        self.is_activated = True
+        self.expiry_time = expiry_time
+        self.current_card_key = card_key
+        
+        # 根据复选框状态决定是否保存卡密
+        if self.remember_checkbox.isChecked():
+            self.save_config()
+        else:
+            # 如果不记住卡密，删除配置文件
+            try:
+                os.remove('config.json')
+            except:
+                pass
+        
+        # 启用功能按钮
+        self.import_btn.setEnabled(True)
+        self.start_btn.setEnabled(bool(self.questions))
+        self.wrong_btn.setEnabled(bool(self.questions))
+        
+        QMessageBox.information(self, '成功', message)
+
+    def on_verify_failed(self, error):
+        """卡密验证出错（限流、超时或数据库错误）"""
+        from utils.rate_limit import RateLimited
+        
+        self.auth_btn.setEnabled(True)
+        self.statusBar().clearMessage()
+        if isinstance(error, RateLimited):
+            QMessageBox.warning(self, '提示', f'操作过于频繁，请 {error.retry_after:.0f} 秒后再试')
+        elif isinstance(error, DBTaskTimeout):
+            QMessageBox.critical(self, '错误', '验证失败: 服务器响应超时，请稍后重试')
+        elif isinstance(error, CircuitOpen):
+            QMessageBox.warning(self, '提示', f'服务器暂时不可用，请 {error.retry_after:.0f} 秒后再试')
+        else:
+            QMessageBox.critical(self, '错误', f'验证失败: {str(error)}')
+
+    def check_card_status(self):
+        """检查卡密状态（同一张卡密同时只有一个检查在执行）"""
+        if not self.is_activated or not self.current_card_key:
+            return
             
-            # 检查是否过期
-            if datetime.datetime.now() > expiry_time:
-                QMessageBox.warning(self, '错误', '卡密已过期')
-                return
+        card_key = self.current_card_key
+        self.db_executor.submit(
+            self._check_card_status_task, card_key, self.device_id,
+            key=('status', card_key),
+            on_success=lambda outcome: self.on_card_status(card_key, outcome),
+            on_error=lambda error: self.on_card_status_failed(card_key, error)
+        )
+
+    def _check_card_status_task(self, card_key, device_id):
+        """在工作线程中检查卡密状态，返回 (处理方式, 参数)
+
+        处理方式: backoff(需等待秒数) / deactivate(提示) / ok((到期时间, 剩余天数)) / ignore
+        """
+        retry_after = self.rate_limiter.check('status', device_id, card_key)
+        if retry_after > 0:
+            return 'backoff', retry_after
+            
+        result = None
+        shard = self.db_pool.shard(card_key)
+        while shard is not None and not result:
+            cursor = None
+            connection = None
+            try:
+                # 从连接池获取连接
+                connection = shard.get_connection()
+                cursor = self.db_pool.tuple_cursor(connection)
                 
-            # 如果未使用，进行首次激活
-            if status == 0:
-                cursor.execute("""
-                    UPDATE card_keys 
-                    SET device_id = %s,
-                        status = 1,
-                        use_time = NOW(),
-                        bind_time = NOW()
-                    WHERE card_key = %s
-                """, (device_id, card_key))
-                self.db_connection.commit()
+                # 使用一次查询获取所有需要的信息
+                result = fetch_card_status(cursor, card_key)
+            finally:
+                if cursor:
+                    cursor.close()
+                if connection:
+                    connection.close()
+            if not result:
+                # 重新分片期间可能刚被迁走，到重新解析的分片上再查
+                shard = self.db_pool.reroute(card_key, shard)
             
-            self.is_activated = True
-            self.expiry_time = expiry_time
-            self.current_card_key = card_key
+        if not result:
+            if self.db_pool.is_moving(card_key):
+                # 迁移中的卡密查不到时不停用，下次检查再确认
+                logger.info(f"迁移中的卡密暂时查不到: {card_key}")
+                return 'ignore', None
+            logger.info(f"卡密已被删除: {card_key}")
+            return 'deactivate', "卡密已被删除，请重新购买"
             
-            # 根据复选框状态决定是否保存卡密
-            if self.remember_checkbox.isChecked():
-                self.save_config()
-            else:
-                # 如果不记住卡密，删除配置文件
-                try:
-                    os.remove('config.json')
-                except:
-                    pass
+        (status, bound_device, expiry_time, valid_days, 
+         use_time, remaining_days, change_type, change_time) = result
+        
+        # 检查状态变更
+        if change_type:
+            message = {
+                'reset': "卡密已被重置，请重新验证",
+                'unbind': "卡密已被解绑，请重新验证",
+                'disable': "卡密已被禁用"
+            }.get(change_type)
+            return ('deactivate', message) if message else ('ignore', None)
             
-            # 启用功能按钮
-            self.import_btn.setEnabled(True)
-            self.start_btn.setEnabled(bool(self.questions))
-            self.wrong_btn.setEnabled(bool(self.questions))
+        # 检查卡密状态
+        if status == 0:
+            return 'deactivate', "卡密状态异常，请重新验证"
             
-            QMessageBox.information(self, '成功', '卡密验证成功!')
+        # 检查设备绑定
+        if not is_bound_to(bound_device, device_id):
+            return 'deactivate', "卡密已被其他设备使用"
             
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'验证失败: {str(e)}')
-        finally:
-            cursor.close()
+        # 检查是否过期
+        if datetime.datetime.now() > expiry_time or remaining_days <= 0:
+            return 'deactivate', "卡密已过期，请重新购买"
+            
+        return 'ok', (expiry_time, remaining_days)
 
-    def check_card_status(self):
-        """检查卡密状态"""
-        if not self.is_activated or not self.current_card_key:
+    def on_card_status(self, card_key, outcome):
+        """卡密状态检查完成"""
+        # 检查期间卡密已停用或更换，结果作废
+        if not self.is_activated or card_key != self.current_card_key:
             return
             
-        cursor = None
-        connection = None
-        try:
-            # 从连接池获取连接
-            connection = self.db_pool.get_connection()
-            cursor = connection.cursor()
-            
-            # 使用一次查询获取所有需要的信息
-            cursor.execute("""
-                SELECT 
-                    k.status,
-                    k.device_id,
-                    k.expiry_time,
-                    k.valid_days,
-                    k.use_time,
-                    CASE 
-                        WHEN k.expiry_time < NOW() THEN 0
-                        ELSE DATEDIFF(k.expiry_time, NOW())
-                    END as remaining_days,
-                    c.change_type,
-                    c.change_time
-                FROM card_keys k
-                LEFT JOIN (
-                    SELECT card_key, change_type, change_time
-                    FROM card_status_change
-                    WHERE change_time > DATE_SUB(NOW(), INTERVAL 10 SECOND)
-                    ORDER BY change_time DESC
-                    LIMIT 1
-                ) c ON k.card_key = c.card_key
-                WHERE k.card_key = %s
-            """, (self.current_card_key,))
-            
-            result = cursor.fetchone()
-            
-            if not result:
-                print(f"卡密已被删除: {self.current_card_key}")
-                self.deactivate("卡密已被删除，请重新购买")
-                return
-                
-            (status, bound_device, expiry_time, valid_days, 
-             use_time, remaining_days, change_type, change_time) = result
+        action, value = outcome
+        if action == 'backoff':
+            self.backoff_status_check(value)
+            return
+        if self.check_backoff:
+            self.check_backoff = 0
+            self.check_timer.start(self.CHECK_INTERVAL)
             
-            # 检查状态变更
-            if change_type:
-                if change_type == 'reset':
-                    self.deactivate("卡密已被重置，请重新验证")
-                elif change_type == 'unbind':
-                    self.deactivate("卡密已被解绑，请重新验证")
-                elif change_type == 'disable':
-                    self.deactivate("卡密已被禁用")
-                return
-                
-            # 检查卡密状态
-            if status == 0:
-                self.deactivate("卡密状态异常，请重新验证")
-                return
-                
-            # 检查设备绑定
-            if bound_device != self.device_id:
-                self.deactivate("卡密已被其他设备使用")
-                return
-                
-            # 检查是否过期
-            if datetime.datetime.now() > expiry_time:
-                self.deactivate("卡密已过期，请重新购买")
-                return
-                
+        if action == 'deactivate':
+            self.deactivate(value)
+        elif action == 'ok':
             # 更新剩余时间显示
-            if remaining_days > 0:
-                self.expiry_time = expiry_time
-                self.time_label.setText(f'剩余有效期: {remaining_days}天')
-                self.time_label.setStyleSheet("""
-                    QLabel {
-                        color: #67C23A;
-                        font-size: 14px;
-                        padding: 8px;
-                        border: 1px solid #e1f3d8;
-                        border-radius: 4px;
-                        background: #f0f9eb;
-                        min-width: 200px;
-                        font-weight: bold;
-                    }
-                """)
-            else:
-                self.deactivate("卡密已过期，请重新购买")
-                
-        except mysql.connector.Error as e:
-            print(f"数据库错误: {str(e)}")
-            self.deactivate("数据库连接失败，请重试")
-        except Exception as e:
-            print(f"检查卡密状态失败: {str(e)}")
-            self.deactivate("验证状态检查失败")
-        finally:
-            if cursor:
-                cursor.close()
-            if connection:
-                connection.close()
+            self.expiry_time, remaining_days = value
+            self.time_label.setText(f'剩余有效期: {remaining_days}天')
+            self.time_label.setStyleSheet("""
+                QLabel {
+                    color: #67C23A;
+                    font-size: 14px;
+                    padding: 8px;
+                    border: 1px solid #e1f3d8;
+                    border-radius: 4px;
+                    background: #f0f9eb;
+                    min-width: 200px;
+                    font-weight: bold;
+                }
+            """)
+
+    def on_card_status_failed(self, card_key, error):
+        """卡密状态检查出错"""
+        if not self.is_activated or card_key != self.current_card_key:
+            return
+        # 服务器不可用时保持激活（到期时间在本地检查），由降级提示告知用户
+        if isinstance(error, (CircuitOpen, DBTaskTimeout) + self.db_pool.CONNECTION_ERRORS):
+            logger.warning(f"服务器不可用，跳过本次状态检查: {str(error)}")
+            return
+        logger.error(f"检查卡密状态失败: {str(error)}")
+        self.deactivate("验证状态检查失败")
+
+    def backoff_status_check(self, retry_after):
+        """被限流时按 retry-after 和指数退避推迟下一次状态检查"""
+        self.check_backoff = min(self.check_backoff + 1, self.MAX_CHECK_BACKOFF)
+        delay = max(retry_after * 1000, self.CHECK_INTERVAL * 2 ** self.check_backoff)
+        self.check_timer.start(int(delay * random.uniform(1.0, 1.2)))
 
     def deactivate(self, message=None):
         """停用功能"""
@@ -545,11 +754,8 @@ class ExamSystem(QMainWindow):
         # 隐藏答题界面
         self.exam_widget.hide()
         
-        # 重置答题状态
-        self.answered = 0
-        self.score = 0
-        self.current_index = -1
-        self.question_history = []
+        # 结束答题
+        self.session = None
         
         if message:
             QMessageBox.warning(self, '警告', message)
@@ -615,58 +821,7 @@ class ExamSystem(QMainWindow):
                 
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
-                    self.questions = []
-                    
-                    # 按题目分割
-                    questions_raw = content.split('\n\n')
-                    
-                    for i, q in enumerate(questions_raw):
-                        try:
-                            if not q.strip():
-                                continue
-                                
-                            lines = [line.strip() for line in q.split('\n') if line.strip()]
-                            
-                            # 提取题目
-                            title = ''
-                            options = []
-                            answer = ''
-                            
-                            # 查找题目
-                            for line in lines:
-                                if line in ['一、单选题', '二、单选题', '单选题']:
-                                    continue
-                                if '?' in line or '？' in line or any(line.startswith(f"{n}.") for n in range(1, 1000)):
-                                    title = line
-                                    break
-                            
-                            if not title and lines:
-                                title = lines[0]
-                            
-                            # 提取选项
-                            for line in lines:
-                                if any(line.startswith(prefix) for prefix in ['A.', 'B.', 'C.', 'D.', 
-                                                                            'A、', 'B、', 'C、', 'D、',
-                                                                            'A ', 'B ', 'C ', 'D ']):
-                                    options.append(line)
-                                elif '答案' in line or '正确' in line:
-                                    for ans in ['A', 'B', 'C', 'D']:
-                                        if ans in line:
-                                            answer = ans
-                                            break
-                            
-                            # 验证提取的内容
-                            if title and len(options) == 4 and answer:
-                                question = {
-                                    'title': title,
-                                    'options': options,
-                                    'answer': answer
-                                }
-                                self.questions.append(question)
-                            
-                        except Exception as e:
-                            print(f"处理题目 {i+1} 时出错: {str(e)}")
-                            continue
+                    self.questions = parse_questions(content)
                     
                     if self.questions:
                         self.setWindowTitle(f'{self.current_subject} - 考试刷题系统')
@@ -693,6 +848,7 @@ class ExamSystem(QMainWindow):
             return
         
         try:
+            self.session = None
             if os.path.exists('progress.json'):
                 with open('progress.json', 'r', encoding='utf-8') as f:
                     progress = json.load(f)
@@ -709,21 +865,12 @@ class ExamSystem(QMainWindow):
                 
                 if reply == QMessageBox.Yes:
                     # 恢复进度
-                    self.answered = progress['answered']
-                    self.score = progress['score']
-                    self.total_questions = progress['total_questions']
-                    os.remove('progress.json')
-                else:
-                    # 开始新答题
-                    os.remove('progress.json')
-                    self.answered = 0
-                    self.score = 0
-                    self.total_questions = len(self.questions)  # 使用实际题目数量
-            else:
-                # 没有进度文件，直接开始新答题
-                self.answered = 0
-                self.score = 0
-                self.total_questions = len(self.questions)  # 使用实际题目数量
+                    self.session = ExamSession.resume(self.questions, progress, self.wrong_questions)
+                os.remove('progress.json')
+            
+            if self.session is None:
+                # 开始新答题，使用实际题目数量
+                self.session = ExamSession(self.questions, wrong_questions=self.wrong_questions)
             
             # 隐藏主菜单按钮
             self.import_btn.hide()
@@ -731,7 +878,10 @@ class ExamSystem(QMainWindow):
             self.wrong_btn.hide()
             
             # 显示答题界面
+            self._prefetched = None
+            self.result_label.hide()
             self.exam_widget.show()
+            self.exam_widget.setFocus()
             
             # 开始显示题目
             self.show_question()
@@ -739,150 +889,156 @@ class ExamSystem(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, '错误', f'开始答题失败: {str(e)}')
 
+    @property
+    def panel(self):
+        """正在显示的题目面板"""
+        return self.question_stack.currentWidget()
+
+    @property
+    def back_panel(self):
+        """另一块题目面板，用于提前排好下一题"""
+        return self.question_stack.widget(1 - self.question_stack.currentIndex())
+
+    def set_drill_mode(self, checked):
+        """切换快速刷题"""
+        self.drill_mode = checked
+        self.exam_widget.setFocus()
+
+    def _delays(self):
+        """(选中后判定的延迟, 显示对错的时间)，单位毫秒"""
+        exam_config = APP_CONFIG['exam']
+        if self.drill_mode:
+            return exam_config['drill_check_delay'], exam_config['drill_feedback_delay']
+        return exam_config['check_delay'], exam_config['feedback_delay']
+
     def show_question(self):
-        """显示题目"""
-        if self.answered < self.total_questions:
-            self.current_question = self.questions[self.answered]
-            progress = f'进度: {self.answered + 1}/{self.total_questions} ({(self.answered + 1)/self.total_questions*100:.1f}%)\n\n'
-            self.question_label.setText(progress + f'题目 {self.answered + 1}:\n{self.current_question["title"]}')
-            
-            # 重置选项
-            for btn in self.option_buttons:
-                btn.setChecked(False)
-                btn.setEnabled(True)
-            
-            for i, option in enumerate(self.current_question['options']):
-                self.option_labels[i].setText(option)
-            
-            self.result_label.hide()
-            
-            # 更新导航按钮状态
-            self.prev_btn.setEnabled(len(self.question_history) > 0)
-            self.next_btn.setEnabled(False)
-        else:
+        """显示当前题目"""
+        session = self.session
+        if session is None:
+            return
+        if session.finished:
             self.show_result()
+            return
+        
+        question = session.current_question
+        if self._prefetched is question:
+            # 下一题已在另一块面板上排好，直接切换
+            self.question_stack.setCurrentWidget(self.back_panel)
+        else:
+            self.panel.set_question(question, session.number, session.total_questions)
+        self._prefetched = None
+        # 用户读题时再排下一题
+        QTimer.singleShot(0, self.prefetch_question)
+        
+        # 快速刷题时刚答完那题的对错留在新题下方，直到下一次作答
+        if not (self.drill_mode and self._answered_at is not None):
+            self.result_label.hide()
+        self._update_navigation()
+        self._record_next_question_latency()
+
+    def prefetch_question(self):
+        """在隐藏的面板上排好下一道要作答的题目"""
+        session = self.session
+        if session is None:
+            return
+        upcoming = session.upcoming()
+        if upcoming is None or upcoming[1] is self._prefetched:
+            return
+        number, question = upcoming
+        self.back_panel.set_question(question, number, session.total_questions)
+        self._prefetched = question
+
+    def _record_next_question_latency(self):
+        """记录从作答到下一题可操作的耗时（不含配置的显示对错时间）"""
+        if self._answered_at is None:
+            return
+        elapsed = time.perf_counter() - self._answered_at - self._delays()[1] / 1000
+        self._answered_at = None
+        self._next_question_latency.observe(max(elapsed, 0))
+        if elapsed * 1000 > APP_CONFIG['exam']['next_question_budget']:
+            logger.debug(f"作答到下一题耗时 {elapsed * 1000:.1f}ms")
+
+    def answer_with_key(self, index):
+        """快捷键作答"""
+        session = self.session
+        if session is None or not session.awaiting_answer or session.reviewing:
+            return
+        if self.panel.select(index):
+            self.auto_check_answer()
 
     def auto_check_answer(self):
         """自动检查答案"""
-        QTimer.singleShot(200, self.check_answer)
+        check_delay = self._delays()[0]
+        if check_delay:
+            QTimer.singleShot(check_delay, self.check_answer)
+        else:
+            self.check_answer()
 
     def check_answer(self):
         """检查答案"""
         try:
-            checked_button = self.option_group.checkedButton()
-            if not checked_button:
+            # 判定前连续点击只记录第一次
+            session = self.session
+            if session is None or not session.awaiting_answer or session.reviewing:
+                return
+            letter = self.panel.checked_answer()
+            if not letter:
                 return
             
-            answer = chr(ord('A') + self.option_group.id(checked_button))
-            
-            # 记录答题历史
-            history_item = {
-                'question': self.current_question,
-                'your_answer': answer,
-                'is_correct': answer == self.current_question['answer']
-            }
-            
-            self.question_history.append(history_item)
-            self.current_index = len(self.question_history) - 1
+            self._answered_at = time.perf_counter()
+            item = session.answer(letter)
+            self.panel.lock()
+            self._show_answer_result(item)
+            self._update_navigation()
             
-            if answer == self.current_question['answer']:
-                self.score += 1
-                self.result_label.setText('✓ 回答正确!')
-                self.result_label.setStyleSheet("""
-                    QLabel {
-                        background-color: #4CAF50;
-                        color: white;
-                        padding: 10px;
-                        border-radius: 5px;
-                        margin: 10px;
-                    }
-                """)
+            # 通常读题时已排好；连续快速作答时在这里补上
+            self.prefetch_question()
+            feedback_delay = self._delays()[1]
+            if feedback_delay:
+                QTimer.singleShot(feedback_delay, self.next_question)
             else:
-                self.result_label.setText(f'✗ 回答错误! 正确答案是: {self.current_question["answer"]}')
-                self.result_label.setStyleSheet("""
-                    QLabel {
-                        background-color: #f44336;
-                        color: white;
-                        padding: 10px;
-                        border-radius: 5px;
-                        margin: 10px;
-                    }
-                """)
-                self.wrong_questions.append({
-                    'question': self.current_question,
-                    'your_answer': answer
-                })
-            
-            self.result_label.show()
-            self.answered += 1
-            
-            # 禁用选项按钮
-            for btn in self.option_buttons:
-                btn.setEnabled(False)
-            
-            # 更新导航按钮状态
-            self.prev_btn.setEnabled(True)
-            self.next_btn.setEnabled(False)
-            
-            QTimer.singleShot(800, self.next_question)
+                self.next_question()
             
         except Exception as e:
-            print(f"检查答案时出错: {str(e)}")
+            logger.error(f"检查答案时出错: {str(e)}")
             QMessageBox.critical(self, '错误', f'检查答案时出错: {str(e)}')
 
     def next_question(self):
         """下一题"""
-        self.result_label.hide()
-        if self.answered < self.total_questions:
-            self.show_question()
-        else:
-            self.show_result()
+        if self.session is None:
+            return
+        if not self.drill_mode:
+            self.result_label.hide()
+        self.session.next_question()
+        self.show_question()
 
     def show_previous(self):
         """显示上一题"""
-        if self.current_index > 0:
-            self.current_index -= 1
-            self.show_history_question()
-            self.next_btn.setEnabled(True)
-            if self.current_index == 0:
-                self.prev_btn.setEnabled(False)
+        if self.session is None:
+            return
+        item = self.session.previous()
+        if item is not None:
+            self.show_history_question(item)
 
     def show_next(self):
         """显示下一题"""
-        if self.current_index < len(self.question_history) - 1:
-            self.current_index += 1
-            self.show_history_question()
-            self.prev_btn.setEnabled(True)
-            if self.current_index == len(self.question_history) - 1:
-                if self.answered < self.total_questions:
-                    self.next_btn.setEnabled(True)
-                else:
-                    self.next_btn.setEnabled(False)
-        else:
-            if self.answered < self.total_questions:
-                self.show_question()
+        if self.session is None:
+            return
+        item = self.session.next()
+        if item is not None:
+            self.show_history_question(item)
+        elif not self.session.reviewing:
+            self.show_question()
 
-    def show_history_question(self):
-        """显示历史题目"""
-        history_item = self.question_history[self.current_index]
-        self.current_question = history_item['question']
-        
-        progress = f'进度: {self.current_index + 1}/{self.total_questions} ({(self.current_index + 1)/self.total_questions*100:.1f}%)\n\n'
-        self.question_label.setText(progress + f'题目 {self.current_index + 1}:\n{self.current_question["title"]}')
-        
-        # 重置选项
-        for btn in self.option_buttons:
-            btn.setChecked(False)
-            btn.setEnabled(False)
-        
-        for i, option in enumerate(self.current_question['options']):
-            self.option_labels[i].setText(option)
-        
-        # 显示历史答案
-        answer_index = ord(history_item['your_answer']) - ord('A')
-        self.option_buttons[answer_index].setChecked(True)
-        
-        if history_item['is_correct']:
+    def show_history_question(self, item):
+        """显示答过的题目（覆盖当前面板，另一块上排好的下一题不受影响）"""
+        self.panel.set_question(item['question'], self.session.number, self.session.total_questions,
+                                answer=item['your_answer'])
+        self._show_answer_result(item)
+        self._update_navigation()
+
+    def _show_answer_result(self, item):
+        if item['is_correct']:
             self.result_label.setText('✓ 回答正确!')
             self.result_label.setStyleSheet("""
                 QLabel {
@@ -894,7 +1050,7 @@ class ExamSystem(QMainWindow):
                 }
             """)
         else:
-            self.result_label.setText(f'✗ 回答错误! 正确答案是: {self.current_question["answer"]}')
+            self.result_label.setText(f'✗ 回答错误! 正确答案是: {item["question"]["answer"]}')
             self.result_label.setStyleSheet("""
                 QLabel {
                     background-color: #f44336;
@@ -906,12 +1062,19 @@ class ExamSystem(QMainWindow):
             """)
         self.result_label.show()
 
+    def _update_navigation(self):
+        """按答题状态更新上一题/下一题按钮"""
+        self.prev_btn.setEnabled(self.session.can_go_previous)
+        self.next_btn.setEnabled(self.session.can_go_next)
+
     def show_result(self):
         """显示结果"""
+        session = self.session
+        self.session = None
         self.save_wrong_questions()
         QMessageBox.information(self, '考试结束', 
-                              f'得分: {self.score}/{self.total_questions}\n'
-                              f'正确率: {(self.score/self.total_questions)*100:.1f}%')
+                              f'得分: {session.score}/{session.total_questions}\n'
+                              f'正确率: {session.accuracy:.1f}%')
         
         # 显示主菜单按钮
         self.import_btn.show()
@@ -1085,16 +1248,15 @@ class ExamSystem(QMainWindow):
             
     def pause_exam(self):
         """暂停答题"""
+        if self.session is None:
+            return
+        progress = self.session.progress()
         reply = QMessageBox.question(self, '暂停答题', 
-                                   f'当前进度: {self.answered}/{self.total_questions}\n是否保存并退出?',
+                                   f'当前进度: {progress["answered"]}/{progress["total_questions"]}\n是否保存并退出?',
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            progress = {
-                'answered': self.answered,
-                'score': self.score,
-                'total_questions': self.total_questions
-            }
+            self.session = None
             with open('progress.json', 'w', encoding='utf-8') as f:
                 json.dump(progress, f)
             
@@ -1108,10 +1270,21 @@ class ExamSystem(QMainWindow):
 
     def verify_card_clicked(self):
         """验证卡密按钮点击事件"""
-        card_key = self.card_input.text().strip()
+        card_key = key_format.normalize(self.card_input.text())
         if not card_key:
             QMessageBox.warning(self, '提示', '请输入卡密')
             return
+
+        # 格式不对的卡密在本地提示，不连接服务器
+        reason = key_format.check(card_key)
+        if reason:
+            QMessageBox.warning(self, '提示', f'卡密{reason}，请检查输入')
+            return
+        
+        if self.db_pool is None:
+            self.start_background_init()
+            QMessageBox.information(self, '提示', '正在连接服务器，请稍后再试')
+            return
         
         # 调用验证方法，传入卡密和设备ID
         self.verify_card(card_key, self.device_id)
@@ -1126,7 +1299,7 @@ class ExamSystem(QMainWindow):
             with open('card_config.json', 'w', encoding='utf-8') as f:
                 json.dump(config, f)
         except Exception as e:
-            print(f"保存卡密配置失败: {str(e)}")
+            logger.error(f"保存卡密配置失败: {str(e)}")
 
     def load_config(self):
         """加载卡密配置"""
@@ -1208,10 +1381,12 @@ class ExamSystem(QMainWindow):
             QMessageBox.information(self, '提示', '微信号已复制到剪贴板！')
 
 def main():
+    setup_logging()
     try:
         # 设置异常钩子
         def exception_hook(exctype, value, traceback):
-            print(f'An exception has occurred: {exctype.__name__}: {str(value)}')
+            logger.error(f'An exception has occurred: {exctype.__name__}: {str(value)}',
+                         exc_info=(exctype, value, traceback))
             sys.__excepthook__(exctype, value, traceback)
         sys.excepthook = exception_hook
         
@@ -1240,10 +1415,8 @@ def main():
         exam.show()
         sys.exit(app.exec_())
     except Exception as e:
-        print(f"程序启动失败: {str(e)}")
+        logger.error(f"程序启动失败: {str(e)}")
         sys.exit(1)
 
 if __name__ == '__main__':
-    # 添加必要的导入
-    from PyQt5 import QtCore
     main()
\ No newline at end of file
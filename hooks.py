@@ -2,27 +2,12 @@ import os
 import sys
 import logging
 import traceback
-from datetime import datetime
 
 def init_logging():
-    """初始化日志"""
+    """初始化日志（与 run.py 共用同一个由后台线程写入的日志文件）"""
     try:
-        log_dir = 'logs'
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-        
-        log_file = os.path.join(log_dir, f'error_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-        logging.basicConfig(
-            filename=log_file,
-            level=logging.DEBUG,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
-        
-        # 添加控制台输出
-        console = logging.StreamHandler()
-        console.setLevel(logging.DEBUG)
-        logging.getLogger('').addHandler(console)
-        
+        from utils.log import setup_logging
+        setup_logging()
         logging.info("日志系统初始化成功")
     except Exception as e:
         with open('error.log', 'w') as f:
@@ -68,8 +53,9 @@ def init_environment():
 def run():
     """运行时钩子"""
     try:
-        init_logging()
+        # 先切换到程序目录，日志文件才会写在程序目录下
         init_environment()
+        init_logging()
         logging.info("运行时钩子执行完成")
     except Exception as e:
         with open('hook_error.log', 'w') as f:
@@ -1,20 +1,14 @@
+from utils import startup  # 最先导入，记录启动起点
 import sys
 import os
 import traceback
 import logging
-from datetime import datetime
+from config import LOGGING_CONFIG
+from utils.log import setup_logging
 
-# 配置日志
-log_dir = 'logs'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-log_file = os.path.join(log_dir, f'error_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-logging.basicConfig(
-    filename=log_file,
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# 配置日志（后台线程写入，界面线程不做文件 I/O）
+setup_logging()
+log_file = LOGGING_CONFIG['file']
 
 def handle_exception(exc_type, exc_value, exc_traceback):
     """处理未捕获的异常"""
@@ -76,14 +70,17 @@ def main():
         
         # 初始化应用程序
         init_app(app)
+        startup.mark('qt_ready')
         
         # 导入主程序
         from exam import ExamSystem
+        startup.mark('imports')
         
         try:
             # 创建主窗口
             window = ExamSystem()
             window.show()
+            startup.mark('window_shown')
             
             # 运行应用
             return app.exec_()
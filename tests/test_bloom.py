@@ -0,0 +1,168 @@
+"""卡密布隆过滤器测试（utils/bloom.py），Redis 用进程内的 FakeRedis 代替"""
+import pytest
+
+from benchmarks.fixtures import SQLiteDatabase, seed_cards
+from config import BLOOM_CONFIG
+from utils.bloom import BloomFilter, CardKeyShield
+
+
+class FakeRedis:
+    """CardKeyShield 用到的 Redis 命令子集，值与 redis-py 一样以 bytes 返回"""
+
+    def __init__(self):
+        self.data = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError('redis down')
+
+    def get(self, key):
+        self._check()
+        value = self.data.get(key)
+        return bytes(value) if value is not None else None
+
+    def set(self, key, value):
+        self._check()
+        self.data[key] = bytearray(value)
+
+    def delete(self, *keys):
+        self._check()
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def incr(self, key):
+        self._check()
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def hset(self, key, mapping):
+        self._check()
+        self.data.setdefault(key, {}).update(
+            {name.encode(): str(value).encode() for name, value in mapping.items()})
+
+    def hget(self, key, name):
+        self._check()
+        return self.data.get(key, {}).get(name.encode())
+
+    def hgetall(self, key):
+        self._check()
+        return dict(self.data.get(key, {}))
+
+    def getbit(self, key, offset):
+        self._check()
+        bits = self.data.get(key, b'')
+        return int(offset >> 3 < len(bits) and bool(bits[offset >> 3] & (0x80 >> (offset & 7))))
+
+    def setbit(self, key, offset, value):
+        self._check()
+        bits = self.data.setdefault(key, bytearray())
+        if offset >> 3 >= len(bits):
+            bits.extend(bytes((offset >> 3) + 1 - len(bits)))
+        bits[offset >> 3] |= 0x80 >> (offset & 7)
+
+    def pipeline(self, transaction=True):
+        self._check()
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SQLiteDatabase(str(tmp_path / 'cards.db'))
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    # 测试用的卡密很少，降低最小容量才能触发按卡密数量扩容
+    monkeypatch.setitem(BLOOM_CONFIG, 'min_capacity', 16)
+    return FakeRedis()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter.for_capacity(1000, 0.01)
+    keys = [f'key-{i}' for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_keys_pass_after_resize_seen_by_other_process(db, redis):
+    admin = CardKeyShield(redis, enabled=True)
+    client = CardKeyShield(redis, enabled=True)
+
+    cards = seed_cards(db, 50)
+    admin.rebuild(db)
+    assert all(client.might_exist(card_key) for card_key, _, _ in cards)
+    old_size = client._filter_meta()[0].size
+
+    # 卡密增多后重建，位图变大；client 仍缓存着旧的参数
+    cards = seed_cards(db, 400)
+    assert admin.rebuild(db) == 400
+    assert admin._filter_meta()[0].size > old_size
+    assert client._filter_meta()[0].size == old_size
+
+    assert all(client.might_exist(card_key) for card_key, _, _ in cards)
+    assert client.stats['rejected'] == 0
+    assert client._filter_meta()[0].size > old_size
+    # 只保留当前一代的位图
+    assert admin._bits_key(1) not in redis.data
+    assert admin._bits_key(2) in redis.data
+
+
+def test_rejects_unknown_keys_and_remembers_missing(db, redis):
+    shield = CardKeyShield(redis, enabled=True)
+    seed_cards(db, 50)
+    shield.rebuild(db)
+
+    rejected = sum(not shield.might_exist(f'UNKNOWN{i:08d}') for i in range(100))
+    assert rejected >= 95
+
+    shield.add(['NEWCARD000000001'])
+    assert shield.might_exist('NEWCARD000000001')
+    shield.remember_missing('NEWCARD000000001')
+    assert not shield.might_exist('NEWCARD000000001')
+    assert shield.stats['negative_hits'] == 1
+
+
+def test_add_during_rebuild_rewrites_current_generation(db, redis):
+    admin = CardKeyShield(redis, enabled=True)
+    client = CardKeyShield(redis, enabled=True)
+    seed_cards(db, 50)
+    admin.rebuild(db)
+    stale = client._filter_meta()
+
+    seed_cards(db, 400)
+    admin.rebuild(db)
+    # 模拟写入时读到的还是旧参数
+    calls = []
+
+    def filter_meta(force=False):
+        calls.append(force)
+        return stale if len(calls) == 1 else CardKeyShield._filter_meta(client, force)
+
+    client._filter_meta = filter_meta
+    client.add(['NEWCARD000000001'])
+    assert admin.might_exist('NEWCARD000000001')
+    assert client._bits_key(stale[1]) not in redis.data
+
+
+def test_fails_open_without_filter_or_redis(redis):
+    shield = CardKeyShield(redis, enabled=True)
+    assert shield.might_exist('ANYTHING')  # 过滤器尚未建立
+
+    redis.down = True
+    shield = CardKeyShield(redis, enabled=True)
+    assert shield.might_exist('ANYTHING')
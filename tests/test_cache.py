@@ -0,0 +1,240 @@
+"""两级缓存测试（utils/cache.py），Redis 用进程内的 FakeRedis 代替"""
+import fnmatch
+import threading
+
+import pytest
+
+from utils.cache import LRUCache, SingleFlight, TwoTierCache
+
+
+class FakeRedis:
+    """TwoTierCache 用到的 Redis 命令子集；down=True 时所有命令抛出 ConnectionError"""
+
+    def __init__(self):
+        self.data = {}
+        self.sets = {}
+        self.down = False
+        self.calls = []
+
+    def _call(self, name):
+        self.calls.append(name)
+        if self.down:
+            raise ConnectionError('redis down')
+
+    def get(self, key):
+        self._call('get')
+        return self.data.get(key)
+
+    def setex(self, key, expire, value):
+        self._call('setex')
+        self.data[key] = value
+
+    def sadd(self, key, member):
+        self._call('sadd')
+        self.sets.setdefault(key, set()).add(member)
+
+    def expire(self, key, expire):
+        self._call('expire')
+
+    def smembers(self, key):
+        self._call('smembers')
+        return set(self.sets.get(key, ()))
+
+    def delete(self, *keys):
+        self._call('delete')
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def unlink(self, *keys):
+        self._call('unlink')
+        removed = 0
+        for key in keys:
+            removed += self.data.pop(key, None) is not None
+            removed += self.sets.pop(key, None) is not None
+        return removed
+
+    def scan_iter(self, match=None, count=None):
+        self._call('scan_iter')
+        for key in list(self.data):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+
+    def keys(self, pattern='*'):
+        raise AssertionError('不应使用阻塞的 KEYS')
+
+    def pipeline(self):
+        self._call('pipeline')
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    def execute(self):
+        self.redis._call('execute')
+        return [getattr(self.redis, name)(*args) for name, args in self.commands]
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def cache(redis):
+    return TwoTierCache(redis, l1_max_size=100, l1_ttl=30, scan_count=3)
+
+
+def test_l1_then_l2_hits(redis, cache):
+    cache.set('card:1', {'status': 1})
+    assert cache.get('card:1') == {'status': 1}
+
+    # 另一个进程：进程内缓存为空，从 Redis 读到
+    other = TwoTierCache(redis)
+    assert other.get('card:1') == {'status': 1}
+    assert other.get('card:2') is None
+
+    stats = other.stats()
+    assert (stats['l1_hits'], stats['l2_hits'], stats['misses']) == (0, 1, 1)
+    assert stats['hit_ratio'] == 0.5
+    assert cache.stats()['l1_hits'] == 1
+
+
+def test_invalidate_pattern_uses_scan(redis, cache):
+    for i in range(10):
+        cache.set(f'query:{i}', i)
+    cache.set('card:1', 'keep')
+
+    removed = cache.invalidate_pattern('query:*')
+
+    assert removed == 20  # 进程内 10 + Redis 10
+    assert 'scan_iter' in redis.calls
+    assert redis.calls.count('unlink') == 4  # scan_count=3 分批
+    assert all(not key.startswith('query:') for key in redis.data)
+    assert cache.get('query:1') is None
+    assert cache.get('card:1') == 'keep'
+
+
+def test_invalidate_tag(redis, cache):
+    cache.set('card:status:a', 1, tags=('card',))
+    cache.set('card:status:b', 2, tags=('card',))
+    cache.set('bank:1', 'x', tags=('bank',))
+
+    assert cache.invalidate_tag('card') == 4  # 进程内 2 + Redis 2
+
+    assert cache.get('card:status:a') is None
+    assert cache.get('card:status:b') is None
+    assert cache.get('bank:1') == 'x'
+    assert 'tag:card' not in redis.sets
+    assert 'card' not in cache._tags
+
+
+def test_tags_pruned_on_eviction(redis):
+    cache = TwoTierCache(redis, l1_max_size=10)
+    for i in range(1000):
+        cache.set(f'query:{i}', i, tags=(f'user:{i}', 'query'))
+
+    assert len(cache.l1) == 10
+    assert len(cache._tags) == 11
+    assert len(cache._tags['query']) == 10
+    assert len(cache._key_tags) == 10
+
+    cache.l1.clear()
+    assert cache._tags == {}
+    assert cache._key_tags == {}
+
+
+def test_single_flight_coalesces_concurrent_misses(cache):
+    release = threading.Event()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('slow', loader)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # 等其余线程都在等待第一个线程的加载
+    while cache.stats()['misses'] < len(threads):
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ['value'] * 8
+    assert len(loads) == 1
+    stats = cache.stats()
+    assert stats['loads'] == 1
+    assert stats['coalesced'] == 7
+    assert cache.get_or_load('slow', loader) == 'value'
+    assert len(loads) == 1
+
+
+def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
+    # 失败后不残留，下一次重新加载
+    assert flight.do('key', lambda: 1) == (1, False)
+
+
+def test_redis_down_falls_back_to_l1(redis, cache):
+    redis.down = True
+
+    assert cache.set('card:1', 'v') is False
+    assert cache.get('card:1') == 'v'
+    assert cache.get_or_load('card:2', lambda: 'loaded') == 'loaded'
+    assert cache.invalidate_pattern('card:*') == 2
+
+    stats = cache.stats()
+    assert stats['redis_errors'] == 1
+    assert stats['redis_available'] is False
+    # 第一次出错后退避期间不再访问 Redis
+    assert redis.calls == ['pipeline']
+
+
+def test_redis_retried_after_interval(redis):
+    cache = TwoTierCache(redis, retry_interval=0)
+    redis.down = True
+    cache.set('card:1', 'v')
+    redis.down = False
+    assert cache.set('card:1', 'v') is True
+    assert cache.stats()['redis_available'] is True
+
+
+def test_no_redis_client():
+    cache = TwoTierCache(None)
+    cache.set('k', 'v', tags=('t',))
+    assert cache.get('k') == 'v'
+    assert cache.invalidate_tag('t') == 1
+    assert cache.stats()['redis_available'] is False
+
+
+def test_lru_cache_eviction_and_ttl():
+    evicted = []
+    lru = LRUCache(max_size=2, ttl=30, on_evict=evicted.extend)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')
+    lru.set('c', 3)
+    assert evicted == ['b']
+    assert lru.get('b') is None and lru.get('a') == 1
+
+    lru.set('d', 4, ttl=-1)
+    assert evicted == ['b', 'c']
+    assert lru.get('d') is None
+    assert evicted == ['b', 'c', 'd']
+    assert lru.delete_pattern('*') == 1
+    assert evicted[-1] == 'a'
@@ -0,0 +1,83 @@
+"""快速刷题双面板冒烟测试（exam.QuestionPanel + QStackedWidget），以离屏模式运行
+
+没有 PyQt5 时跳过；换题耗时复用 benchmarks/bench_drill.py。
+"""
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+pytest.importorskip('PyQt5')
+
+from PyQt5.QtWidgets import QApplication, QStackedWidget
+
+from benchmarks import bench_drill
+from benchmarks.fixtures import synthetic_bank
+from config import APP_CONFIG
+from exam import QuestionPanel
+from utils.question_parser import parse_questions
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def stack(app):
+    stack = QStackedWidget()
+    for _ in range(2):
+        stack.addWidget(QuestionPanel())
+    stack.resize(600, 400)
+    stack.show()
+    app.processEvents()
+    yield stack
+    stack.close()
+
+
+@pytest.fixture(scope='module')
+def questions():
+    return [question for question in parse_questions(synthetic_bank(200))
+            if question['answer'] and len(question['options']) > 1]
+
+
+def test_prefetched_panel_swap(stack, questions):
+    front, back = stack.widget(0), stack.widget(1)
+    stack.setCurrentWidget(front)
+    front.set_question(questions[0], 1, len(questions))
+    assert front.select(0)
+    assert front.checked_answer() == 'A'
+    front.lock()
+    assert not any(btn.isEnabled() for btn in front.option_buttons)
+
+    # 下一题排在隐藏的面板上，切换后可以直接作答
+    back.set_question(questions[1], 2, len(questions))
+    stack.setCurrentWidget(back)
+    assert stack.currentWidget() is back
+    assert back.question is questions[1]
+    assert back.checked_answer() is None
+    assert all(btn.isEnabled() for btn in back.option_buttons)
+    assert back.select(1)
+    assert back.checked_answer() == 'B'
+
+    # 面板复用：重新填题清除上一题的选择和锁定
+    front.set_question(questions[2], 3, len(questions))
+    assert front.checked_answer() is None
+    assert front.option_buttons[0].isEnabled()
+
+
+def test_review_and_missing_options(stack, questions):
+    panel = stack.widget(0)
+    panel.set_question(questions[0], 1, len(questions), answer='C')
+    assert panel.checked_answer() == 'C'
+    assert not panel.select(0)
+
+    question = dict(questions[1], options=questions[1]['options'][:2])
+    panel.set_question(question, 2, len(questions))
+    assert not panel.select(3)
+    assert panel.select(1)
+
+
+def test_swap_within_budget(stack, questions):
+    samples = bench_drill.swap(stack, questions)
+    assert bench_drill.percentiles(samples)['p99'] <= APP_CONFIG['exam']['next_question_budget']
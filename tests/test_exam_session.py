@@ -0,0 +1,142 @@
+"""答题状态机测试（utils/exam_session.py）"""
+import pytest
+
+from utils.exam_session import ExamSession, simulate
+
+
+def make_questions(count):
+    return [{'title': f'题目{i}', 'options': ['A. 甲', 'B. 乙', 'C. 丙', 'D. 丁'], 'answer': 'ABCD'[i % 4]}
+            for i in range(count)]
+
+
+@pytest.fixture
+def questions():
+    return make_questions(5)
+
+
+def test_answer_score_and_wrong_questions(questions):
+    wrong = []
+    session = ExamSession(questions, wrong_questions=wrong)
+    assert session.current_question is questions[0]
+    assert session.awaiting_answer
+
+    item = session.answer('A')
+    assert item == {'question': questions[0], 'your_answer': 'A', 'is_correct': True}
+    assert session.next_question() is questions[1]
+
+    item = session.answer('C')
+    assert not item['is_correct']
+    assert wrong == [{'question': questions[1], 'your_answer': 'C'}]
+    assert session.wrong_questions is wrong
+    assert (session.answered, session.score) == (2, 1)
+
+
+def test_invalid_option_rejected(questions):
+    session = ExamSession([dict(questions[0], options=['A. 对', 'B. 错'])])
+    with pytest.raises(ValueError):
+        session.answer('C')
+    assert session.answer('B')['your_answer'] == 'B'
+
+
+def test_answer_on_finished_session_raises(questions):
+    session = simulate(questions, lambda question: question['answer'])
+    assert session.finished
+    assert session.current_question is None
+    assert session.upcoming() is None
+    assert (session.score, session.accuracy) == (5, 100)
+    with pytest.raises(ValueError):
+        session.answer('A')
+
+
+def test_answer_twice_before_next_raises(questions):
+    session = ExamSession(questions)
+    session.answer('A')
+    with pytest.raises(ValueError):
+        session.answer('A')
+
+
+def test_total_questions_limits_session(questions):
+    session = simulate(questions, lambda question: 'D', total_questions=3)
+    assert session.total_questions == 3
+    assert session.answered == 3
+    assert (session.score, len(session.wrong_questions)) == (0, 3)
+
+
+def test_resume_continues_numbering(questions):
+    wrong = []
+    session = ExamSession(questions, wrong_questions=wrong)
+    session.answer('A')
+    session.next_question()
+    session.answer('D')
+    session.next_question()
+    progress = session.progress()
+    assert progress == {'answered': 2, 'score': 1, 'total_questions': 5}
+
+    resumed = ExamSession.resume(questions, progress, wrong)
+    assert resumed.number == 3
+    assert resumed.current_question is questions[2]
+    assert resumed.score == 1
+    assert not resumed.can_go_previous  # 回看只包括本次答过的题
+
+    resumed.answer('C')
+    assert resumed.number == 3
+    resumed.next_question()
+    assert resumed.number == 4
+    assert resumed.progress() == {'answered': 3, 'score': 2, 'total_questions': 5}
+    assert len(wrong) == 1
+
+
+def test_resume_finished_progress():
+    session = ExamSession.resume(make_questions(3), {'answered': 3, 'score': 2, 'total_questions': 3})
+    assert session.finished
+    assert not session.awaiting_answer
+
+
+def test_review_bounds(questions):
+    session = ExamSession(questions)
+    assert not session.can_go_previous and not session.can_go_next
+    assert session.previous() is None
+
+    first = session.answer('A')
+    # 显示对错期间既不能跳过，也还没有可回看的上一条
+    assert not session.can_go_next
+    assert not session.can_go_previous
+    assert session.next() is None
+    assert session.number == 1
+    session.next_question()
+
+    second = session.answer('B')
+    assert not session.can_go_next
+    assert session.can_go_previous
+    assert session.previous() is first
+    assert session.number == 1
+    assert session.next() is second
+    assert not session.can_go_next
+    session.next_question()
+    assert session.number == 3
+
+    # 作答前回看：可以一直回到当前题目
+    assert session.previous() is second
+    assert session.reviewing
+    assert session.can_go_next
+    assert session.previous() is first
+    assert session.previous() is None
+    assert session.next() is second
+    assert session.next() is None
+    assert not session.reviewing
+    assert session.number == 3
+    assert session.next() is None
+    assert session.score == 2
+
+
+def test_upcoming_matches_next_question(questions):
+    session = ExamSession(questions)
+    assert session.upcoming() == (2, questions[1])
+    session.answer('A')
+    assert session.upcoming() == (2, questions[1])
+    assert session.next_question() is questions[1]
+
+
+def test_empty_bank_rejected():
+    with pytest.raises(ValueError):
+        ExamSession([])
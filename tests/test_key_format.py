@@ -0,0 +1,86 @@
+"""卡密格式测试（utils/key_format.py）"""
+import pytest
+
+from utils import key_format
+
+# 固定的新格式卡密：版本 + 前缀 + 随机部分，校验位现算
+KEYS = [payload + key_format.check_char(payload)
+        for payload in ('1AB00000000000000', '1ZZXYZ01234567890', '1K7QWERTYVMNP4HJ2')]
+CARD_KEY = KEYS[2]
+
+
+def typos(card_key):
+    for index, char in enumerate(card_key):
+        for other in key_format.ALPHABET:
+            if other != char:
+                yield card_key[:index] + other + card_key[index + 1:]
+    for index in range(len(card_key) - 1):
+        if card_key[index] != card_key[index + 1]:
+            yield card_key[:index] + card_key[index + 1] + card_key[index] + card_key[index + 2:]
+
+
+@pytest.mark.parametrize('card_key', KEYS + [key_format.generate() for _ in range(5)])
+def test_damm_detects_substitutions_and_transpositions(card_key):
+    assert key_format.is_structured(card_key)
+    assert key_format.check(card_key) is None
+    for typo in typos(card_key):
+        assert not key_format.is_structured(typo), typo
+        # 不会被整理成另一个新卡密，只按旧卡密交给数据库判断
+        assert key_format.normalize(typo) == typo
+
+
+@pytest.mark.parametrize('text', [
+    CARD_KEY,
+    CARD_KEY.lower(),
+    f' {CARD_KEY} ',
+    '-'.join((CARD_KEY[:6], CARD_KEY[6:12], CARD_KEY[12:])),
+    ' '.join((CARD_KEY[:6], CARD_KEY[6:12], CARD_KEY[12:])),
+])
+def test_normalize_round_trip(text):
+    assert key_format.normalize(text) == CARD_KEY
+    assert key_format.normalize(CARD_KEY) == CARD_KEY
+
+
+def test_normalize_maps_confusable_characters():
+    card_key = KEYS[0]
+    assert key_format.normalize(card_key.replace('0', 'o')) == card_key
+    assert key_format.normalize(card_key.replace('0', 'O')) == card_key
+    card_key = KEYS[1]
+    assert key_format.normalize(card_key.replace('1', 'I', 2).replace('1', 'l')) == card_key
+
+
+@pytest.mark.parametrize('card_key', [
+    'ABCDEFGHJKMNPQRSTV',       # 18 位大写，不以版本号开头
+    'A1B2C3D4E5F6G7H8J9',
+    '1ABCDEFGHJKMNPQRST',       # 以版本号开头但校验位不对
+    '1abcdefghjkmnpqrst',
+    'aB3dE6gH9jK2mN5p',         # 旧版 16 位随机卡密
+    'abcd1234',                 # 8 位
+    'x' * 32,                   # 32 位
+    'OILOILOILOILOILOIL',
+])
+def test_legacy_keys_accepted_unchanged(card_key):
+    assert key_format.normalize(card_key) == card_key
+    assert key_format.check(card_key) is None
+    assert key_format.check_many([card_key]) == [None]
+
+
+@pytest.mark.parametrize('card_key, reason', [
+    ('abc1234', '格式错误'),
+    ('x' * 33, '格式错误'),
+    ('abcd-1234!', '格式错误'),
+    ('', '格式错误'),
+    ('1ABZZ-FP4ND-9JVYE-RTS', '校验位错误'),  # 带连字符的新卡密输错一位
+])
+def test_rejected(card_key, reason):
+    card_key = key_format.normalize(card_key)
+    assert key_format.check(card_key) == reason
+    assert key_format.check_many([card_key]) == [reason]
+
+
+def test_generate_prefix():
+    card_key = key_format.generate('zo')
+    assert card_key.startswith(key_format.VERSION + 'Z0')
+    assert key_format.is_structured(card_key)
+    with pytest.raises(ValueError):
+        key_format.generate('U1')
@@ -0,0 +1,89 @@
+"""熔断与重试测试（utils/resilience.py），故障注入部分复用 benchmarks/bench_breaker.py"""
+import pytest
+
+from benchmarks import bench_breaker
+from utils.resilience import (CircuitBreaker, CircuitOpen, DeadlineExceeded, RetryPolicy,
+                              call_with_retry, OPEN, HALF_OPEN, CLOSED)
+
+
+def failing(error):
+    def func(deadline):
+        raise error
+    return func
+
+
+def test_breaker_opens_after_threshold_and_recovers(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr('utils.resilience.time.monotonic', lambda: clock[0])
+    breaker = CircuitBreaker('test_open', failure_threshold=2, reset_timeout=5,
+                             failure_types=(OSError,))
+
+    for _ in range(2):
+        with pytest.raises(OSError):
+            breaker.call(failing(OSError('down')), None)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpen) as excinfo:
+        breaker.call(lambda: None)
+    assert excinfo.value.retry_after == 5
+    assert breaker.rejected == 1
+
+    # reset_timeout 之后只放行一个探测调用
+    clock[0] += 5
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr('utils.resilience.time.monotonic', lambda: clock[0])
+    breaker = CircuitBreaker('test_probe', failure_threshold=1, reset_timeout=1,
+                             failure_types=(OSError,))
+    with pytest.raises(OSError):
+        breaker.call(failing(OSError('down')), None)
+    clock[0] += 1
+    with pytest.raises(OSError):
+        breaker.call(failing(OSError('still down')), None)
+    assert breaker.state == OPEN
+    assert breaker.retry_after == 1
+
+
+def test_non_connection_errors_do_not_trip():
+    breaker = CircuitBreaker('test_sql_error', failure_threshold=1, failure_types=(OSError,))
+    with pytest.raises(ValueError):
+        call_with_retry(failing(ValueError('bad sql')), breaker=breaker,
+                        policy=RetryPolicy(attempts=3, base=0, cap=0, deadline=1))
+    assert breaker.state == CLOSED
+
+
+def test_retry_stops_at_deadline(monkeypatch):
+    calls = []
+    monkeypatch.setattr('utils.resilience.time.sleep', lambda seconds: None)
+
+    def flaky(deadline):
+        calls.append(deadline.remaining())
+        if len(calls) < 3:
+            raise ConnectionError('reset')
+        return 'ok'
+
+    policy = RetryPolicy(attempts=3, base=0.001, cap=0.001, deadline=10)
+    assert call_with_retry(flaky, policy=policy, retry_on=(ConnectionError,)) == 'ok'
+    assert len(calls) == 3
+
+    # 剩余时间不够下一次退避时立即失败
+    policy = RetryPolicy(attempts=5, base=100, cap=100, deadline=0.5)
+    with pytest.raises(DeadlineExceeded):
+        call_with_retry(failing(ConnectionError('reset')), policy=policy,
+                        retry_on=(ConnectionError,))
+
+
+def test_fault_injection():
+    """黑洞和连接重置两种故障下：在截止时间内失败、熔断期间立即拒绝且不连接服务器、恢复后关闭"""
+    args = bench_breaker.parse_args(['--deadline', '1', '--threshold', '2', '--reset', '0.5',
+                                     '--calls', '200', '--budget-ms', '5'])
+    result = bench_breaker.run(args)
+    assert bench_breaker.check(args, result) == []
@@ -0,0 +1,133 @@
+"""分片与在线重新分片测试（utils/storage.py ShardedStorage、utils/reshard.py），分片为 SQLite 文件"""
+import pytest
+
+from benchmarks import bench_shard
+from benchmarks.fixtures import SQLiteDatabase, seed_cards
+from utils.reshard import Resharder
+from utils.storage import ShardedStorage, key_slot
+
+SLOTS = 16
+
+
+@pytest.fixture
+def shards(tmp_path):
+    return [SQLiteDatabase(str(tmp_path / f'shard_{index}.db')) for index in range(3)]
+
+
+@pytest.fixture
+def db(shards):
+    return ShardedStorage(shards[:2], slots=SLOTS, map_refresh=3600)
+
+
+def set_slot(db, slot, shard, moving_to=None):
+    with db.shards()[0].get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE card_shard_slots SET shard = %s, moving_to = %s WHERE slot = %s",
+                           (shard, moving_to, slot))
+        connection.commit()
+    db.slot_map(refresh=True)
+
+
+def insert_card(shard, card_key):
+    with shard.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO card_keys (card_key, valid_days, create_time, status) "
+                           "VALUES (%s, 30, NOW(), 0)", (card_key,))
+        connection.commit()
+
+
+def shard_of(db, card_key):
+    """实际保存该卡密的分片下标列表"""
+    found, _ = bench_shard.locations(db)
+    return found.get(card_key, [])
+
+
+def test_initial_slot_map_and_routing(db):
+    slot_map = db.slot_map()
+    assert len(slot_map) == SLOTS
+    assert [shard for shard, _ in slot_map] == [slot * 2 // SLOTS for slot in range(SLOTS)]
+    assert all(moving_to is None for _, moving_to in slot_map)
+
+    keys = [f'card-{i}' for i in range(100)]
+    for card_key in keys:
+        assert db.shard_index(card_key) == key_slot(card_key, SLOTS) * 2 // SLOTS
+        assert not db.is_moving(card_key)
+        assert db.reroute(card_key, db.shard(card_key)) is None
+
+    groups = db.group(keys)
+    assert sorted(key for _, group in groups for key in group) == sorted(keys)
+    for shard, group in groups:
+        assert all(db.shard(card_key) is shard for card_key in group)
+
+
+def test_fan_out_reads_every_shard(db):
+    cards = seed_cards(db, 200)
+    counts = db.fan_out(lambda shard: len(bench_shard.locations(shard)[0]))
+    assert sum(counts) == len(cards)
+    assert all(counts)
+
+
+def test_moving_slot_probes_target(db, shards):
+    card_key = 'probe-card'
+    slot = key_slot(card_key, SLOTS)
+    source = db.slot_map()[slot][0]
+    target = 1 - source
+    set_slot(db, slot, source, moving_to=target)
+
+    assert db.is_moving(card_key)
+    assert db.shard_index(card_key) == source  # 目标分片上还没有
+
+    insert_card(shards[target], card_key)
+    assert db.shard_index(card_key) == target
+
+
+def test_lookup_after_row_moved_is_rerouted(db):
+    """查找之后、查询之前卡密被迁走：原分片查不到，reroute 给出目标分片"""
+    cards = seed_cards(db, 50)
+    card_key = cards[0][0]
+    slot = key_slot(card_key, SLOTS)
+    source = db.slot_map()[slot][0]
+    target = 1 - source
+    resharder = Resharder(db, batch_pause=0)
+    resharder._mark_moving({slot}, target)
+
+    routed = db.shard(card_key)
+    assert routed is db.shards()[source]
+    resharder._copy({slot}, target)
+    assert shard_of(db, card_key) == [target]
+    assert not bench_shard.locations(routed)[0].get(card_key)
+
+    rerouted = db.reroute(card_key, routed)
+    assert rerouted is db.shards()[target]
+    assert bench_shard.activate(db, card_key, 'device-1')
+    # 两个分片上都没有的卡密不会无限重试
+    assert not bench_shard.activate(db, 'no-such-card', 'device-1')
+
+
+def test_move_places_each_key_on_routed_shard(shards, monkeypatch):
+    cards = seed_cards(ShardedStorage(shards[:2], slots=SLOTS, map_refresh=3600), 300)
+    shards[2].reset()
+    db = ShardedStorage(shards, slots=SLOTS, map_refresh=3600)
+    resharder = Resharder(db, batch_size=50, batch_pause=0)
+    # 测试中只有一个进程，槽位表已在本进程刷新，不用等待其他进程
+    monkeypatch.setattr(resharder, '_wait_refresh', lambda: None)
+
+    moved = resharder.move(4, 11, 2)
+
+    assert moved > 0
+    failures, _ = bench_shard.check_placement(db, cards, '迁移后')
+    assert failures == []
+    slots, moving, counts = resharder.status()
+    assert slots[2] == list(range(4, 12))
+    assert moving == {}
+    assert counts[2] == moved
+    assert sum(counts) == len(cards)
+
+
+def test_move_with_concurrent_writers_never_misses():
+    """迁移期间持续修改：不丢修改、不因卡密刚被迁走而找不到，全量读取与总数一致"""
+    args = bench_shard.parse_args(['--cards', '2000', '--writers', '2', '--batch', '200'])
+    result, failures = bench_shard.run(args)
+    assert failures == []
+    assert result['missing_during_move'] == 0
+    assert result['moved'] > 0
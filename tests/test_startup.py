@@ -0,0 +1,20 @@
+"""启动耗时预算测试，复用 benchmarks/bench_startup.py
+
+导入 exam 和启动 run.py 都需要 PyQt5，没有安装时跳过；首屏以离屏模式测量。
+"""
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from benchmarks import bench_startup
+
+
+def test_import_budget_and_deferred_modules():
+    """import exam 在预算内，wmi、数据库驱动、redis 等没有在导入阶段加载"""
+    args = bench_startup.parse_args(['--skip-paint'])
+    assert bench_startup.check(args, bench_startup.run(args)) == []
+
+
+def test_first_paint_budget():
+    args = bench_startup.parse_args(['--runs', '3'])
+    assert bench_startup.check(args, bench_startup.run(args)) == []
@@ -0,0 +1,26 @@
+"""界面线程卡顿测试（utils/stall_detector.py、utils/db_executor.py），复用 benchmarks/bench_ui_stall.py
+
+需要 PyQt5，以离屏模式运行；没有安装时跳过。
+"""
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from benchmarks import bench_ui_stall
+
+
+def run(*argv):
+    args = bench_ui_stall.parse_args(['--latency', '0.2', '--duration', '2', '--cards', '2000',
+                                      *argv])
+    scenario, result = bench_ui_stall.run(args)
+    return bench_ui_stall.check(args, scenario, result)
+
+
+def test_db_calls_do_not_stall_ui_thread():
+    """慢查询都在工作线程中执行：界面不卡顿，超时、取消和同 key 合并生效"""
+    assert run() == []
+
+
+def test_detector_reports_synchronous_queries():
+    """对照：在界面线程中同步查询时检测器应报告卡顿"""
+    assert run('--control') == []
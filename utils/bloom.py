@@ -0,0 +1,248 @@
+"""卡密布隆过滤器模块
+
+所有已发放卡密的布隆过滤器以位图形式保存在 Redis 中，由管理端从
+card_keys 全量重建，生成/导入卡密时增量写入。过滤器判定不存在的卡密
+直接拒绝，不访问 MySQL；误判（过滤器认为存在但数据库没有）的卡密记入
+短期负缓存。Redis 不可用或过滤器尚未建立时一律放行到数据库。
+
+每次重建写入新一代的位图（键名带代数），与参数一起在一个事务中切换。各进程
+缓存过滤器参数，查询时在同一个管道里读取当前代数，与缓存不一致（过滤器已按
+新的大小重建）时重新读取参数，不会用旧的大小去查新的位图。
+开启列加密时过滤器和负缓存中保存的都是卡密的盲索引。
+"""
+import math
+import time
+import hashlib
+import logging
+import datetime
+import threading
+from utils.cache import LRUCache
+from utils.redis_cache import RedisCache
+from utils.db_crypto import DatabaseCrypto
+from config import BLOOM_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """位数组布隆过滤器，位序与 Redis SETBIT/GETBIT 一致"""
+
+    def __init__(self, size, hash_count, bits=None):
+        self.size = size
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        """按预期元素数量和误判率计算位数与哈希函数个数"""
+        size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        hash_count = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hash_count)
+
+    def offsets(self, key):
+        """双重哈希得到 hash_count 个位偏移"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for offset in self.offsets(key):
+            self.bits[offset >> 3] |= 0x80 >> (offset & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[offset >> 3] & (0x80 >> (offset & 7))
+                   for offset in self.offsets(key))
+
+
+class CardKeyShield:
+    """卡密查询防护：布隆过滤器 + 负缓存"""
+
+    BITS_KEY = 'bloom:card_keys'
+    META_KEY = 'bloom:card_keys:meta'
+    GENERATION_KEY = 'bloom:card_keys:generation'
+    SCAN_BATCH = 10000
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        if CardKeyShield._instance is None:
+            CardKeyShield._instance = CardKeyShield()
+        return CardKeyShield._instance
+
+    def __init__(self, redis_client=None, enabled=None):
+        self.redis = redis_client if redis_client is not None else RedisCache.get_instance().redis
+        self.enabled = BLOOM_CONFIG['enabled'] if enabled is None else enabled
+        self.negative = LRUCache(BLOOM_CONFIG['negative_max_size'], BLOOM_CONFIG['negative_ttl'])
+        self.crypto = DatabaseCrypto.get_instance()
+        self._meta = None
+        self._meta_loaded_at = 0
+        self._lock = threading.Lock()
+        self.stats = {'rejected': 0, 'negative_hits': 0, 'passed': 0}
+
+    def might_exist(self, card_key):
+        """卡密可能存在时返回 True；确定不存在时返回 False（不访问数据库）"""
+        if not self.enabled:
+            return True
+
+        card_key = self.crypto.card_key(card_key)
+        if self.negative.get(card_key):
+            self.stats['negative_hits'] += 1
+            return False
+
+        exists = True
+        for force in (False, True):
+            meta = self._filter_meta(force)
+            if meta is None:
+                break
+            bloom, generation = meta
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.hget(self.META_KEY, 'generation')
+                for offset in bloom.offsets(card_key):
+                    pipe.getbit(self._bits_key(generation), offset)
+                current, *bits = pipe.execute()
+            except Exception as e:
+                logger.warning(f"布隆过滤器查询失败，放行到数据库: {str(e)}")
+                return True
+            if current is not None and int(current) == generation:
+                exists = all(bits)
+                break
+            # 过滤器已重建，重新读取参数再查；仍不一致时放行
+
+        self.stats['passed' if exists else 'rejected'] += 1
+        return exists
+
+    def remember_missing(self, card_key):
+        """记录数据库中不存在的卡密（过滤器误判）"""
+        if self.enabled:
+            self.negative.set(self.crypto.card_key(card_key), True)
+
+    def add(self, card_keys):
+        """把新发放的卡密（列表）加入过滤器"""
+        card_keys = self.crypto.index_many('card_key', card_keys)
+        for card_key in card_keys:
+            self.negative.delete(card_key)
+
+        try:
+            for start in range(0, len(card_keys), self.SCAN_BATCH):
+                self._add_batch(card_keys[start:start + self.SCAN_BATCH])
+        except Exception as e:
+            logger.warning(f"布隆过滤器写入失败: {str(e)}")
+
+    def _add_batch(self, card_keys):
+        # 写入期间过滤器被重建时，删掉写到旧一代的位，按新参数重写
+        while True:
+            meta = self._filter_meta(force=True)
+            if meta is None:
+                return
+            bloom, generation = meta
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hget(self.META_KEY, 'generation')
+            for card_key in card_keys:
+                for offset in bloom.offsets(card_key):
+                    pipe.setbit(self._bits_key(generation), offset, 1)
+            current = pipe.execute()[0]
+            if current is not None and int(current) == generation:
+                return
+            self.redis.delete(self._bits_key(generation))
+
+    def rebuild(self, db):
+        """从 card_keys 全量重建过滤器，返回卡密数量"""
+        if not self.enabled or self.redis is None:
+            return 0
+
+        # 用各分片数据库的时间，客户端时钟与 create_time 可能不一致
+        started_at = [self._server_now(shard) for shard in db.shards()]
+        keys = list(self._scan_keys(db))
+        capacity = max(BLOOM_CONFIG['min_capacity'], len(keys) * 2)
+        bloom = BloomFilter.for_capacity(capacity, BLOOM_CONFIG['error_rate'])
+        for card_key in keys:
+            bloom.add(card_key)
+
+        # 新一代位图和参数在一个事务中写入，查询方不会看到半成品
+        previous = self.redis.hget(self.META_KEY, 'generation')
+        generation = self.redis.incr(self.GENERATION_KEY)
+        pipe = self.redis.pipeline()
+        pipe.set(self._bits_key(generation), bytes(bloom.bits))
+        pipe.hset(self.META_KEY, mapping={'size': bloom.size, 'hash_count': bloom.hash_count,
+                                          'generation': generation})
+        pipe.execute()
+        # 还缓存着旧参数的进程查询时会发现代数变化，旧位图可以直接删除
+        if previous is not None:
+            self.redis.delete(self._bits_key(int(previous)))
+
+        with self._lock:
+            self._meta = (BloomFilter(bloom.size, bloom.hash_count, bits=b''), generation)
+            self._meta_loaded_at = time.monotonic()
+
+        # 补上重建期间新生成的卡密
+        since = [now - datetime.timedelta(minutes=1) for now in started_at]
+        self.add(list(self._scan_keys(db, since)))
+        logger.info(f"布隆过滤器重建完成: {len(keys)} 个卡密，{bloom.size} 位")
+        return len(keys)
+
+    def _bits_key(self, generation):
+        return f"{self.BITS_KEY}:{generation}"
+
+    def _filter_meta(self, force=False):
+        """读取 Redis 中过滤器的参数（本地缓存 60 秒），返回 (过滤器, 代数)，未建立时返回 None"""
+        if self.redis is None:
+            return None
+        with self._lock:
+            if not force and time.monotonic() - self._meta_loaded_at < 60:
+                return self._meta
+        try:
+            meta = self.redis.hgetall(self.META_KEY)
+        except Exception as e:
+            logger.warning(f"读取布隆过滤器参数失败: {str(e)}")
+            meta = None
+
+        result = None
+        if meta and b'generation' in meta:
+            result = (BloomFilter(int(meta[b'size']), int(meta[b'hash_count']), bits=b''),
+                      int(meta[b'generation']))
+        with self._lock:
+            self._meta = result
+            self._meta_loaded_at = time.monotonic()
+        return result
+
+    def _server_now(self, db):
+        """数据库服务器的当前时间"""
+        connection = db.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT NOW() AS now")
+                return cursor.fetchone()['now']
+        finally:
+            connection.close()
+
+    def _scan_keys(self, db, since=None):
+        """按主键分批读取各分片的卡密；since 为各分片的起始时间（服务器时间）列表"""
+        for index, shard in enumerate(db.shards()):
+            yield from self._scan_shard(shard, since[index] if since else None)
+
+    def _scan_shard(self, db, since=None):
+        connection = db.get_connection()
+        try:
+            last_id = 0
+            with connection.cursor() as cursor:
+                while True:
+                    if since is None:
+                        cursor.execute(
+                            "SELECT id, card_key FROM card_keys WHERE id > %s ORDER BY id LIMIT %s",
+                            (last_id, self.SCAN_BATCH))
+                    else:
+                        cursor.execute(
+                            "SELECT id, card_key FROM card_keys WHERE id > %s AND create_time >= %s "
+                            "ORDER BY id LIMIT %s",
+                            (last_id, since, self.SCAN_BATCH))
+                    rows = cursor.fetchall()
+                    for row in rows:
+                        yield row['card_key']
+                    if len(rows) < self.SCAN_BATCH:
+                        break
+                    last_id = rows[-1]['id']
+        finally:
+            connection.close()
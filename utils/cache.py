@@ -0,0 +1,330 @@
+"""两级缓存模块
+
+进程内 LRU（带 TTL）在前，Redis 在后；支持 SCAN 模式失效、标签失效、
+并发未命中合并（single-flight），Redis 不可用时自动退化为仅进程内缓存。
+"""
+import time
+import fnmatch
+import logging
+import threading
+from collections import OrderedDict
+from utils.codec import CacheCodec
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """线程安全的有界 LRU 缓存，每个条目带过期时间
+
+    on_evict(keys): 条目被移除（容量淘汰、过期或删除）时回调，在锁外调用
+    """
+
+    def __init__(self, max_size=1024, ttl=30, on_evict=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expire_at = item
+            if expire_at >= time.monotonic():
+                self._data.move_to_end(key)
+                return value
+            del self._data[key]
+        self._evicted([key])
+        return default
+
+    def set(self, key, value, ttl=None):
+        expire_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expire_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                evicted.append(self._data.popitem(last=False)[0])
+        if evicted:
+            self._evicted(evicted)
+
+    def _evicted(self, keys):
+        if self.on_evict is not None:
+            self.on_evict(keys)
+
+    def delete(self, key):
+        with self._lock:
+            removed = self._data.pop(key, None) is not None
+        if removed:
+            self._evicted([key])
+        return removed
+
+    def delete_pattern(self, pattern):
+        """删除匹配通配符模式的键，返回删除数量"""
+        with self._lock:
+            keys = [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                del self._data[key]
+        if keys:
+            self._evicted(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._data)
+            self._data.clear()
+        if keys:
+            self._evicted(keys)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """合并同一键的并发加载：只有第一个调用者执行加载，其余等待其结果"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, loader):
+        """返回 (结果, 是否复用了其他线程的加载)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = loader()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class TwoTierCache:
+    """进程内 LRU + Redis 两级缓存"""
+
+    TAG_PREFIX = 'tag:'
+
+    def __init__(self, redis_client=None, l1_max_size=1024, l1_ttl=30,
+                 expire_time=3600, retry_interval=30, scan_count=500, codec=None):
+        self.redis = redis_client
+        self.codec = codec or CacheCodec()
+        self.l1 = LRUCache(l1_max_size, l1_ttl, on_evict=self._untag_local)
+        self.expire_time = expire_time
+        self.retry_interval = retry_interval
+        self.scan_count = scan_count
+        self._flight = SingleFlight()
+        self._redis_down_until = 0
+        self._tags = {}      # 进程内标签 -> 键集合
+        self._key_tags = {}  # 键 -> 标签集合，进程内条目淘汰时据此清理 _tags
+        self._tags_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ['l1_hits', 'l2_hits', 'misses', 'loads', 'coalesced', 'redis_errors'], 0
+        )
+
+    # ---- Redis 可用性 ----
+
+    @property
+    def redis_available(self):
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e):
+        """Redis 出错后一段时间内不再访问，避免每次调用都等待超时"""
+        self._redis_down_until = time.monotonic() + self.retry_interval
+        self._incr('redis_errors')
+        logger.warning(f"Redis不可用，{self.retry_interval}秒内仅使用进程内缓存: {str(e)}")
+
+    # ---- 序列化 ----
+
+    def dumps(self, value):
+        return self.codec.encode(value)
+
+    def loads(self, data):
+        return self.codec.decode(data)
+
+    # ---- 基本操作 ----
+
+    def get(self, key, default=None):
+        value = self.l1.get(key, _MISSING)
+        if value is not _MISSING:
+            self._incr('l1_hits')
+            return value
+
+        if self.redis_available:
+            try:
+                data = self.redis.get(key)
+            except Exception as e:
+                self._redis_failed(e)
+                data = None
+            if data is not None:
+                try:
+                    value = self.loads(data)
+                except Exception as e:
+                    # 无法解码的旧数据按未命中处理
+                    logger.warning(f"缓存数据解码失败 {key}: {str(e)}")
+                    self.delete(key)
+                else:
+                    self.l1.set(key, value)
+                    self._incr('l2_hits')
+                    return value
+
+        self._incr('misses')
+        return default
+
+    def set(self, key, value, expire=None, tags=()):
+        expire = expire or self.expire_time
+        self.l1.set(key, value, min(self.l1.ttl, expire))
+        self._tag_local(key, tags)
+
+        if not self.redis_available:
+            return False
+        try:
+            pipe = self.redis.pipeline()
+            pipe.setex(key, expire, self.dumps(value))
+            for tag in tags:
+                tag_key = self.TAG_PREFIX + tag
+                pipe.sadd(tag_key, key)
+                pipe.expire(tag_key, expire)
+            pipe.execute()
+            return True
+        except Exception as e:
+            self._redis_failed(e)
+            return False
+
+    def delete(self, *keys):
+        for key in keys:
+            self.l1.delete(key)
+        if not keys or not self.redis_available:
+            return 0
+        try:
+            return self.redis.delete(*keys)
+        except Exception as e:
+            self._redis_failed(e)
+            return 0
+
+    def get_or_load(self, key, loader, expire=None, tags=()):
+        """读缓存，未命中时调用 loader 加载；并发未命中只加载一次"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        def load():
+            # 排队期间可能已被其他线程写入
+            cached = self.l1.get(key, _MISSING)
+            if cached is not _MISSING:
+                return cached
+            result = loader()
+            self._incr('loads')
+            self.set(key, result, expire, tags)
+            return result
+
+        value, shared = self._flight.do(key, load)
+        if shared:
+            self._incr('coalesced')
+        return value
+
+    # ---- 失效 ----
+
+    def invalidate_pattern(self, pattern):
+        """按通配符模式失效，Redis 侧使用 SCAN 分批删除而不是阻塞的 KEYS"""
+        removed = self.l1.delete_pattern(pattern)
+        if not self.redis_available:
+            return removed
+        try:
+            batch = []
+            for key in self.redis.scan_iter(match=pattern, count=self.scan_count):
+                batch.append(key)
+                if len(batch) >= self.scan_count:
+                    removed += self.redis.unlink(*batch)
+                    batch = []
+            if batch:
+                removed += self.redis.unlink(*batch)
+        except Exception as e:
+            self._redis_failed(e)
+        return removed
+
+    def invalidate_tag(self, tag):
+        """失效带有指定标签的所有键"""
+        with self._tags_lock:
+            local_keys = self._tags.pop(tag, set())
+            for key in local_keys:
+                self._untag_key(key)
+        for key in local_keys:
+            self.l1.delete(key)
+        removed = len(local_keys)
+
+        if not self.redis_available:
+            return removed
+        try:
+            tag_key = self.TAG_PREFIX + tag
+            keys = list(self.redis.smembers(tag_key))
+            for start in range(0, len(keys), self.scan_count):
+                removed += self.redis.unlink(*keys[start:start + self.scan_count])
+            self.redis.unlink(tag_key)
+        except Exception as e:
+            self._redis_failed(e)
+        return removed
+
+    def _tag_local(self, key, tags):
+        if not tags:
+            return
+        with self._tags_lock:
+            self._key_tags.setdefault(key, set()).update(tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+    def _untag_local(self, keys):
+        """进程内条目被淘汰：从标签集合中移除，空标签一并删除"""
+        with self._tags_lock:
+            for key in keys:
+                self._untag_key(key)
+
+    def _untag_key(self, key):
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    # ---- 统计 ----
+
+    def _incr(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """返回命中统计"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['l1_hits'] + stats['l2_hits']) / lookups if lookups else 0.0
+        stats['l1_size'] = len(self.l1)
+        stats['redis_available'] = self.redis_available
+        return stats
+
+
+_MISSING = object()
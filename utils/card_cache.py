@@ -0,0 +1,87 @@
+"""卡密信息缓存模块"""
+import time
+import threading
+from collections import OrderedDict
+from utils.cache import SingleFlight
+
+
+class CardInfoCache:
+    """卡密信息读穿缓存
+
+    条目带 TTL、数量有上限；所有写卡密的路径都要调用 invalidate。
+    加载期间发生的失效会让这次加载结果不入缓存，避免旧数据覆盖失效。
+    """
+
+    def __init__(self, loader, max_size=1024, ttl=60):
+        self.loader = loader
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # 卡密 -> (信息, 加载时间)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._epoch = 0
+        self._stats = {
+            'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0,
+            'invalidations': 0, 'discarded_loads': 0,
+            'served_age_total': 0.0, 'served_age_max': 0.0
+        }
+
+    def get(self, card_key):
+        """读取卡密信息，未命中或过期时从数据库加载；卡密不存在返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(card_key)
+            if item is not None:
+                info, loaded_at = item
+                age = now - loaded_at
+                if age < self.ttl:
+                    self._data.move_to_end(card_key)
+                    self._stats['hits'] += 1
+                    self._stats['served_age_total'] += age
+                    self._stats['served_age_max'] = max(self._stats['served_age_max'], age)
+                    return info
+                del self._data[card_key]
+                self._stats['expired'] += 1
+            self._stats['misses'] += 1
+            epoch = self._epoch
+
+        info, _ = self._flight.do(card_key, lambda: self.loader(card_key))
+        if info is not None:
+            self._store(card_key, info, epoch)
+        return info
+
+    def _store(self, card_key, info, epoch):
+        with self._lock:
+            if epoch != self._epoch:
+                self._stats['discarded_loads'] += 1
+                return
+            self._data[card_key] = (info, time.monotonic())
+            self._data.move_to_end(card_key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *card_keys):
+        """使指定卡密的缓存失效"""
+        with self._lock:
+            self._epoch += 1
+            for card_key in card_keys:
+                if self._data.pop(card_key, None) is not None:
+                    self._stats['invalidations'] += 1
+
+    def clear(self):
+        """清空缓存（批量修改后使用）"""
+        with self._lock:
+            self._epoch += 1
+            self._stats['invalidations'] += len(self._data)
+            self._data.clear()
+
+    def stats(self):
+        """返回命中率和陈旧度统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['served_age_avg'] = stats['served_age_total'] / stats['hits'] if stats['hits'] else 0.0
+        return stats
@@ -0,0 +1,220 @@
+"""卡密批量导入模块"""
+import csv
+import os
+import time
+import logging
+import datetime
+import tempfile
+from utils import key_format
+from utils.db_crypto import DatabaseCrypto
+
+logger = logging.getLogger(__name__)
+
+# 表头中可能出现的卡密列名
+HEADER_NAMES = ('卡密', 'card_key', 'key')
+
+
+class CardImporter:
+    """外部卡密导入器
+
+    先在内存中完成格式（含新格式卡密的校验位）校验与去重，再优先使用 LOAD DATA LOCAL INFILE
+    批量装载；服务器不允许时退化为分批 executemany + INSERT IGNORE。
+    """
+
+    BATCH_SIZE = 5000
+
+    LOAD_DATA_SQL = """
+        LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE card_keys
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n'
+        (card_key, @days, @enc)
+        SET card_key_enc = UNHEX(NULLIF(@enc, '')),
+            valid_days = @days,
+            create_time = NOW(),
+            status = 0,
+            expiry_time = DATE_ADD(NOW(), INTERVAL @days DAY)
+    """
+
+    # VALUES 中只能出现占位符，pymysql 才会把 executemany 合并为多行 INSERT
+    INSERT_SQL = """
+        INSERT IGNORE INTO card_keys
+        (card_key, card_key_enc, valid_days, create_time, status, expiry_time)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """
+
+    def __init__(self, db, batch_size=None, shield=None):
+        self.db = db
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.shield = shield
+        self.crypto = DatabaseCrypto.get_instance()
+
+    def read_keys(self, file_path, default_days=None):
+        """读取并校验卡密文件，返回 (有效行, 拒绝行)
+
+        每行第一列为卡密，第二列（可选）为有效天数；缺省时使用 default_days。
+        拒绝行为 (行号, 卡密, 原因)。
+        """
+        records = []
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            for line_no, record in enumerate(csv.reader(f), 1):
+                if not record or not record[0].strip():
+                    continue
+
+                card_key = key_format.normalize(record[0])
+                if line_no == 1 and card_key.lower() in HEADER_NAMES:
+                    continue
+                records.append((line_no, card_key, record))
+
+        rows = []
+        rejected = []
+        seen = set()
+        reasons = key_format.check_many([card_key for _, card_key, _ in records])
+        for (line_no, card_key, record), reason in zip(records, reasons):
+            if reason:
+                rejected.append((line_no, card_key, reason))
+                continue
+            if card_key in seen:
+                rejected.append((line_no, card_key, '文件内重复'))
+                continue
+
+            days = default_days
+            if len(record) > 1 and record[1].strip():
+                try:
+                    days = int(record[1].strip())
+                except ValueError:
+                    rejected.append((line_no, card_key, '有效期错误'))
+                    continue
+            if not days or days <= 0:
+                rejected.append((line_no, card_key, '缺少有效期'))
+                continue
+
+            seen.add(card_key)
+            rows.append((card_key, days))
+
+        return rows, rejected
+
+    def write_rejected(self, file_path, rejected):
+        """把被拒绝的卡密写入 <原文件>.rejected.csv"""
+        if not rejected:
+            return None
+
+        reject_path = f"{os.path.splitext(file_path)[0]}.rejected.csv"
+        with open(reject_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['行号', '卡密', '原因'])
+            writer.writerows(rejected)
+        return reject_path
+
+    def load(self, rows, progress=None):
+        """装载已校验的卡密，返回 (实际插入数, 使用的方式)；分片部署时按分片分别装载"""
+        if not rows:
+            return 0, '-'
+
+        inserted = 0
+        methods = []
+        done = 0
+        for db, shard_rows in self.db.group(rows, key=lambda row: row[0]):
+            shard_progress = None
+            if progress:
+                shard_progress = lambda current, total, offset=done: progress(offset + current, len(rows))
+            shard_inserted, method = self._load_shard(db, shard_rows, shard_progress)
+            inserted += shard_inserted
+            done += len(shard_rows)
+            if method not in methods:
+                methods.append(method)
+        return inserted, ' / '.join(methods)
+
+    def _load_shard(self, db, rows, progress=None):
+        connection = db.get_connection(local_infile=True)
+        try:
+            if self._local_infile_enabled(connection):
+                try:
+                    inserted = self._load_data(connection, rows)
+                    if progress:
+                        progress(len(rows), len(rows))
+                    return inserted, 'LOAD DATA'
+                except Exception as e:
+                    connection.rollback()
+                    logger.warning(f"LOAD DATA 失败，改用批量插入: {str(e)}")
+
+            return self._insert_batches(connection, rows, progress), 'INSERT IGNORE'
+        finally:
+            connection.close()
+
+    def import_file(self, file_path, default_days=None, progress=None):
+        """导入卡密文件，返回导入结果统计"""
+        start_time = time.time()
+
+        rows, rejected = self.read_keys(file_path, default_days)
+        inserted, method = self.load(rows, progress)
+        if self.shield and inserted:
+            self.shield.add([card_key for card_key, _ in rows])
+
+        return {
+            'valid': len(rows),
+            'inserted': inserted,
+            'existing': len(rows) - inserted,
+            'rejected': len(rejected),
+            'reject_file': self.write_rejected(file_path, rejected),
+            'method': method,
+            'elapsed': time.time() - start_time
+        }
+
+    def _local_infile_enabled(self, connection):
+        """检查服务器是否允许 LOAD DATA LOCAL"""
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT @@GLOBAL.local_infile AS enabled")
+                row = cursor.fetchone()
+                return bool(row and row['enabled'])
+        except Exception:
+            return False
+
+    def _load_data(self, connection, rows):
+        """通过临时文件执行 LOAD DATA LOCAL INFILE"""
+        fd, tmp_path = tempfile.mkstemp(suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                for start in range(0, len(rows), self.batch_size):
+                    batch = self._encrypt_keys(rows[start:start + self.batch_size])
+                    f.writelines(f"{key_index}\t{days}\t{key_enc.hex() if key_enc else ''}\n"
+                                 for key_index, key_enc, days in batch)
+
+            with connection.cursor() as cursor:
+                inserted = cursor.execute(self.LOAD_DATA_SQL, (tmp_path,))
+            connection.commit()
+            return inserted
+        finally:
+            os.remove(tmp_path)
+
+    def _insert_batches(self, connection, rows, progress=None):
+        """分批 executemany，每批单独提交"""
+        inserted = 0
+        with connection.cursor() as cursor:
+            # 使用服务器时间，与 NOW() 写入的数据保持一致
+            cursor.execute("SELECT NOW() AS now")
+            now = cursor.fetchone()['now']
+            expiry_cache = {}
+
+            for start in range(0, len(rows), self.batch_size):
+                batch = []
+                for key_index, key_enc, days in self._encrypt_keys(rows[start:start + self.batch_size]):
+                    expiry_time = expiry_cache.get(days)
+                    if expiry_time is None:
+                        expiry_time = expiry_cache[days] = now + datetime.timedelta(days=days)
+                    batch.append((key_index, key_enc, days, now, 0, expiry_time))
+
+                inserted += cursor.executemany(self.INSERT_SQL, batch) or 0
+                connection.commit()
+
+                if progress:
+                    progress(min(start + self.batch_size, len(rows)), len(rows))
+
+        return inserted
+
+    def _encrypt_keys(self, rows):
+        """[(卡密, 天数)] -> [(写入 card_key 列的值, 密文, 天数)]，整批计算"""
+        card_keys = [card_key for card_key, _ in rows]
+        return zip(self.crypto.index_many('card_key', card_keys),
+                   self.crypto.encrypt_many('card_key', card_keys),
+                   (days for _, days in rows))
@@ -0,0 +1,76 @@
+"""客户端卡密查询
+
+与界面无关的 SQL 放在这里，客户端和基准测试共用。开启列加密时参数换成盲索引，
+返回的 device_id 也是盲索引，用 is_bound_to 比较。
+"""
+from utils.db_crypto import DatabaseCrypto
+
+# 客户端启动时验证卡密
+CARD_LOOKUP_SQL = """
+    SELECT status, device_id, expiry_time
+    FROM card_keys
+    WHERE card_key = %s
+"""
+
+# 首次使用时绑定设备
+ACTIVATE_CARD_SQL = """
+    UPDATE card_keys
+    SET device_id = %s,
+        device_id_enc = %s,
+        status = 1,
+        use_time = NOW(),
+        bind_time = NOW()
+    WHERE card_key = %s
+"""
+
+# 卡密状态及其最近 10 秒内的状态变更（重置/解绑/删除）
+CARD_STATUS_SQL = """
+    SELECT
+        k.status,
+        k.device_id,
+        k.expiry_time,
+        k.valid_days,
+        k.use_time,
+        CASE
+            WHEN k.expiry_time < NOW() THEN 0
+            ELSE DATEDIFF(k.expiry_time, NOW())
+        END as remaining_days,
+        c.change_type,
+        c.change_time
+    FROM card_keys k
+    LEFT JOIN (
+        SELECT card_key, change_type, change_time
+        FROM card_status_change
+        WHERE card_key = %s
+          AND change_time > DATE_SUB(NOW(), INTERVAL 10 SECOND)
+        ORDER BY change_time DESC
+        LIMIT 1
+    ) c ON k.card_key = c.card_key
+    WHERE k.card_key = %s
+"""
+
+
+def fetch_card(cursor, card_key):
+    """查询卡密，返回 (status, device_id, expiry_time)，不存在时返回 None"""
+    cursor.execute(CARD_LOOKUP_SQL, (DatabaseCrypto.get_instance().card_key(card_key),))
+    return cursor.fetchone()
+
+
+def activate_card(cursor, card_key, device_id):
+    """把卡密标记为已使用并绑定设备（调用方负责提交）"""
+    crypto = DatabaseCrypto.get_instance()
+    cursor.execute(ACTIVATE_CARD_SQL, (crypto.device_id(device_id), crypto.encrypt('device_id', device_id),
+                                       crypto.card_key(card_key)))
+
+
+def fetch_card_status(cursor, card_key):
+    """查询卡密状态，返回 (status, device_id, expiry_time, valid_days, use_time,
+    remaining_days, change_type, change_time)，卡密不存在时返回 None"""
+    card_key = DatabaseCrypto.get_instance().card_key(card_key)
+    cursor.execute(CARD_STATUS_SQL, (card_key, card_key))
+    return cursor.fetchone()
+
+
+def is_bound_to(bound_device, device_id):
+    """查询结果中的 device_id 是否就是该设备"""
+    return bound_device == DatabaseCrypto.get_instance().device_id(device_id)
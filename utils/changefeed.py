@@ -0,0 +1,210 @@
+"""卡密变更订阅模块
+
+card_keys.updated_at/version 记录行级修改，card_status_change 记录删除等
+事件；管理端只拉取游标之后的变化并原地更新表格，不再整表重载。
+分片部署时全量读取和增量同步在各分片上并行执行后合并。
+开启列加密时卡密和设备ID批量解密后返回。
+"""
+import heapq
+import datetime
+from utils.db_crypto import DatabaseCrypto
+from utils.storage import parse_time
+
+# 管理端表格使用的列（状态和剩余天数由数据库计算）
+CARD_COLUMNS = """
+    card_key,
+    card_key_enc,
+    valid_days,
+    create_time,
+    CASE
+        WHEN status = 2 THEN '已过期'
+        WHEN status = 1 THEN '已使用'
+        WHEN expiry_time < NOW() THEN '已过期'
+        ELSE '未使用'
+    END as status,
+    use_time,
+    CASE
+        WHEN expiry_time < NOW() THEN 0
+        ELSE DATEDIFF(expiry_time, NOW())
+    END as remaining_days,
+    COALESCE(device_id, '-') as device_id,
+    device_id_enc,
+    bind_time,
+    version
+"""
+
+# 会导致行从 card_keys 消失的事件
+REMOVAL_EVENTS = ('delete', 'archive')
+
+
+class CardChangeFeed:
+    """card_keys 变更游标
+
+    分片部署时每个分片各有一个游标（时间和事件ID都是分片内的），各分片并行读取后合并。
+
+    全量读取可以走只读副本（snapshot_db），增量同步固定在主库（db）上：副本落后于主库，
+    从副本数据取得的游标在主库上只会多读一些，反过来则会漏掉变化或被误判为游标失效。
+    """
+
+    # 回看窗口：覆盖提交晚于 updated_at 时间戳的慢事务
+    OVERLAP_SECONDS = 2
+    # 事件ID的回看窗口：自增ID先分配、事务后提交的事件可能落在游标之下
+    OVERLAP_EVENTS = 200
+
+    def __init__(self, db, snapshot_db=None):
+        self.db = db
+        self.snapshot_db = snapshot_db or db
+        self.crypto = DatabaseCrypto.get_instance()
+        self.positions = None  # 每个分片的 (服务器时间, 最大事件ID, 回看窗口内已处理的事件ID)
+        self.plain_keys = {}   # 开启列加密时: 盲索引 -> 卡密，用于翻译删除事件
+
+    def snapshot(self):
+        """全量读取并重置游标，返回卡密列表（按创建时间倒序）"""
+        self.plain_keys = {}
+        results = self.snapshot_db.fan_out(self._snapshot_shard)
+        self.positions = [position for position, _ in results]
+        for _, shard_cards in results:
+            self._decrypt(shard_cards)
+        if len(results) == 1:
+            return results[0][1]
+
+        # 重新分片时卡密可能短暂同时出现在两个分片上
+        cards = []
+        seen = set()
+        merged = heapq.merge(*(shard_cards for _, shard_cards in results),
+                             key=lambda card: card['create_time'], reverse=True)
+        for card in merged:
+            if card['card_key'] not in seen:
+                seen.add(card['card_key'])
+                cards.append(card)
+        return cards
+
+    def poll(self):
+        """拉取游标之后的变化，返回 (变化的行, 被移除的卡密)
+
+        游标失效（如状态记录被清空）时返回 (None, None)，调用方应重新 snapshot。
+        """
+        if self.positions is None:
+            return None, None
+
+        results = self.db.fan_out(self._poll_shard, self.positions)
+        if any(result is None for result in results):
+            return None, None
+
+        changed = []
+        removed = []
+        positions = []
+        for position, shard_changed, shard_removed in results:
+            positions.append(position)
+            changed.extend(self._decrypt(shard_changed))
+            removed.extend(shard_removed)
+        self.positions = positions
+        if self.crypto.enabled:
+            removed = [self.plain_keys.pop(card_key, card_key) for card_key in removed]
+        return changed, removed
+
+    def _decrypt(self, cards):
+        """批量解密卡密和设备ID，并记下盲索引与卡密的对应关系"""
+        if not self.crypto.enabled:
+            return self.crypto.decrypt_rows(cards)
+        indexes = [card['card_key'] for card in cards]
+        self.crypto.decrypt_rows(cards)
+        self.plain_keys.update(zip(indexes, (card['card_key'] for card in cards)))
+        return cards
+
+    def _snapshot_shard(self, db):
+        connection = db.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                # 游标取自提供数据的同一个连接（可能是副本），先取游标再读数据，
+                # 读取期间的修改会在下一次 poll 中补上
+                position = self._snapshot_position(cursor)
+
+                cursor.execute(f"""
+                    SELECT {CARD_COLUMNS}
+                    FROM card_keys
+                    ORDER BY create_time DESC
+                """)
+                return position, cursor.fetchall()
+        finally:
+            connection.close()
+
+    def _poll_shard(self, db, position):
+        """一个分片上游标之后的变化，返回 (新游标, 变化的行, 被移除的卡密)，游标失效时返回 None"""
+        since, event_id, seen = position
+        connection = db.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                updated_at, max_event_id = self._current_position(cursor)
+                if max_event_id < event_id:
+                    return None
+
+                cursor.execute(f"""
+                    SELECT {CARD_COLUMNS}
+                    FROM card_keys
+                    WHERE updated_at >= %s
+                    ORDER BY updated_at
+                """, (since - datetime.timedelta(seconds=self.OVERLAP_SECONDS),))
+                changed = cursor.fetchall()
+
+                # 从游标之下回看一段，跳过已处理过的事件
+                cursor.execute("""
+                    SELECT id, card_key, change_type
+                    FROM card_status_change
+                    WHERE id > %s AND id <= %s
+                    ORDER BY id
+                """, (max(event_id - self.OVERLAP_EVENTS, 0), max_event_id))
+                events = cursor.fetchall()
+                changed_keys = {card['card_key'] for card in changed}
+                removed = [
+                    event['card_key'] for event in events
+                    if event['id'] not in seen
+                    and event['change_type'] in REMOVAL_EVENTS
+                    and event['card_key'] not in changed_keys
+                ]
+                floor = max_event_id - self.OVERLAP_EVENTS
+                seen = frozenset(event['id'] for event in events if event['id'] > floor)
+
+            return (updated_at, max_event_id, seen), changed, removed
+        finally:
+            connection.close()
+
+    def _current_position(self, cursor):
+        """读取当前游标位置 (服务器时间, 最大事件ID)"""
+        cursor.execute("""
+            SELECT NOW(3) as now,
+                   (SELECT COALESCE(MAX(id), 0) FROM card_status_change) as event_id
+        """)
+        row = cursor.fetchone()
+        return row['now'], row['event_id']
+
+    def _snapshot_position(self, cursor):
+        """按已读到的数据确定游标：最后一次修改时间和最大事件ID
+
+        不用数据库的当前时间：副本的时钟和复制延迟都与主库不同。
+        """
+        cursor.execute("""
+            SELECT MAX(updated_at) as updated_at,
+                   (SELECT COALESCE(MAX(id), 0) FROM card_status_change) as event_id
+            FROM card_keys
+        """)
+        row = cursor.fetchone()
+        updated_at = parse_time(row['updated_at']) or datetime.datetime(1970, 1, 1)
+        return updated_at, row['event_id'], self._window_events(cursor, row['event_id'])
+
+    def _window_events(self, cursor, event_id):
+        """回看窗口内已提交的事件ID"""
+        cursor.execute("""
+            SELECT id FROM card_status_change
+            WHERE id > %s AND id <= %s
+        """, (max(event_id - self.OVERLAP_EVENTS, 0), event_id))
+        return frozenset(row['id'] for row in cursor.fetchall())
+
+
+def record_change(cursor, card_key, change_type):
+    """在当前事务中记录一条卡密状态变更"""
+    cursor.execute("""
+        INSERT INTO card_status_change
+        (card_key, change_type, change_time)
+        VALUES (%s, %s, NOW())
+    """, (DatabaseCrypto.get_instance().card_key(card_key), change_type))
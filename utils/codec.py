@@ -0,0 +1,113 @@
+"""缓存数据编解码模块
+
+格式: 4 字节头 + 数据
+    b'QC'      魔数
+    1 字节     格式版本
+    1 字节     高 4 位为序列化方式，低 4 位为压缩方式
+
+没有魔数的数据按旧版 JSON 解析，升级前写入 Redis 的缓存仍可读取。
+"""
+import json
+import zlib
+import lzma
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = b'QC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('>2sBB')
+
+# 序列化方式
+SERIALIZER_JSON = 0
+SERIALIZER_MSGPACK = 1
+
+# 压缩方式
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+
+COMPRESSIONS = {
+    'none': COMPRESSION_NONE,
+    'zlib': COMPRESSION_ZLIB,
+    'lzma': COMPRESSION_LZMA
+}
+
+
+class CodecError(ValueError):
+    """缓存数据无法解码"""
+
+
+class CacheCodec:
+    """缓存编解码器：紧凑序列化 + 超过阈值时压缩"""
+
+    def __init__(self, compression='zlib', threshold=1024, level=6, serializer=None):
+        self.compression = COMPRESSIONS[compression]
+        self.threshold = threshold
+        self.level = level
+        if serializer is None:
+            serializer = SERIALIZER_MSGPACK if msgpack is not None else SERIALIZER_JSON
+        self.serializer = serializer
+
+    def encode(self, value):
+        """把对象编码为带格式头的字节串"""
+        if self.serializer == SERIALIZER_MSGPACK:
+            data = msgpack.packb(value, use_bin_type=True, default=str)
+        else:
+            data = json.dumps(value, ensure_ascii=False, separators=(',', ':'),
+                              default=str).encode('utf-8')
+
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(data) >= self.threshold:
+            if self.compression == COMPRESSION_LZMA:
+                packed = lzma.compress(data, preset=min(self.level, 9))
+            else:
+                packed = zlib.compress(data, self.level)
+            # 压缩无收益时保留原始数据
+            if len(packed) < len(data):
+                data = packed
+                compression = self.compression
+
+        return HEADER.pack(MAGIC, FORMAT_VERSION, self.serializer << 4 | compression) + data
+
+    def decode(self, data):
+        """解码字节串，兼容无格式头的旧版 JSON"""
+        if isinstance(data, str):
+            return json.loads(data)
+        if not data.startswith(MAGIC):
+            return json.loads(data)
+
+        magic, version, flags = HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise CodecError(f"不支持的缓存格式版本: {version}")
+
+        serializer, compression = flags >> 4, flags & 0x0F
+        payload = memoryview(data)[HEADER.size:]
+
+        if compression == COMPRESSION_ZLIB:
+            payload = zlib.decompress(payload)
+        elif compression == COMPRESSION_LZMA:
+            payload = lzma.decompress(payload)
+        elif compression != COMPRESSION_NONE:
+            raise CodecError(f"未知的压缩方式: {compression}")
+
+        if serializer == SERIALIZER_MSGPACK:
+            if msgpack is None:
+                raise CodecError("缓存数据使用 msgpack 编码，但 msgpack 未安装")
+            return msgpack.unpackb(payload, raw=False)
+        if serializer == SERIALIZER_JSON:
+            return json.loads(bytes(payload))
+        raise CodecError(f"未知的序列化方式: {serializer}")
+
+
+class JsonCodec:
+    """旧版编码（json.dumps），用于对比测试"""
+
+    def encode(self, value):
+        return json.dumps(value).encode('utf-8')
+
+    def decode(self, data):
+        return json.loads(data)
@@ -1,22 +1,101 @@
+"""加密原语
+
+SecurityProvider 由主密钥派生两把子密钥：AES-256-GCM 加密密钥和 HMAC-SHA256 盲索引密钥。
+
+密文: 版本(1字节) + 随机 nonce(12字节) + 密文 + 认证标签(16字节)。加密时把列名作为
+附加数据，一列的密文挪到另一列会解密失败。
+
+盲索引: HMAC(列名 + 值) 截断为 16 字节，写成 32 位十六进制。同一个值总是得到同一个
+索引，可以建唯一索引、做等值查询；不能做范围查询或模糊搜索。
+"""
+import os
+import hmac
 import hashlib
-import base64
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+CIPHER_VERSION = 1
+NONCE_SIZE = 12
+INDEX_BYTES = 16
+MIN_KEY_SIZE = 32
+
+
+def _derive(master_key, purpose):
+    return hmac.new(master_key, b'exam-db|' + purpose, hashlib.sha256).digest()
+
 
 class SecurityProvider:
-    def __init__(self, key=b'YourSecretKey123'):
-        self.key = hashlib.sha256(key).digest()
-
-    def encrypt(self, data):
-        try:
-            if isinstance(data, str):
-                data = data.encode()
-            return base64.b64encode(data).decode()
-        except:
-            return data
-
-    def decrypt(self, data):
-        try:
-            if isinstance(data, str):
-                return base64.b64decode(data).decode()
-            return data
-        except:
-            return data 
\ No newline at end of file
+    """列加密与盲索引"""
+
+    def __init__(self, key):
+        if isinstance(key, str):
+            key = key.encode()
+        if len(key) < MIN_KEY_SIZE:
+            raise ValueError(f"主密钥至少 {MIN_KEY_SIZE} 字节")
+        self._aead = AESGCM(_derive(key, b'encrypt'))
+        self._index_key = _derive(key, b'blind-index')
+        self._index_macs = {}
+
+    def encrypt(self, data, column=''):
+        return self.encrypt_many([data], column)[0]
+
+    def decrypt(self, token, column=''):
+        return self.decrypt_many([token], column)[0]
+
+    def encrypt_many(self, values, column=''):
+        """批量加密（None 保持为 None），一次取出所有 nonce"""
+        encrypt = self._aead.encrypt
+        aad = column.encode()
+        nonces = os.urandom(NONCE_SIZE * len(values))
+        header = bytes([CIPHER_VERSION])
+        tokens = []
+        for offset, value in zip(range(0, len(nonces), NONCE_SIZE), values):
+            if value is None:
+                tokens.append(None)
+                continue
+            nonce = nonces[offset:offset + NONCE_SIZE]
+            tokens.append(header + nonce + encrypt(nonce, value.encode('utf-8'), aad))
+        return tokens
+
+    def decrypt_many(self, tokens, column=''):
+        """批量解密（None 保持为 None），密文被改动或列不符时抛出 ValueError"""
+        decrypt = self._aead.decrypt
+        aad = column.encode()
+        values = []
+        for token in tokens:
+            if token is None:
+                values.append(None)
+                continue
+            token = bytes(token)
+            if token[0] != CIPHER_VERSION:
+                raise ValueError(f"不支持的密文版本: {token[0]}")
+            try:
+                plain = decrypt(token[1:NONCE_SIZE + 1], token[NONCE_SIZE + 1:], aad)
+            except InvalidTag:
+                raise ValueError(f"{column} 密文校验失败") from None
+            values.append(plain.decode('utf-8'))
+        return values
+
+    def blind_index(self, value, column=''):
+        return self.blind_index_many([value], column)[0]
+
+    def blind_index_many(self, values, column=''):
+        """批量计算盲索引（None 保持为 None），复用已装入密钥和列名的 HMAC 状态"""
+        base = self._index_macs.get(column)
+        if base is None:
+            base = hmac.new(self._index_key, column.encode() + b'\x00', hashlib.sha256)
+            self._index_macs[column] = base
+        indexes = []
+        for value in values:
+            if value is None:
+                indexes.append(None)
+                continue
+            mac = base.copy()
+            mac.update(value.encode('utf-8'))
+            indexes.append(mac.digest()[:INDEX_BYTES].hex())
+        return indexes
+
+
+def new_key():
+    """生成一个新的主密钥"""
+    return os.urandom(MIN_KEY_SIZE)
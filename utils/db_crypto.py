@@ -1,15 +1,211 @@
-from .crypto import SecurityProvider
+"""数据库列加密
+
+开启后（DB_CRYPTO_CONFIG['enabled']）card_key、device_id 两列保存盲索引，原值用 AES-GCM
+加密后保存在 card_key_enc、device_id_enc 列:
+  - 按卡密/设备查询时参数换成盲索引，WHERE card_key = %s、唯一索引和状态变更表的关联
+    都不用改，仍然走索引
+  - 需要显示原值时（管理端表格、编辑对话框）批量解密结果集
+  - 哈希分片仍按卡密原值计算槽位
+未开启时盲索引即原值、加密列为 NULL，与旧版行为相同。
+
+开启前生成密钥并迁移已有数据（迁移期间客户端和管理端应停止写入）:
+    python -m utils.db_crypto --new-key db.key
+    python -m utils.db_crypto --migrate [--batch 1000]
+"""
+import os
+import base64
+import logging
+import argparse
+from utils.crypto import SecurityProvider, new_key
+from config import DB_CRYPTO_CONFIG
+
+logger = logging.getLogger(__name__)
+
+ENCRYPTED_COLUMNS = ('card_key', 'device_id')
+
+
+def load_key(config=None):
+    """从环境变量（base64）或密钥文件读取主密钥"""
+    config = config or DB_CRYPTO_CONFIG
+    encoded = os.environ.get(config['key_env'])
+    if encoded:
+        return base64.b64decode(encoded)
+    try:
+        with open(config['key_file'], 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        raise ValueError(f"已开启数据库加密，但未设置 {config['key_env']} 且找不到密钥文件 "
+                         f"{config['key_file']}") from None
+
 
 class DatabaseCrypto:
-    def __init__(self):
-        self.security = SecurityProvider()
-
-    def encrypt(self, data):
-        if isinstance(data, str):
-            return self.security.encrypt(data)
-        return data
-
-    def decrypt(self, data):
-        if isinstance(data, str):
-            return self.security.decrypt(data)
-        return data 
\ No newline at end of file
+    """card_key / device_id 列的盲索引与加解密"""
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        if DatabaseCrypto._instance is None:
+            DatabaseCrypto._instance = DatabaseCrypto()
+        return DatabaseCrypto._instance
+
+    def __init__(self, config=None, key=None):
+        config = config or DB_CRYPTO_CONFIG
+        self.enabled = config['enabled'] if key is None else True
+        self.security = SecurityProvider(key or load_key(config)) if self.enabled else None
+
+    def card_key(self, card_key):
+        """查询和写入 card_key 列使用的值"""
+        return self.index('card_key', card_key)
+
+    def device_id(self, device_id):
+        """查询和写入 device_id 列使用的值"""
+        return self.index('device_id', device_id)
+
+    def index(self, column, value):
+        if not self.enabled or value is None:
+            return value
+        return self.security.blind_index(value, column)
+
+    def index_many(self, column, values):
+        if not self.enabled:
+            return list(values)
+        return self.security.blind_index_many(values, column)
+
+    def encrypt(self, column, value):
+        """写入 <column>_enc 列的密文，未开启时为 None"""
+        if not self.enabled or value is None:
+            return None
+        return self.security.encrypt(value, column)
+
+    def encrypt_many(self, column, values):
+        if not self.enabled:
+            return [None] * len(values)
+        return self.security.encrypt_many(values, column)
+
+    def decrypt_rows(self, rows):
+        """把结果集（字典行）中的盲索引换回原值，按列批量解密，返回 rows
+
+        行中带有 <column>_enc 时使用并移除该列；密文为 NULL（未加密的旧数据或值为空）时保留原列。
+        """
+        if not rows:
+            return rows
+        for column in ENCRYPTED_COLUMNS:
+            enc_column = f"{column}_enc"
+            if enc_column not in rows[0]:
+                continue
+            tokens = [row.pop(enc_column) for row in rows]
+            if not self.enabled:
+                continue
+            present = [index for index, token in enumerate(tokens) if token is not None]
+            values = self.security.decrypt_many([tokens[index] for index in present], column)
+            for index, value in zip(present, values):
+                rows[index][column] = value
+        return rows
+
+
+class EncryptedCursor:
+    """取回结果时自动解密的游标（字典游标）"""
+
+    def __init__(self, cursor, crypto=None):
+        self._cursor = cursor
+        self._crypto = crypto or DatabaseCrypto.get_instance()
+
+    def execute(self, query, args=None):
+        return self._cursor.execute(query, args)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._crypto.decrypt_rows([row])
+        return row
+
+    def fetchall(self):
+        return self._crypto.decrypt_rows(list(self._cursor.fetchall()))
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+        return self._crypto.decrypt_rows(list(rows))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+
+def migrate(db, crypto, batch_size=1000):
+    """把各分片中未加密的行改为盲索引 + 密文，返回处理的行数；可重复执行"""
+    total = 0
+    for shard in db.shards():
+        for table in ('card_keys', 'card_keys_archive'):
+            total += _migrate_table(shard, crypto, table, batch_size)
+    return total
+
+
+def _migrate_table(db, crypto, table, batch_size):
+    total = 0
+    connection = db.get_connection()
+    try:
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT id, card_key, device_id FROM {table}
+                    WHERE card_key_enc IS NULL
+                    ORDER BY id
+                    LIMIT %s
+                """, (batch_size,))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                card_keys = [row['card_key'] for row in rows]
+                devices = [row['device_id'] for row in rows]
+                key_indexes = crypto.index_many('card_key', card_keys)
+                cursor.executemany(f"""
+                    UPDATE {table}
+                    SET card_key = %s, card_key_enc = %s, device_id = %s, device_id_enc = %s
+                    WHERE id = %s
+                """, list(zip(key_indexes,
+                              crypto.encrypt_many('card_key', card_keys),
+                              crypto.index_many('device_id', devices),
+                              crypto.encrypt_many('device_id', devices),
+                              [row['id'] for row in rows])))
+                if table == 'card_keys':
+                    cursor.executemany("UPDATE card_status_change SET card_key = %s WHERE card_key = %s",
+                                       list(zip(key_indexes, card_keys)))
+            connection.commit()
+            total += len(rows)
+    finally:
+        connection.close()
+    if total:
+        logger.info(f"{table} 已加密 {total} 行")
+    return total
+
+
+def main():
+    from utils.storage import get_storage
+
+    parser = argparse.ArgumentParser(description='数据库列加密')
+    parser.add_argument('--new-key', metavar='PATH', help='生成新的主密钥文件')
+    parser.add_argument('--migrate', action='store_true', help='加密已有数据')
+    parser.add_argument('--batch', type=int, default=1000, help='每批处理的行数')
+    args = parser.parse_args()
+
+    if args.new_key:
+        if os.path.exists(args.new_key):
+            parser.error(f"{args.new_key} 已存在，不覆盖")
+        fd = os.open(args.new_key, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(new_key())
+        print(f"已生成密钥文件 {args.new_key}，请妥善备份，丢失后已加密的数据无法恢复")
+    if args.migrate:
+        crypto = DatabaseCrypto(key=load_key())
+        print(f"加密行数: {migrate(get_storage(), crypto, args.batch)}")
+
+
+if __name__ == '__main__':
+    main()
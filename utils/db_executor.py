@@ -0,0 +1,206 @@
+"""数据库任务执行器
+
+界面线程不直接访问数据库：查询以任务的形式提交到线程池，完成后通过 Qt 信号
+回到界面线程调用回调。相同 key 的任务执行期间不会重复提交（例如每张卡密同时
+只有一个状态检查），超时的任务不再回调，尚未开始的任务可以取消。
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from utils.metrics import MetricsRegistry
+from config import DB_EXECUTOR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMED_OUT = 'timeout'
+
+
+class DBTaskTimeout(Exception):
+    """任务超时（线程中的查询仍会执行完，但结果被丢弃）"""
+
+    def __init__(self, name, timeout):
+        super().__init__(f"{name} 超过 {timeout:g} 秒未完成")
+        self.timeout = timeout
+
+
+class DBTask:
+    """一次提交的数据库任务"""
+
+    def __init__(self, executor, fn, args, kwargs, key, name):
+        self.executor = executor
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.name = name
+        self.state = PENDING
+        self.callbacks = []
+        self.future = None
+        self.timer = None
+        self.submitted_at = time.perf_counter()
+
+    @property
+    def active(self):
+        return self.state in (PENDING, RUNNING)
+
+    def add_callbacks(self, on_success=None, on_error=None):
+        if on_success is not None or on_error is not None:
+            self.callbacks.append((on_success, on_error))
+
+    def cancel(self):
+        """取消任务：未开始的不再执行，执行中的结果被丢弃"""
+        self.executor.cancel(self)
+
+
+class DBExecutor(QObject):
+    """在线程池中执行数据库任务，在界面线程中回调"""
+    _finished = pyqtSignal(object, object, object)  # 任务, 结果, 异常
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        if DBExecutor._instance is None:
+            DBExecutor._instance = DBExecutor()
+        return DBExecutor._instance
+
+    def __init__(self, workers=None, timeout=None, parent=None):
+        super().__init__(parent)
+        self.timeout = DB_EXECUTOR_CONFIG['timeout'] if timeout is None else timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers or DB_EXECUTOR_CONFIG['workers'],
+                                        thread_name_prefix='db-task')
+        self._lock = threading.Lock()
+        self._active = set()
+        self._inflight = {}
+        # 信号从工作线程发出，自动以排队方式在本对象所在的界面线程中处理
+        self._finished.connect(self._on_finished)
+
+        registry = MetricsRegistry.get_instance()
+        self._latency = registry.histogram('db_task')
+        self._coalesced = registry.counter('db_task_coalesced')
+        self._timeouts = registry.counter('db_task_timeouts')
+        registry.register_gauges('db_executor', self.stats)
+
+    def submit(self, fn, *args, on_success=None, on_error=None, key=None, timeout=None,
+               name=None, **kwargs):
+        """提交任务（在界面线程中调用），on_success(结果) / on_error(异常) 也在界面线程中调用
+
+        key 相同的任务执行中时不重复提交，回调挂到已有任务上并返回该任务。
+        """
+        if key is not None:
+            task = self._inflight.get(key)
+            if task is not None:
+                self._coalesced.inc()
+                if task.active:
+                    task.add_callbacks(on_success, on_error)
+                return task
+
+        task = DBTask(self, fn, args, kwargs, key, name or getattr(fn, '__name__', 'task'))
+        task.add_callbacks(on_success, on_error)
+        timeout = self.timeout if timeout is None else timeout
+        if timeout:
+            task.timer = QTimer(self)
+            task.timer.setSingleShot(True)
+            task.timer.timeout.connect(lambda: self._expire(task, timeout))
+            task.timer.start(int(timeout * 1000))
+
+        self._active.add(task)
+        if key is not None:
+            self._inflight[key] = task
+        task.future = self._pool.submit(self._run, task)
+        return task
+
+    def in_flight(self, key):
+        """key 对应的任务是否仍在执行"""
+        return key in self._inflight
+
+    def cancel(self, task):
+        with self._lock:
+            if not task.active:
+                return
+            task.state = CANCELLED
+        self._stop_timer(task)
+        if task.future is not None and task.future.cancel():
+            self._release(task)
+
+    def cancel_all(self):
+        for task in list(self._active):
+            self.cancel(task)
+
+    def shutdown(self):
+        """关闭时调用：取消所有任务，不等待执行中的查询"""
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'active': len(self._active),
+            'keyed': len(self._inflight)
+        }
+
+    # ---- 内部 ----
+
+    def _run(self, task):
+        """在工作线程中执行"""
+        with self._lock:
+            if task.state != PENDING:
+                return
+            task.state = RUNNING
+        started = time.perf_counter()
+        result = error = None
+        try:
+            result = task.fn(*task.args, **task.kwargs)
+        except Exception as e:
+            error = e
+        self._latency.observe(time.perf_counter() - started)
+        self._finished.emit(task, result, error)
+
+    def _on_finished(self, task, result, error):
+        self._release(task)
+        with self._lock:
+            if task.state != RUNNING:
+                return  # 已取消或已超时
+            task.state = FAILED if error is not None else DONE
+        self._stop_timer(task)
+
+        for on_success, on_error in task.callbacks:
+            if error is None:
+                if on_success is not None:
+                    on_success(result)
+            elif on_error is not None:
+                on_error(error)
+        if error is not None and not any(on_error for _, on_error in task.callbacks):
+            logger.error(f"数据库任务 {task.name} 失败: {str(error)}")
+
+    def _expire(self, task, timeout):
+        with self._lock:
+            if not task.active:
+                return
+            task.state = TIMED_OUT
+        self._timeouts.inc()
+        logger.warning(f"数据库任务 {task.name} 超时({timeout:g}秒)")
+        # 还没开始的直接取消；执行中的保留 key，避免卡住的查询被反复提交
+        if task.future.cancel():
+            self._release(task)
+        error = DBTaskTimeout(task.name, timeout)
+        for _, on_error in task.callbacks:
+            if on_error is not None:
+                on_error(error)
+
+    def _release(self, task):
+        self._active.discard(task)
+        if task.key is not None and self._inflight.get(task.key) is task:
+            del self._inflight[task.key]
+
+    def _stop_timer(self, task):
+        if task.timer is not None:
+            task.timer.stop()
+            task.timer.deleteLater()
+            task.timer = None
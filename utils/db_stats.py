@@ -0,0 +1,248 @@
+"""SQL 语句统计模块
+
+InstrumentedConnection/InstrumentedCursor 包装 pymysql 和 mysql.connector
+（含 PooledDB）的连接，按归一化后的语句统计调用次数、耗时直方图、返回行数
+和影响行数；超过阈值的语句连同脱敏后的参数写入慢查询日志。统计结果通过
+MetricsRegistry 导出。
+"""
+import re
+import time
+import hashlib
+import logging
+import datetime
+import threading
+from utils.metrics import Histogram, MetricsRegistry, histogram_lines
+from config import QUERY_STATS_CONFIG
+
+slow_logger = logging.getLogger('slow_query')
+
+_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*%s(?:\s*,\s*%s)*\s*\)", re.IGNORECASE)
+_VALUES_RE = re.compile(r"\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))*", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(query):
+    """归一化语句：字面量替换为 ?，IN 列表和多行 VALUES 折叠，空白压缩"""
+    sql = _SPACE_RE.sub(' ', query).strip()
+    sql = _LITERAL_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _VALUES_RE.sub(r'VALUES \1', sql)
+    return sql
+
+
+def redact(value):
+    """参数脱敏：字符串只保留首尾各 2 个字符和长度"""
+    if value is None or isinstance(value, (bool, int, float, datetime.date, datetime.datetime)):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, (list, tuple)):
+        items = [redact(item) for item in value[:10]]
+        if len(value) > 10:
+            items.append(f"... 共 {len(value)} 项")
+        return items
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    text = str(value)
+    if len(text) <= 4:
+        return '*' * len(text)
+    return f"{text[:2]}***{text[-2:]}({len(text)})"
+
+
+class StatementStats:
+    """单条归一化语句的统计"""
+
+    __slots__ = ('sql', 'digest', 'histogram', 'rows_returned', 'rows_affected', 'errors', 'slow')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.digest = hashlib.blake2b(sql.encode('utf-8'), digest_size=4).hexdigest()
+        self.histogram = Histogram()
+        self.rows_returned = 0
+        self.rows_affected = 0
+        self.errors = 0
+        self.slow = 0
+
+    def summary(self):
+        summary = self.histogram.summary()
+        summary.update({
+            'digest': self.digest,
+            'sql': self.sql,
+            'rows_returned': self.rows_returned,
+            'rows_affected': self.rows_affected,
+            'errors': self.errors,
+            'slow': self.slow
+        })
+        return summary
+
+
+class QueryStats:
+    """按语句汇总的 SQL 统计"""
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        if QueryStats._instance is None:
+            QueryStats._instance = QueryStats()
+            MetricsRegistry.get_instance().register_collector(QueryStats._instance.prometheus_lines)
+        return QueryStats._instance
+
+    def __init__(self, config=None):
+        self.config = config or QUERY_STATS_CONFIG
+        self.enabled = self.config['enabled']
+        self.slow_threshold = self.config['slow_threshold']
+        self.statements = {}
+        self._normalized = {}  # 原始语句 -> 统计对象，避免重复归一化
+        self._lock = threading.Lock()
+
+    def statement(self, query):
+        """取得语句对应的统计对象"""
+        stats = self._normalized.get(query)
+        if stats is not None:
+            return stats
+        sql = normalize_sql(query)
+        with self._lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                if len(self.statements) >= self.config['max_statements']:
+                    sql = '<其他语句>'
+                    stats = self.statements.get(sql)
+                if stats is None:
+                    stats = self.statements[sql] = StatementStats(sql)
+            if len(self._normalized) >= self.config['max_statements'] * 4:
+                self._normalized.clear()
+            self._normalized[query] = stats
+        return stats
+
+    def record(self, stats, duration, args, failed=False, rowcount=-1):
+        """记录一次执行"""
+        stats.histogram.observe(duration)
+        if failed:
+            stats.errors += 1
+        elif rowcount > 0 and not stats.sql.lstrip('(').upper().startswith('SELECT'):
+            stats.rows_affected += rowcount
+        if duration >= self.slow_threshold:
+            stats.slow += 1
+            self._log_slow(stats, duration, args)
+
+    def top(self, limit=10, key='total_time'):
+        """按总耗时（或其他字段）排序的前 limit 条语句"""
+        summaries = [stats.summary() for stats in list(self.statements.values())]
+        summaries.sort(key=lambda item: item[key], reverse=True)
+        return summaries[:limit]
+
+    def prometheus_lines(self, prefix):
+        statements = list(self.statements.values())
+        if not statements:
+            return []
+        name = f"{prefix}_query_latency_seconds"
+        lines = [f"# TYPE {name} histogram"]
+        for stats in statements:
+            lines.extend(histogram_lines(name, f'stmt="{stats.digest}"', stats.histogram))
+        for metric in ('rows_returned', 'rows_affected', 'errors', 'slow'):
+            metric_name = f"{prefix}_query_{metric}_total"
+            lines.append(f"# TYPE {metric_name} counter")
+            lines.extend(f'{metric_name}{{stmt="{stats.digest}"}} {getattr(stats, metric)}'
+                         for stats in statements)
+        # 语句文本单独输出，便于按 stmt 关联
+        info_name = f"{prefix}_query_info"
+        lines.append(f"# TYPE {info_name} gauge")
+        for stats in statements:
+            sql = stats.sql[:200].replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{info_name}{{stmt="{stats.digest}",sql="{sql}"}} 1')
+        return lines
+
+    def _log_slow(self, stats, duration, args):
+        slow_logger.warning(
+            f"慢查询 {duration * 1000:.1f}ms [{stats.digest}] {stats.sql}",
+            extra={'digest': stats.digest, 'duration_ms': round(duration * 1000, 1),
+                   'params': redact(args)}
+        )
+
+
+class InstrumentedCursor:
+    """记录执行耗时和行数的游标包装"""
+
+    def __init__(self, cursor, query_stats):
+        self._cursor = cursor
+        self._query_stats = query_stats
+        self._current = None
+
+    def execute(self, query, args=None):
+        return self._timed(query, args, self._cursor.execute)
+
+    def executemany(self, query, args):
+        return self._timed(query, args, self._cursor.executemany)
+
+    def _timed(self, query, args, method):
+        stats = self._query_stats.statement(query)
+        self._current = stats
+        start = time.perf_counter()
+        try:
+            result = method(query) if args is None else method(query, args)
+        except Exception:
+            self._query_stats.record(stats, time.perf_counter() - start, args, failed=True)
+            raise
+        self._query_stats.record(stats, time.perf_counter() - start, args,
+                                 rowcount=getattr(self._cursor, 'rowcount', -1) or 0)
+        return result
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None and self._current is not None:
+            self._current.rows_returned += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        if self._current is not None:
+            self._current.rows_returned += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if self._current is not None:
+            self._current.rows_returned += len(rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """cursor() 返回 InstrumentedCursor 的连接包装"""
+
+    def __init__(self, connection, query_stats):
+        self._connection = connection
+        self._query_stats = query_stats
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._query_stats)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._connection.close()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def instrument(connection):
+    """按配置包装数据库连接"""
+    query_stats = QueryStats.get_instance()
+    if not query_stats.enabled:
+        return connection
+    return InstrumentedConnection(connection, query_stats)
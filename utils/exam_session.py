@@ -0,0 +1,150 @@
+"""答题状态机
+
+ExamSession 只保存一次答题的状态（题号、得分、答题历史、回看位置），不依赖界面和定时器：
+客户端窗口按它的状态绘制控件，模拟和基准测试可以直接驱动它。
+
+    session = ExamSession(questions)
+    while not session.finished:
+        question = session.current_question
+        item = session.answer('A')      # 返回答题记录，答错时同时记入错题
+        session.next_question()         # 界面上在显示对错 feedback_delay 后调用
+
+回看: previous() / next() 在答题历史中移动，回到最后一条之后即回到当前题目。
+"""
+
+OPTION_LETTERS = 'ABCD'
+
+
+class ExamSession:
+    """一次答题
+
+    answered: 已答题数，当前题目为 questions[answered]
+    question_history: 本次答过的题目 [{'question', 'your_answer', 'is_correct'}]
+    current_index: 回看位置，等于 len(question_history) 时表示在当前题目上
+    """
+
+    def __init__(self, questions, total_questions=None, answered=0, score=0, wrong_questions=None):
+        if not questions:
+            raise ValueError('题库为空')
+        self.questions = questions
+        self.total_questions = min(total_questions or len(questions), len(questions))
+        self.answered = min(answered, self.total_questions)
+        self.score = score
+        self.question_history = []
+        self.current_index = 0
+        # 答错的题目追加到这里（客户端传入错题本列表）
+        self.wrong_questions = wrong_questions if wrong_questions is not None else []
+        self.awaiting_answer = not self.finished
+
+    @classmethod
+    def resume(cls, questions, progress, wrong_questions=None):
+        """从 progress() 保存的进度继续"""
+        return cls(questions, progress['total_questions'], progress['answered'], progress['score'],
+                   wrong_questions)
+
+    def progress(self):
+        """暂停时保存的进度"""
+        return {
+            'answered': self.answered,
+            'score': self.score,
+            'total_questions': self.total_questions
+        }
+
+    @property
+    def finished(self):
+        return self.answered >= self.total_questions
+
+    @property
+    def reviewing(self):
+        """是否在回看答过的题目"""
+        return self.current_index < len(self.question_history)
+
+    @property
+    def current_question(self):
+        """当前待答的题目（答完后即为下一题），全部答完后为 None"""
+        if self.finished:
+            return None
+        return self.questions[self.answered]
+
+    @property
+    def number(self):
+        """正在显示的题号（从 1 开始，继续上次进度时接着上次的题号）"""
+        return self.answered - len(self.question_history) + self.current_index + 1
+
+    @property
+    def accuracy(self):
+        return self.score / self.total_questions * 100
+
+    @property
+    def can_go_previous(self):
+        return self.current_index > 0
+
+    @property
+    def can_go_next(self):
+        # 刚答完、正在显示对错时不能跳过
+        last = len(self.question_history) - 1
+        return self.current_index < last or (self.current_index == last and self.awaiting_answer)
+
+    def answer(self, letter):
+        """回答当前题目，返回答题记录"""
+        if not self.awaiting_answer:
+            raise ValueError('当前没有待回答的题目')
+        question = self.questions[self.answered]
+        if letter not in OPTION_LETTERS[:max(len(question['options']), 1)]:
+            raise ValueError(f'无效的选项: {letter}')
+
+        item = {
+            'question': question,
+            'your_answer': letter,
+            'is_correct': letter == question['answer']
+        }
+        self.question_history.append(item)
+        self.current_index = len(self.question_history) - 1
+        if item['is_correct']:
+            self.score += 1
+        else:
+            self.wrong_questions.append({'question': question, 'your_answer': letter})
+        self.answered += 1
+        self.awaiting_answer = False
+        return item
+
+    def upcoming(self):
+        """下一道要作答的题目 (题号, 题目)，界面据此提前排版；没有时返回 None
+
+        作答前为当前题目之后的一道，作答后（显示对错期间）为 next_question() 将显示的一道。
+        """
+        index = self.answered + 1 if self.awaiting_answer else self.answered
+        if index >= self.total_questions:
+            return None
+        return index + 1, self.questions[index]
+
+    def next_question(self):
+        """显示完对错后进入下一题，返回下一题；全部答完时返回 None"""
+        self.current_index = len(self.question_history)
+        self.awaiting_answer = not self.finished
+        return self.current_question
+
+    def previous(self):
+        """回看上一条答题记录，已在第一条时返回 None"""
+        if not self.can_go_previous:
+            return None
+        self.current_index -= 1
+        return self.question_history[self.current_index]
+
+    def next(self):
+        """回看下一条答题记录；越过最后一条时回到当前题目并返回 None"""
+        if self.current_index < len(self.question_history) - 1:
+            self.current_index += 1
+            return self.question_history[self.current_index]
+        if self.can_go_next:
+            self.current_index = len(self.question_history)
+        return None
+
+
+def simulate(questions, choose, total_questions=None):
+    """不经过界面跑完一次答题，choose(question) 返回选项字母，返回结束时的 ExamSession"""
+    session = ExamSession(questions, total_questions)
+    while not session.finished:
+        session.answer(choose(session.current_question))
+        session.next_question()
+    return session
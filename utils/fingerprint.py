@@ -0,0 +1,285 @@
+"""设备指纹模块
+
+按平台选择指纹来源（Windows 用 WMI 读取 CPU/主板/BIOS 序列号，Linux 用
+/etc/machine-id 加 DMI 厂商和型号，最后退回网卡 MAC），计算结果写入本地缓存。
+缓存用本机的轻量标识（MachineGuid 或 machine-id）做 HMAC 封签，启动时只需
+读一个文件/注册表项即可验证，硬件枚举放到后台线程里进行。
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import logging
+import platform
+import threading
+from config import FINGERPRINT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class FingerprintError(Exception):
+    """当前平台无法取得指纹"""
+
+
+class FingerprintProvider:
+    """指纹来源：components() 返回参与计算的硬件标识"""
+    name = None
+
+    def available(self):
+        return True
+
+    def components(self):
+        raise NotImplementedError
+
+    def device_id(self):
+        # 空值也保留位置（旧版按 f"{cpu}-{board}-{bios}" 计算），同一台机器的结果才不变
+        parts = self.components()
+        if not any(parts):
+            raise FingerprintError(f"{self.name}: 没有可用的硬件标识")
+        return hashlib.md5('-'.join(parts).encode()).hexdigest()
+
+
+class WMIProvider(FingerprintProvider):
+    """Windows：CPU、主板和 BIOS 序列号（与旧版机器码一致，序列号为空的也一样）"""
+    name = 'wmi'
+
+    def available(self):
+        return sys.platform == 'win32'
+
+    def components(self):
+        import wmi
+        import pythoncom
+        # 可能在任意线程中调用，每个线程需要单独初始化 COM
+        pythoncom.CoInitialize()
+        try:
+            c = wmi.WMI()
+            cpu = c.Win32_Processor()[0].ProcessorId.strip()
+            board = c.Win32_BaseBoard()[0].SerialNumber.strip()
+            bios = c.Win32_BIOS()[0].SerialNumber.strip()
+            return [cpu, board, bios]
+        finally:
+            pythoncom.CoUninitialize()
+
+
+class LinuxProvider(FingerprintProvider):
+    """Linux：machine-id 加上 DMI 厂商和型号
+
+    product_uuid、board_serial 等序列号只有 root 可读，不参与计算，否则用不用 sudo
+    运行会得到不同的指纹。
+    """
+    name = 'linux'
+    MACHINE_ID_FILES = ('/etc/machine-id', '/var/lib/dbus/machine-id')
+    DMI_FIELDS = ('sys_vendor', 'product_name')
+    DMI_DIR = '/sys/class/dmi/id'
+
+    def available(self):
+        return sys.platform.startswith('linux')
+
+    def components(self):
+        machine_id = _read_first(self.MACHINE_ID_FILES)
+        if not machine_id:
+            raise FingerprintError('linux: 找不到 machine-id')
+        return [machine_id] + [_read_first([os.path.join(self.DMI_DIR, field)]) for field in self.DMI_FIELDS]
+
+
+class NodeProvider(FingerprintProvider):
+    """网卡 MAC 地址（多网卡时不稳定，只作为最后手段）"""
+    name = 'node'
+
+    def components(self):
+        node = uuid.getnode()
+        # 取不到 MAC 时 getnode 返回随机数（组播位为 1），不能用作指纹
+        if node & (1 << 40):
+            raise FingerprintError('node: 没有可用的网卡地址')
+        return [str(node)]
+
+
+class StubProvider(FingerprintProvider):
+    """固定值，用于测试和基准测试"""
+    name = 'stub'
+
+    def __init__(self, value='stub-device'):
+        self.value = value
+
+    def components(self):
+        return [self.value]
+
+
+PROVIDERS = {
+    'wmi': WMIProvider,
+    'linux': LinuxProvider,
+    'node': NodeProvider,
+    'stub': StubProvider,
+}
+
+
+def register_provider(name, provider_class):
+    """注册新的指纹来源，之后可在 FINGERPRINT_CONFIG['providers'] 中使用"""
+    PROVIDERS[name] = provider_class
+
+
+def _read_first(paths):
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = f.read().strip()
+            if value:
+                return value
+        except OSError:
+            continue
+    return ''
+
+
+def host_probe():
+    """本机的轻量标识，用于验证缓存是否属于这台机器（不枚举硬件）"""
+    if sys.platform == 'win32':
+        try:
+            import winreg
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r'SOFTWARE\Microsoft\Cryptography',
+                                0, winreg.KEY_READ | winreg.KEY_WOW64_64KEY) as key:
+                value = winreg.QueryValueEx(key, 'MachineGuid')[0]
+        except OSError:
+            value = ''
+    else:
+        value = _read_first(LinuxProvider.MACHINE_ID_FILES)
+    return f"{platform.system()}|{value or platform.node()}"
+
+
+class DeviceFingerprint:
+    """设备指纹：优先使用已封签的本地缓存，否则在后台线程中计算"""
+    _instance = None
+    # 2: 指纹保留空的硬件标识，Linux 不再读取只有 root 可读的 DMI 字段
+    CACHE_VERSION = 2
+
+    @staticmethod
+    def get_instance():
+        if DeviceFingerprint._instance is None:
+            DeviceFingerprint._instance = DeviceFingerprint()
+        return DeviceFingerprint._instance
+
+    def __init__(self, config=None, providers=None):
+        self.config = config or FINGERPRINT_CONFIG
+        if providers is None:
+            providers = [PROVIDERS[name]() for name in self.config['providers']]
+        self.providers = [provider for provider in providers if provider.available()]
+        self.cache_file = self.config['cache_file']
+
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self._result = None
+        self._error = None
+        self._cache = None
+
+    # ---- 缓存 ----
+
+    def _seal(self, device_id, provider, created):
+        key = hashlib.sha256(b'exam-fingerprint|' + host_probe().encode()).digest()
+        message = f"{self.CACHE_VERSION}|{device_id}|{provider}|{created}".encode()
+        return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+    def cached(self):
+        """读取并验证本地缓存，失效或被改动时返回 None"""
+        if self._cache is not None:
+            return self._cache['device_id']
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            expected = self._seal(cache['device_id'], cache['provider'], cache['created'])
+            if cache.get('version') != self.CACHE_VERSION or not hmac.compare_digest(expected, cache['seal']):
+                logger.warning("设备指纹缓存校验失败，重新计算")
+                return None
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"读取设备指纹缓存失败: {str(e)}")
+            return None
+        self._cache = cache
+        return cache['device_id']
+
+    def _store(self, device_id, provider):
+        created = int(time.time())
+        cache = {
+            'version': self.CACHE_VERSION,
+            'device_id': device_id,
+            'provider': provider,
+            'created': created,
+            'seal': self._seal(device_id, provider, created)
+        }
+        try:
+            tmp_file = self.cache_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.warning(f"保存设备指纹缓存失败: {str(e)}")
+        self._cache = cache
+
+    # ---- 计算 ----
+
+    def compute(self):
+        """按优先级依次尝试各指纹来源，返回 (device_id, 来源名)"""
+        errors = []
+        for provider in self.providers:
+            try:
+                return provider.device_id(), provider.name
+            except Exception as e:
+                errors.append(f"{provider.name}: {str(e)}")
+        raise FingerprintError('无法计算设备指纹: ' + '; '.join(errors))
+
+    def _rank(self, name):
+        names = [provider.name for provider in self.providers]
+        return names.index(name) if name in names else len(names)
+
+    def _run(self, revalidate):
+        try:
+            start = time.perf_counter()
+            device_id, provider = self.compute()
+            logger.info(f"设备指纹计算完成({provider}): {(time.perf_counter() - start) * 1000:.0f}ms")
+            with self._lock:
+                cached = self._cache
+                if revalidate and cached and cached['device_id'] != device_id:
+                    # 本次运行继续使用缓存中的值；来源不低于原来时才替换，下次启动生效
+                    if self._rank(provider) > self._rank(cached['provider']):
+                        return
+                    logger.warning(f"设备指纹已变化({cached['provider']} -> {provider})，下次启动生效")
+                self._store(device_id, provider)
+                if revalidate:
+                    self._cache = cached
+                else:
+                    self._result = device_id
+        except Exception as e:
+            logger.error(f"计算设备指纹失败: {str(e)}")
+            self._error = e
+        finally:
+            self._done.set()
+
+    def _start(self, revalidate):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, args=(revalidate,),
+                                            name='fingerprint', daemon=True)
+        self._thread.start()
+
+    def prefetch(self):
+        """尽早调用：缓存无效时在后台开始计算，缓存过旧时在后台重新核对"""
+        if self.cached() is None:
+            self._start(revalidate=False)
+        elif time.time() - self._cache['created'] > self.config['revalidate_after']:
+            self._start(revalidate=True)
+
+    def device_id(self, timeout=None):
+        """返回设备指纹；缓存有效时立即返回，否则等待后台计算完成"""
+        self.prefetch()
+        device_id = self.cached()
+        if device_id is not None:
+            return device_id
+        if not self._done.wait(timeout):
+            raise FingerprintError('计算设备指纹超时')
+        if self._result is None:
+            raise self._error
+        return self._result
@@ -0,0 +1,137 @@
+"""卡密格式
+
+新卡密为 18 位: 版本(1) + 批次前缀(2) + 随机部分(14) + 校验位(1)，例如 1ABZZFP4ND9JVYERTR。
+字符取自 Crockford Base32（0-9 和去掉 I/L/O/U 的大写字母），输入时不区分大小写，
+O 视为 0、I/L 视为 1，空格和连字符忽略。
+
+校验位使用 Damm 算法，拟群取 GF(32) 上的 x∘y = 2x + y（全反对称），能发现任意
+单个字符错误和相邻字符交换。该拟群是线性的，整串的校验等价于各位置查表后异或，
+批量校验时每个卡密只需 18 次查表。
+
+旧卡密（16 位随机字母数字，以及导入的 8-32 位字母数字）仍然有效，只检查格式。
+只有以版本号开头、整理后符合上述形状且校验位正确的输入才按新格式处理（转为
+规范写法）；其余输入原样按旧卡密检查格式，是否存在由数据库判断。因此输错一位的
+新卡密不会在本地被拒绝，但也不会被当成另一个新卡密。整理后仍不是字母数字的
+输入（带连字符或空格）按新格式报告校验位错误。
+"""
+import re
+import secrets
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+VERSION = '1'
+PREFIX_LENGTH = 2
+BODY_LENGTH = 14
+KEY_LENGTH = len(VERSION) + PREFIX_LENGTH + BODY_LENGTH + 1
+
+# 旧卡密：8-32 位字母数字（与 card_keys.card_key VARCHAR(32) 一致）
+LEGACY_PATTERN = re.compile(r'^[A-Za-z0-9]{8,32}$')
+
+# 输入归一化：忽略空格和连字符，易混字符按 Crockford 规则替换
+_NORMALIZE = str.maketrans({'O': '0', 'I': '1', 'L': '1', ' ': None, '-': None})
+_SHAPE = re.compile(rf'^[{ALPHABET}]{{{KEY_LENGTH}}}$')
+
+
+def _times_two(value):
+    """GF(32) 中乘以 2，模多项式 x^5 + x^2 + 1"""
+    value <<= 1
+    return value ^ 0b100101 if value & 0b100000 else value
+
+
+def _position_tables(length):
+    """第 i 位字符对校验结果的贡献：2^(length-1-i) * 字符值"""
+    tables = []
+    row = list(range(32))
+    for _ in range(length):
+        tables.append(bytes(row))
+        row = [_times_two(value) for value in row]
+    tables.reverse()
+    return tables
+
+
+# 字符 -> 值（不在字母表中的为 0xFF）
+_VALUES = bytes(ALPHABET.index(chr(code)) if chr(code) in ALPHABET else 0xFF for code in range(256))
+_KEY_TABLES = _position_tables(KEY_LENGTH)
+_PAYLOAD_TABLES = _position_tables(KEY_LENGTH - 1)
+
+
+def _damm(text, tables):
+    interim = 0
+    for table, value in zip(tables, text.encode('ascii').translate(_VALUES)):
+        interim ^= table[value]
+    return interim
+
+
+def check_char(payload):
+    """不含校验位的前 17 位对应的校验位"""
+    # 要求 2 * interim + c = 0，GF(32) 中加法即异或
+    return ALPHABET[_times_two(_damm(payload, _PAYLOAD_TABLES))]
+
+
+def new_prefix():
+    """随机的批次前缀，同一次生成的卡密共用"""
+    return ''.join(secrets.choice(ALPHABET) for _ in range(PREFIX_LENGTH))
+
+
+def generate(prefix=None):
+    """生成一个新格式卡密，prefix 为 2 位批次/档位前缀（缺省时随机）"""
+    prefix = prefix.upper().translate(_NORMALIZE) if prefix else new_prefix()
+    if len(prefix) != PREFIX_LENGTH or any(char not in ALPHABET for char in prefix):
+        raise ValueError(f"卡密前缀应为 {PREFIX_LENGTH} 位，只能包含 {ALPHABET}")
+    payload = VERSION + prefix + ''.join(secrets.choice(ALPHABET) for _ in range(BODY_LENGTH))
+    return payload + check_char(payload)
+
+
+def _canonical(card_key):
+    return card_key.upper().translate(_NORMALIZE)
+
+
+def _shaped(canonical):
+    """以版本号开头、长度和字符都符合新格式（不检查校验位）"""
+    return canonical.startswith(VERSION) and _SHAPE.match(canonical) is not None
+
+
+def normalize(card_key):
+    """整理用户输入：新格式卡密转为规范写法，其余原样保留（旧卡密区分大小写）"""
+    card_key = card_key.strip()
+    canonical = _canonical(card_key)
+    if _shaped(canonical) and _damm(canonical, _KEY_TABLES) == 0:
+        return canonical
+    return card_key
+
+
+def is_structured(card_key):
+    """是否为校验位正确的新格式卡密（规范写法）"""
+    return _shaped(card_key) and _damm(card_key, _KEY_TABLES) == 0
+
+
+def check(card_key):
+    """校验一个卡密（已 normalize），通过时返回 None，否则返回原因"""
+    if is_structured(card_key) or LEGACY_PATTERN.match(card_key):
+        return None
+    return '校验位错误' if _shaped(_canonical(card_key)) else '格式错误'
+
+
+def check_many(card_keys):
+    """批量校验，返回与输入一一对应的结果（None 或原因）"""
+    shape = _SHAPE.match
+    legacy = LEGACY_PATTERN.match
+    tables = _KEY_TABLES
+    values = _VALUES
+    results = []
+    for card_key in card_keys:
+        if card_key.startswith(VERSION) and shape(card_key):
+            interim = 0
+            for table, value in zip(tables, card_key.encode('ascii').translate(values)):
+                interim ^= table[value]
+            if not interim:
+                results.append(None)
+                continue
+        if legacy(card_key):
+            results.append(None)
+        else:
+            results.append('校验位错误' if _shaped(_canonical(card_key)) else '格式错误')
+    return results
+
+
+def is_valid(card_key):
+    return check(card_key) is None
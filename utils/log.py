@@ -0,0 +1,128 @@
+"""日志模块
+
+logging 调用只把记录放进内存队列（QueueHandler），由 QueueListener 后台线程
+统一写入一个按大小轮转的 JSON 行文件。界面线程和数据库调用路径上不做文件 I/O，
+异常堆栈也在后台线程中格式化。
+
+各模块使用 logging.getLogger(__name__)，级别在 LOGGING_CONFIG['levels'] 中按
+模块配置。extra={...} 传入的字段作为结构化字段原样写入 JSON。
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from utils.metrics import MetricsRegistry
+from config import LOGGING_CONFIG
+
+# LogRecord 自带的属性，其余属性（extra 传入的）作为结构化字段输出
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """队列满时丢弃记录并计数，调用方永远不会阻塞"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 只在调用线程中合并消息参数（参数可能随后被修改），异常堆栈留给后台线程格式化。
+        # 根日志器只有这一个处理器，直接修改记录而不复制
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(config=None):
+    """配置根日志器（重复调用无副作用），返回 QueueListener"""
+    global _listener, _handler
+    if _listener is not None:
+        return _listener
+    config = config or LOGGING_CONFIG
+
+    sinks = []
+    if config['file']:
+        os.makedirs(os.path.dirname(config['file']) or '.', exist_ok=True)
+        file_handler = RotatingFileHandler(config['file'], maxBytes=config['max_bytes'],
+                                           backupCount=config['backup_count'],
+                                           encoding='utf-8', delay=True)
+        file_handler.setFormatter(JsonFormatter())
+        sinks.append(file_handler)
+    # 打包后的窗口程序没有 stderr
+    if config['console'] and sys.stderr is not None:
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
+        sinks.append(console)
+
+    # 不记录调用位置（每条日志要回溯调用栈）和进程信息，JSON 中也不输出这些字段
+    logging._srcfile = None
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    log_queue = queue.Queue(config['queue_size'])
+    _handler = NonBlockingQueueHandler(log_queue)
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(config['level'])
+    for name, level in config['levels'].items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, *sinks, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    MetricsRegistry.get_instance().register_gauges('logging', stats)
+    return _listener
+
+
+def stop_logging():
+    """写完队列中剩余的日志并停止后台线程"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+def stats():
+    """队列长度和丢弃的日志数"""
+    if _handler is None:
+        return {}
+    return {'queued': _handler.queue.qsize(), 'dropped': _handler.dropped}
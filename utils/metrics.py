@@ -0,0 +1,309 @@
+"""进程内指标模块
+
+计数器和对数分桶延迟直方图只在内存中累加，后台线程按批次把增量
+写入 Redis（pipeline）或文件；Redis 不可用时自动写文件。连接池、缓存
+等组件以"仪表源"的形式注册，与计数器、直方图一起导出为 Prometheus 文本格式。
+"""
+import os
+import re
+import json
+import logging
+import threading
+from datetime import datetime
+from config import METRICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 直方图以微秒为单位：每个 2 的幂区间再分 4 个子桶，相对误差不超过 25%
+BUCKET_COUNT = 128
+
+
+def bucket_index(us):
+    """微秒数 -> 桶序号"""
+    if us < 4:
+        return us if us > 0 else 0
+    shift = us.bit_length() - 3
+    return min((shift << 2) + (us >> shift), BUCKET_COUNT - 1)
+
+
+def bucket_upper(index):
+    """桶序号 -> 桶上界（微秒）"""
+    if index < 4:
+        return index + 1
+    shift = (index >> 2) - 1
+    return ((index & 3 | 4) + 1) << shift
+
+
+class Counter:
+    """计数器"""
+
+    __slots__ = ('value', 'flushed', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self.flushed = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """对数分桶延迟直方图"""
+
+    __slots__ = ('counts', 'count', 'total', 'flushed_counts', 'flushed_count',
+                 'flushed_total', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.flushed_counts = [0] * BUCKET_COUNT
+        self.flushed_count = 0
+        self.flushed_total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bucket_index(int(seconds * 1000000))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, p, counts=None):
+        """返回第 p 百分位的延迟（秒，取桶上界）"""
+        counts = counts or self.counts
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = total * p / 100
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return bucket_upper(index) / 1000000
+        return bucket_upper(BUCKET_COUNT - 1) / 1000000
+
+    def summary(self):
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.total
+        return {
+            'count': count,
+            'total_time': total,
+            'avg_time': total / count if count else 0.0,
+            'p50': self.percentile(50, counts),
+            'p95': self.percentile(95, counts),
+            'p99': self.percentile(99, counts)
+        }
+
+    def state(self):
+        """返回 (桶计数, 次数, 总耗时) 的副本"""
+        with self._lock:
+            return list(self.counts), self.count, self.total
+
+    def take_delta(self):
+        """返回上次刷新以来的增量 (桶增量, 次数增量, 耗时增量)"""
+        with self._lock:
+            delta = {i: c - f for i, (c, f) in enumerate(zip(self.counts, self.flushed_counts)) if c != f}
+            count, total = self.count - self.flushed_count, self.total - self.flushed_total
+            self.flushed_counts = list(self.counts)
+            self.flushed_count, self.flushed_total = self.count, self.total
+        return delta, count, total
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        if MetricsRegistry._instance is None:
+            MetricsRegistry._instance = MetricsRegistry()
+        return MetricsRegistry._instance
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.gauge_sources = {}  # 名称 -> 返回 {指标: 数值} 的函数
+        self.collectors = []     # 自行输出 Prometheus 文本行的函数
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flusher = None
+
+    def counter(self, name):
+        counter = self.counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self.counters.setdefault(name, Counter())
+        return counter
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def observe(self, name, seconds):
+        """记录一次耗时"""
+        self.histogram(name).observe(seconds)
+
+    def register_gauges(self, name, source):
+        """注册仪表源，导出时调用 source() 读取当前值"""
+        self.gauge_sources[name] = source
+
+    def register_collector(self, collector):
+        """注册收集器，导出时调用 collector(prefix) 取得文本行列表"""
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def gauges(self):
+        """读取所有仪表源，只保留数值（布尔值记为 0/1）"""
+        result = {}
+        for name, source in list(self.gauge_sources.items()):
+            try:
+                values = source()
+            except Exception as e:
+                logger.warning(f"读取指标 {name} 失败: {str(e)}")
+                continue
+            result[name] = {key: float(value) for key, value in values.items()
+                            if isinstance(value, (int, float))}
+        return result
+
+    def snapshot(self):
+        """返回所有指标的当前值"""
+        return {
+            'counters': {name: c.value for name, c in list(self.counters.items())},
+            'histograms': {name: h.summary() for name, h in list(self.histograms.items())}
+        }
+
+    def render_prometheus(self, prefix='exam'):
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        for source, values in self.gauges().items():
+            for key, value in values.items():
+                name = _metric_name(prefix, source, key)
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value:g}")
+
+        for counter_name, counter in list(self.counters.items()):
+            name = _metric_name(prefix, counter_name, 'total')
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {counter.value}")
+
+        if self.histograms:
+            name = f"{prefix}_latency_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for func_name, histogram in list(self.histograms.items()):
+                lines.extend(histogram_lines(name, f'name="{func_name}"', histogram))
+
+        for collector in list(self.collectors):
+            try:
+                lines.extend(collector(prefix))
+            except Exception as e:
+                logger.warning(f"指标收集失败: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+    # ---- 后台刷新 ----
+
+    def start_flusher(self, interval=None):
+        """启动后台刷新线程（重复调用无副作用）"""
+        if self._flusher and self._flusher.is_alive():
+            return
+        interval = interval or METRICS_CONFIG['flush_interval']
+        self._stop_event.clear()
+        self._flusher = threading.Thread(
+            target=self._flush_loop, args=(interval,), name='MetricsFlusher', daemon=True
+        )
+        self._flusher.start()
+
+    def stop_flusher(self):
+        self._stop_event.set()
+        if self._flusher:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    def _flush_loop(self, interval):
+        while not self._stop_event.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"指标刷新失败: {str(e)}")
+
+    def flush(self):
+        """把增量写入 Redis，失败时写入文件"""
+        batch = self._collect_delta()
+        if not batch['counters'] and not batch['histograms']:
+            return
+        if METRICS_CONFIG['sink'] == 'redis' and self._flush_redis(batch):
+            return
+        self._flush_file(batch)
+
+    def _collect_delta(self):
+        counters = {}
+        for name, counter in list(self.counters.items()):
+            with counter._lock:
+                delta = counter.value - counter.flushed
+                counter.flushed = counter.value
+            if delta:
+                counters[name] = delta
+
+        histograms = {}
+        for name, histogram in list(self.histograms.items()):
+            buckets, count, total = histogram.take_delta()
+            if count:
+                histograms[name] = {'buckets': buckets, 'count': count, 'total_time': total}
+        return {'counters': counters, 'histograms': histograms}
+
+    def _flush_redis(self, batch):
+        """累加到 Redis，多个进程的数据汇总在同一组键上"""
+        from utils.redis_cache import RedisCache
+
+        redis_client = RedisCache.get_instance().redis
+        if redis_client is None:
+            return False
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for name, delta in batch['counters'].items():
+                pipe.hincrby('perf:counters', name, delta)
+            for name, data in batch['histograms'].items():
+                pipe.hincrby(f"perf:stats:{name}", 'total_calls', data['count'])
+                pipe.hincrbyfloat(f"perf:stats:{name}", 'total_time', data['total_time'])
+                for index, count in data['buckets'].items():
+                    pipe.hincrby(f"perf:hist:{name}", index, count)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"指标写入Redis失败，改写文件: {str(e)}")
+            return False
+
+    def _flush_file(self, batch):
+        path = METRICS_CONFIG['file']
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        batch['time'] = datetime.now().isoformat(timespec='seconds')
+        batch['pid'] = os.getpid()
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(batch, ensure_ascii=False) + '\n')
+
+
+def _metric_name(*parts):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', '_'.join(parts))
+
+
+def histogram_lines(name, label, histogram):
+    """单个直方图的 Prometheus 文本行（只输出非空桶）"""
+    counts, count, total = histogram.state()
+    lines = []
+    seen = 0
+    for index, bucket_count in enumerate(counts):
+        if bucket_count:
+            seen += bucket_count
+            lines.append(f'{name}_bucket{{{label},le="{bucket_upper(index) / 1000000:g}"}} {seen}')
+    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {count}')
+    lines.append(f"{name}_sum{{{label}}} {total:.6f}")
+    lines.append(f"{name}_count{{{label}}} {count}")
+    return lines
@@ -1,119 +1,183 @@
 import logging
 import time
+import json
+import threading
 from datetime import datetime
 from functools import wraps
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from utils.redis_cache import RedisCache
-from utils.db_pool import DatabasePool
+from utils.storage import get_storage
+from utils.metrics import MetricsRegistry, bucket_upper
+from utils.db_stats import QueryStats
+from config import MONITOR_CONFIG, LOG_DIR
 import os
-from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:  # 未安装 psutil 时只导出应用自身的指标
+    psutil = None
 
 class SystemMonitor:
-    def __init__(self):
+    def __init__(self, db=None):
+        self.db = db  # 用于健康检查的数据库（需提供 get_connection）
         self.redis_cache = RedisCache.get_instance()
-        logging.basicConfig(
-            filename='logs/system.log',
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
-        
-        # 添加文件处理器
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-        
-        # 设置日志轮转
-        handler = RotatingFileHandler(
-            'logs/system.log',
-            maxBytes=1024*1024,  # 1MB
-            backupCount=5
-        )
-        logging.getLogger().addHandler(handler)
+        self.thresholds = MONITOR_CONFIG['thresholds']
+        self.latest = {}
+        self._process = psutil.Process() if psutil else None
+        self._stop_event = threading.Event()
+        self._sampler = None
+        self._server = None
+        registry = MetricsRegistry.get_instance()
+        registry.register_gauges('redis_cache', self.redis_cache.stats)
+        registry.register_gauges('memory', lambda: self.latest.get('memory', {}))
+        registry.register_gauges('cpu', lambda: self.latest.get('cpu', {}))
+        registry.register_gauges('disk', lambda: self.latest.get('disk', {}))
+        registry.register_gauges('network', lambda: self.latest.get('network', {}))
+        registry.start_flusher()
+
+    def start(self, port, host=None):
+        """启动后台采样线程和本地指标 HTTP 服务"""
+        if self._sampler and self._sampler.is_alive():
+            return
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name='SystemMonitor', daemon=True)
+        self._sampler.start()
+
+        try:
+            self._server = ThreadingHTTPServer((host or MONITOR_CONFIG['host'], port), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"指标服务启动失败(端口 {port}): {str(e)}")
+            return
+        self._server.monitor = self
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='MetricsServer', daemon=True).start()
+        logger.info(f"指标服务已启动: http://{self._server.server_address[0]}:{port}/metrics")
+
+    def stop(self):
+        """停止采样和指标服务"""
+        self._stop_event.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._sampler:
+            self._sampler.join(timeout=5)
+            self._sampler = None
+
+    def _sample_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.monitor_system_health()
+            except Exception as e:
+                logger.error(f"系统监控采样失败: {str(e)}")
+            self._stop_event.wait(MONITOR_CONFIG['sample_interval'])
     
     @staticmethod
     def performance_monitor(threshold=1.0):
         """性能监控装饰器"""
         def decorator(func):
+            histogram = MetricsRegistry.get_instance().histogram(func.__name__)
+
             @wraps(func)
             def wrapper(*args, **kwargs):
-                start_time = time.time()
-                result = func(*args, **kwargs)
-                duration = time.time() - start_time
-                
-                if duration > threshold:
-                    logging.warning(
-                        f"性能警告: {func.__name__} 执行时间 {duration:.2f}秒"
-                    )
-                    
-                # 记录到Redis用于统计
+                start_time = time.perf_counter()
                 try:
-                    RedisCache.get_instance()._redis.hincrby(
-                        f"perf:stats:{func.__name__}",
-                        "total_calls",
-                        1
-                    )
-                    RedisCache.get_instance()._redis.hincrbyfloat(
-                        f"perf:stats:{func.__name__}",
-                        "total_time",
-                        duration
-                    )
-                except:
-                    pass
-                    
-                return result
+                    return func(*args, **kwargs)
+                finally:
+                    duration = time.perf_counter() - start_time
+                    # 只在内存中累加，由后台线程批量写入Redis
+                    histogram.observe(duration)
+                    if duration > threshold:
+                        logger.warning(
+                            f"性能警告: {func.__name__} 执行时间 {duration:.2f}秒"
+                        )
             return wrapper
         return decorator
     
     @staticmethod
     def log_error(e, operation):
         """记录错误日志"""
-        logging.error(f"{operation} 失败: {str(e)}")
+        logger.error(f"{operation} 失败: {str(e)}")
     
     def check_system_health(self):
         """检查系统健康状态"""
         health_status = {
             'database': self._check_database(),
             'redis': self._check_redis(),
-            'performance': self._check_performance()
+            'performance': self._check_performance(),
+            'queries': QueryStats.get_instance().top(10)
         }
         return health_status
     
     def _check_database(self):
-        """检查数据库连接"""
-        try:
-            with DatabasePool().get_connection() as conn:
+        """检查数据库连接（分片部署时检查所有分片）"""
+        def ping(db):
+            with db.get_connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute("SELECT 1")
-                    return True
+
+        try:
+            (self.db or get_storage()).fan_out(ping)
+            return True
         except Exception as e:
-            logging.error(f"数据库检查失败: {str(e)}")
+            logger.error(f"数据库检查失败: {str(e)}")
             return False
     
     def _check_redis(self):
         """检查Redis连接"""
         try:
-            self.redis_cache._redis.ping()
+            self.redis_cache.redis.ping()
             return True
         except:
-            logging.error("Redis检查失败")
+            logger.error("Redis检查失败")
             return False
     
     def _check_performance(self):
-        """检查系统性能"""
+        """检查系统性能（所有进程汇总），Redis 不可用时返回本进程的统计"""
         try:
             stats = {}
-            for key in self.redis_cache._redis.keys("perf:stats:*"):
-                func_stats = self.redis_cache._redis.hgetall(key)
+            redis_client = self.redis_cache.redis
+            for key in redis_client.scan_iter(match="perf:stats:*", count=500):
+                name = key.decode().split(':', 2)[-1]
+                pipe = redis_client.pipeline(transaction=False)
+                pipe.hgetall(key)
+                pipe.hgetall(f"perf:hist:{name}")
+                func_stats, buckets = pipe.execute()
                 if func_stats:
                     total_calls = int(func_stats.get(b'total_calls', 0))
                     total_time = float(func_stats.get(b'total_time', 0))
                     avg_time = total_time / total_calls if total_calls > 0 else 0
-                    stats[key.decode().split(':')[-1]] = {
+                    stats[name] = {
                         'total_calls': total_calls,
-                        'avg_time': avg_time
+                        'avg_time': avg_time,
+                        **self._percentiles(buckets)
                     }
             return stats
         except Exception as e:
-            logging.error(f"性能检查失败: {str(e)}")
-            return {} 
+            logger.error(f"性能检查失败: {str(e)}")
+            return {
+                name: {'total_calls': s['count'], 'avg_time': s['avg_time'],
+                       'p50': s['p50'], 'p95': s['p95'], 'p99': s['p99']}
+                for name, s in MetricsRegistry.get_instance().snapshot()['histograms'].items()
+            }
+
+    @staticmethod
+    def _percentiles(buckets):
+        """由 Redis 中的分桶计数计算 p50/p95/p99（秒）"""
+        counts = sorted((int(index), int(count)) for index, count in buckets.items())
+        total = sum(count for _, count in counts)
+        result = {}
+        for p in (50, 95, 99):
+            seen, value = 0, 0.0
+            for index, count in counts:
+                seen += count
+                if total and seen >= total * p / 100:
+                    value = bucket_upper(index) / 1000000
+                    break
+            result[f"p{p}"] = value
+        return result
 
     @performance_monitor(threshold=1.0)
     def monitor_system_health(self):
@@ -129,4 +193,98 @@ class SystemMonitor:
         self.log_stats(stats)
         
         # 检查阈值
-        self.check_thresholds(stats) 
\ No newline at end of file
+        self.check_thresholds(stats)
+        self.latest = stats
+        return stats
+
+    def get_memory_usage(self):
+        """进程常驻内存和系统内存占用"""
+        if psutil is None:
+            return {}
+        memory = psutil.virtual_memory()
+        return {
+            'rss_bytes': self._process.memory_info().rss,
+            'system_percent': memory.percent,
+            'system_available_bytes': memory.available
+        }
+
+    def get_cpu_usage(self):
+        """进程和系统 CPU 占用（相对上次采样）"""
+        if psutil is None:
+            return {}
+        return {
+            'process_percent': self._process.cpu_percent(None),
+            'system_percent': psutil.cpu_percent(None),
+            'threads': self._process.num_threads()
+        }
+
+    def get_disk_usage(self):
+        """日志目录所在磁盘的占用"""
+        if psutil is None:
+            return {}
+        usage = psutil.disk_usage(os.path.abspath(LOG_DIR) if os.path.exists(LOG_DIR) else '.')
+        return {'used_percent': usage.percent, 'free_bytes': usage.free}
+
+    def get_network_status(self):
+        """网络收发字节数和本进程的连接数"""
+        if psutil is None:
+            return {}
+        counters = psutil.net_io_counters()
+        try:
+            connections = len(self._process.connections(kind='inet'))
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            connections = -1
+        return {
+            'bytes_sent': counters.bytes_sent,
+            'bytes_recv': counters.bytes_recv,
+            'connections': connections
+        }
+
+    def log_stats(self, stats):
+        """记录监控数据"""
+        logger.info(f"系统监控: {json.dumps(stats, ensure_ascii=False)}")
+
+    def check_thresholds(self, stats):
+        """超过阈值时记录警告，返回超限项列表"""
+        checks = [
+            ('内存占用', stats['memory'].get('system_percent'), self.thresholds['memory_percent'], '%'),
+            ('CPU占用', stats['cpu'].get('system_percent'), self.thresholds['cpu_percent'], '%'),
+            ('磁盘占用', stats['disk'].get('used_percent'), self.thresholds['disk_percent'], '%'),
+            ('进程内存', stats['memory'].get('rss_bytes', 0) / 1024 / 1024, self.thresholds['rss_mb'], 'MB')
+        ]
+        exceeded = []
+        for label, value, limit, unit in checks:
+            if value is not None and value > limit:
+                logger.warning(f"资源警告: {label} {value:.1f}{unit} 超过阈值 {limit}{unit}")
+                exceeded.append(label)
+        return exceeded
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics 输出 Prometheus 文本格式，/health 输出健康检查 JSON，
+    /queries 输出按总耗时排序的 SQL 语句统计"""
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = MetricsRegistry.get_instance().render_prometheus().encode('utf-8')
+            self._reply(200, 'text/plain; version=0.0.4; charset=utf-8', body)
+        elif self.path == '/health':
+            health = self.server.monitor.check_system_health()
+            status = 200 if health['database'] and health['redis'] else 503
+            body = json.dumps(health, ensure_ascii=False).encode('utf-8')
+            self._reply(status, 'application/json; charset=utf-8', body)
+        elif self.path.startswith('/queries'):
+            body = json.dumps(QueryStats.get_instance().top(50), ensure_ascii=False).encode('utf-8')
+            self._reply(200, 'application/json; charset=utf-8', body)
+        else:
+            self._reply(404, 'text/plain; charset=utf-8', b'not found\n')
+
+    def _reply(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass 
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""题库解析模块"""
+
+SECTION_TITLES = ['一、单选题', '二、单选题', '单选题']
+OPTION_PREFIXES = ('A.', 'B.', 'C.', 'D.',
+                   'A、', 'B、', 'C、', 'D、',
+                   'A ', 'B ', 'C ', 'D ')
+TITLE_PREFIXES = tuple(f"{n}." for n in range(1, 1000))
+
+
+def parse_questions(content):
+    """解析题库文本，返回题目列表 [{'title', 'options', 'answer'}]"""
+    questions = []
+
+    # 按题目分割
+    questions_raw = content.split('\n\n')
+
+    for i, q in enumerate(questions_raw):
+        try:
+            if not q.strip():
+                continue
+
+            question = parse_question(q)
+            if question:
+                questions.append(question)
+
+        except Exception as e:
+            print(f"处理题目 {i+1} 时出错: {str(e)}")
+            continue
+
+    return questions
+
+
+def parse_question(block):
+    """解析单道题目，格式不完整时返回 None"""
+    lines = [line.strip() for line in block.split('\n') if line.strip()]
+
+    # 提取题目
+    title = ''
+    options = []
+    answer = ''
+
+    # 查找题目
+    for line in lines:
+        if line in SECTION_TITLES:
+            continue
+        if '?' in line or '？' in line or line.startswith(TITLE_PREFIXES):
+            title = line
+            break
+
+    if not title and lines:
+        title = lines[0]
+
+    # 提取选项
+    for line in lines:
+        if line.startswith(OPTION_PREFIXES):
+            options.append(line)
+        elif '答案' in line or '正确' in line:
+            for ans in ['A', 'B', 'C', 'D']:
+                if ans in line:
+                    answer = ans
+                    break
+
+    # 验证提取的内容
+    if title and len(options) == 4 and answer:
+        return {
+            'title': title,
+            'options': options,
+            'answer': answer
+        }
+    return None
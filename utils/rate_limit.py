@@ -0,0 +1,157 @@
+"""令牌桶限流模块
+
+按设备和卡密分别限制卡密验证、状态检查的频率。优先使用 Redis（Lua 脚本
+原子地补充和扣减令牌），Redis 不可用时退化为进程内令牌桶。被限流时返回
+需要等待的秒数，由调用方退避后重试。
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from utils.redis_cache import RedisCache
+from config import RATE_LIMIT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """请求被限流"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"请求过于频繁，请 {retry_after:.0f} 秒后再试")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多 capacity 个"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def take(self, now=None):
+        """取一个令牌，返回需要等待的秒数（0 表示放行）"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class LocalRateLimiter:
+    """进程内限流器，桶数量有上限（最久未用的先淘汰）"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key, rate, capacity):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, capacity)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take()
+
+
+class RedisRateLimiter:
+    """Redis 限流器，多个客户端共享同一个桶"""
+
+    # KEYS[1] 桶键；ARGV: 速率(令牌/秒)、容量
+    # 返回 {是否放行, 需等待毫秒数}
+    SCRIPT = """
+        local rate = tonumber(ARGV[1])
+        local capacity = tonumber(ARGV[2])
+        local t = redis.call('TIME')
+        local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(bucket[1]) or capacity
+        local ts = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+
+        local allowed = 0
+        local wait_ms = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+            allowed = 1
+        else
+            wait_ms = math.ceil((1 - tokens) * 1000 / rate)
+        end
+
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+        redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+        return {allowed, wait_ms}
+    """
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self._script = redis_client.register_script(self.SCRIPT)
+
+    def acquire(self, key, rate, capacity):
+        allowed, wait_ms = self._script(keys=[f"ratelimit:{key}"], args=[rate, capacity])
+        return 0.0 if allowed else wait_ms / 1000
+
+
+class RateLimiter:
+    """按操作类型配置的限流器，同时检查设备桶和卡密桶"""
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        if RateLimiter._instance is None:
+            RateLimiter._instance = RateLimiter()
+        return RateLimiter._instance
+
+    def __init__(self, config=None, redis_client=None):
+        self.config = config or RATE_LIMIT_CONFIG
+        self.local = LocalRateLimiter(self.config.get('max_local_keys', 10000))
+        self.remote = None
+
+        if self.config.get('backend') == 'redis':
+            if redis_client is None:
+                redis_client = RedisCache.get_instance().redis
+            if redis_client is not None:
+                try:
+                    self.remote = RedisRateLimiter(redis_client)
+                except Exception as e:
+                    logger.warning(f"Redis限流不可用，使用进程内限流: {str(e)}")
+
+    def check(self, action, device_id=None, card_key=None):
+        """检查是否允许执行，返回需要等待的秒数（0 表示放行）"""
+        policy = self.config.get(action)
+        if not self.config.get('enabled') or not policy:
+            return 0.0
+
+        retry_after = 0.0
+        for scope, value in (('device', device_id), ('key', card_key)):
+            if value:
+                retry_after = max(retry_after, self._acquire(
+                    f"{action}:{scope}:{value}", policy['rate'], policy['burst']
+                ))
+        return retry_after
+
+    def enforce(self, action, device_id=None, card_key=None):
+        """被限流时抛出 RateLimited"""
+        retry_after = self.check(action, device_id, card_key)
+        if retry_after > 0:
+            raise RateLimited(retry_after)
+
+    def _acquire(self, key, rate, capacity):
+        if self.remote is not None:
+            try:
+                return self.remote.acquire(key, rate, capacity)
+            except Exception as e:
+                logger.warning(f"Redis限流失败，使用进程内限流: {str(e)}")
+        return self.local.acquire(key, rate, capacity)
@@ -1,9 +1,12 @@
 """Redis缓存模块"""
-import redis
-import json
 import hashlib
+import logging
 from functools import wraps
 from config import REDIS_CONFIG
+from utils.cache import TwoTierCache
+from utils.codec import CacheCodec
+
+logger = logging.getLogger(__name__)
 
 try:
     import redis
@@ -13,178 +16,104 @@ except ImportError:
 
 class RedisCache:
     _instance = None
-    
+
     @staticmethod
     def get_instance():
         if RedisCache._instance is None:
             RedisCache._instance = RedisCache()
         return RedisCache._instance
-        
+
     def __init__(self):
-        try:
-            self.redis = redis.Redis(
-                host=REDIS_CONFIG['host'],
-                port=REDIS_CONFIG['port'],
-                db=REDIS_CONFIG['db'],
-                password=REDIS_CONFIG['password'],
-                decode_responses=REDIS_CONFIG['decode_responses']
+        self.redis = None
+        if redis is not None:
+            try:
+                self.redis = redis.Redis(
+                    host=REDIS_CONFIG['host'],
+                    port=REDIS_CONFIG['port'],
+                    db=REDIS_CONFIG['db'],
+                    password=REDIS_CONFIG['password'],
+                    decode_responses=REDIS_CONFIG['decode_responses'],
+                    socket_timeout=REDIS_CONFIG['socket_timeout'],
+                    socket_connect_timeout=REDIS_CONFIG['socket_timeout']
+                )
+            except Exception as e:
+                print(f"Redis连接失败: {e}")
+                self.redis = None
+
+        # 进程内 LRU + Redis 两级缓存，Redis 不可用时仍可使用进程内缓存
+        self.cache = TwoTierCache(
+            self.redis,
+            l1_max_size=REDIS_CONFIG['l1_max_size'],
+            l1_ttl=REDIS_CONFIG['l1_ttl'],
+            expire_time=REDIS_CONFIG['expire_time'],
+            retry_interval=REDIS_CONFIG['retry_interval'],
+            codec=CacheCodec(
+                compression=REDIS_CONFIG['compression'],
+                threshold=REDIS_CONFIG['compress_threshold']
             )
-        except Exception as e:
-            print(f"Redis连接失败: {e}")
-            self.redis = None
-    
+        )
+
     def _generate_key(self, prefix, *args, **kwargs):
         """生成缓存键"""
         data = f"{str(args)}:{str(kwargs)}"
         return f"{prefix}:{hashlib.md5(data.encode()).hexdigest()}"
-    
-    def cache_query(self, prefix='query', expire_time=None):
-        """查询缓存装饰器"""
+
+    def cache_query(self, prefix='query', expire_time=None, tags=()):
+        """查询缓存装饰器（并发未命中只执行一次查询）"""
         def decorator(func):
             @wraps(func)
             def wrapper(*args, **kwargs):
-                if not self.redis:
-                    return func(*args, **kwargs)
-                    
                 key = self._generate_key(prefix, *args, **kwargs)
-                
-                # 尝试从缓存获取
-                try:
-                    cached = self.redis.get(key)
-                    if cached:
-                        return json.loads(cached)
-                except:
-                    return func(*args, **kwargs)
-                
-                # 执行查询
-                result = func(*args, **kwargs)
-                
-                # 存入缓存
-                try:
-                    self.redis.setex(
-                        key,
-                        expire_time or REDIS_CONFIG['expire_time'],
-                        json.dumps(result)
-                    )
-                except:
-                    pass
-                
-                return result
+                return self.cache.get_or_load(
+                    key, lambda: func(*args, **kwargs), expire_time, tags
+                )
             return wrapper
         return decorator
-    
+
     def cache_card_status(self, card_key, status, expire=None):
         """缓存卡密状态"""
-        if not self.redis:
-            return
-            
-        try:
-            key = f"card:status:{card_key}"
-            self.redis.setex(
-                key,
-                expire or REDIS_CONFIG['expire_time'],
-                json.dumps(status)
-            )
-        except:
-            pass
-    
+        self.cache.set(f"card:status:{card_key}", status, expire, tags=('card',))
+
     def get_card_status(self, card_key):
         """获取卡密状态"""
-        if not self.redis:
-            return None
-            
-        try:
-            key = f"card:status:{card_key}"
-            status = self.redis.get(key)
-            return json.loads(status) if status else None
-        except:
-            return None
-    
+        return self.cache.get(f"card:status:{card_key}")
+
     def invalidate_cache(self, pattern='*'):
-        """清除指定模式的缓存"""
-        if not self.redis:
-            return
-            
-        try:
-            keys = self.redis.keys(pattern)
-            if keys:
-                self.redis.delete(*keys)
-        except:
-            pass
-    
+        """清除指定模式的缓存（SCAN 分批，不阻塞 Redis）"""
+        return self.cache.invalidate_pattern(pattern)
+
+    def invalidate_tag(self, tag):
+        """清除带有指定标签的缓存"""
+        return self.cache.invalidate_tag(tag)
+
     def cache_questions(self, questions, subject):
         """缓存题库"""
-        if not self.redis:
-            return
-            
-        try:
-            key = f"questions:{subject}"
-            self.redis.setex(
-                key,
-                REDIS_CONFIG['expire_time'],
-                json.dumps(questions)
-            )
-        except:
-            pass
-    
+        self.cache.set(f"questions:{subject}", questions, tags=('questions',))
+
     def get_cached_questions(self, subject):
         """获取缓存的题库"""
-        if not self.redis:
-            return None
-            
-        try:
-            key = f"questions:{subject}"
-            questions = self.redis.get(key)
-            return json.loads(questions) if questions else None
-        except:
-            return None 
-    
+        return self.cache.get(f"questions:{subject}")
+
     def cache_with_fallback(self, key, callback, expire=3600):
         """带有降级处理的缓存方法"""
         try:
-            # 尝试从缓存获取
-            if self.redis:
-                data = self.redis.get(key)
-                if data:
-                    return json.loads(data)
-            
-            # 缓存未命中，执行回调
-            result = callback()
-            
-            # 写入缓存
-            if self.redis:
-                self.redis.setex(key, expire, json.dumps(result))
-            
-            return result
-        except:
+            return self.cache.get_or_load(key, callback, expire)
+        except Exception as e:
+            logger.warning(f"缓存加载失败，直接执行回调: {str(e)}")
             return callback()
 
     def set(self, key, value, expire=None):
         """设置缓存"""
-        if not self.redis:
-            return False
-        try:
-            self.redis.set(key, value)
-            if expire:
-                self.redis.expire(key, expire)
-            return True
-        except:
-            return False
-            
+        return self.cache.set(key, value, expire)
+
     def get(self, key):
         """获取缓存"""
-        if not self.redis:
-            return None
-        try:
-            return self.redis.get(key)
-        except:
-            return None
-            
+        return self.cache.get(key)
+
     def delete(self, key):
         """删除缓存"""
-        if not self.redis:
-            return False
-        try:
-            return self.redis.delete(key)
-        except:
-            return False 
\ No newline at end of file
+        return self.cache.delete(key)
+
+    def stats(self):
+        """获取缓存命中统计"""
+        return self.cache.stats()
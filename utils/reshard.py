@@ -0,0 +1,235 @@
+"""在线重新分片
+
+把一段哈希槽移到目标分片，迁移期间卡密照常验证和修改:
+  1. 槽位表中把这些槽标记为迁移中（moving_to = 目标分片），等待各进程重新读取槽位表。
+     此后这些槽的卡密先在目标分片查找，找不到再到原分片
+  2. 按主键分批扫描其他分片，属于这些槽的行在原分片上加行锁，复制到目标分片并提交后
+     再从原分片删除；加锁期间客户端对这些行的修改会等待，删除后下次访问即到目标分片
+  3. 把槽改为属于目标分片，等待一个刷新间隔后再扫描一次，补上仍按旧槽位表写入原分片
+     的新卡密
+
+卡密在客户端查找之后、加锁之前恰好被迁移时，原分片上会查不到，客户端通过
+storage.reroute() 重新解析后到目标分片再查一次。
+中断后用相同参数重新运行即可继续（已复制到目标分片的行以目标分片为准）。
+开启列加密时槽位仍按卡密原值计算，扫描时批量解密 card_key_enc。
+
+用法:
+    python -m utils.reshard --status
+    python -m utils.reshard --slots 0-255 --to 2 [--batch 500] [--pause 0.2]
+"""
+import logging
+import argparse
+import threading
+from utils.changefeed import REMOVAL_EVENTS
+from utils.db_crypto import EncryptedCursor
+from utils.storage import ShardedStorage, key_slot
+
+logger = logging.getLogger(__name__)
+
+MOVE_COLUMNS = ("card_key, card_key_enc, valid_days, create_time, status, use_time, device_id, "
+                "device_id_enc, bind_time, expiry_time, version, updated_at")
+
+# 一起复制的状态变更时间范围（客户端状态检查只看最近 10 秒的变更）
+RECENT_EVENT_SECONDS = 60
+
+
+class Resharder:
+    """把哈希槽在分片之间迁移"""
+
+    def __init__(self, db, batch_size=500, batch_pause=0.2):
+        if not isinstance(db, ShardedStorage):
+            raise ValueError("未配置分片（STORAGE_CONFIG['shards']）")
+        self.db = db
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def status(self):
+        """返回 (每个分片的槽列表, 迁移中的槽 {槽: 目标分片}, 每个分片的卡密数)"""
+        slot_map = self.db.slot_map(refresh=True)
+        slots = [[] for _ in self.db.shards()]
+        moving = {}
+        for slot, (shard, moving_to) in enumerate(slot_map):
+            slots[shard].append(slot)
+            if moving_to is not None:
+                moving[slot] = moving_to
+        return slots, moving, self.db.fan_out(_count_cards)
+
+    def move(self, first, last, target):
+        """把 first..last 号槽移到 target 分片，返回迁移的卡密数"""
+        if not 0 <= first <= last < self.db.slots:
+            raise ValueError(f"槽的范围应在 0-{self.db.slots - 1} 之间")
+        if not 0 <= target < len(self.db.shards()):
+            raise ValueError(f"没有 {target} 号分片")
+        slots = set(range(first, last + 1))
+
+        self._mark_moving(slots, target)
+        self._wait_refresh()
+        moved = self._copy(slots, target)
+        self._update_slots("UPDATE card_shard_slots SET shard = %s, moving_to = NULL WHERE slot = %s",
+                           slots, target)
+        self._wait_refresh()
+        moved += self._copy(slots, target)
+        logger.info(f"{first}-{last} 号槽已迁移到分片 {target}，共 {moved} 个卡密")
+        return moved
+
+    def _mark_moving(self, slots, target):
+        slot_map = self.db.slot_map(refresh=True)
+        for slot in sorted(slots):
+            moving_to = slot_map[slot][1]
+            if moving_to is not None and moving_to != target:
+                raise ValueError(f"{slot} 号槽正在迁移到分片 {moving_to}")
+        pending = {slot for slot in slots if slot_map[slot][0] != target}
+        self._update_slots("UPDATE card_shard_slots SET moving_to = %s WHERE slot = %s", pending, target)
+
+    def _update_slots(self, sql, slots, target):
+        if not slots:
+            return
+        connection = self.db.shards()[0].get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, [(target, slot) for slot in sorted(slots)])
+            connection.commit()
+        finally:
+            connection.close()
+        self.db.slot_map(refresh=True)
+
+    def _wait_refresh(self):
+        """等待所有进程重新读取槽位表"""
+        self._stop_event.wait(self.db.map_refresh + 1)
+
+    def _copy(self, slots, target):
+        moved = 0
+        destination = self.db.shards()[target]
+        for index, source in enumerate(self.db.shards()):
+            if index != target:
+                moved += self._copy_shard(source, destination, slots)
+        return moved
+
+    def _copy_shard(self, source, destination, slots):
+        """按主键分批扫描原分片，迁移属于这些槽的行"""
+        moved = 0
+        last_id = 0
+        while not self._stop_event.is_set():
+            connection = source.get_connection()
+            try:
+                with EncryptedCursor(connection.cursor()) as cursor:
+                    cursor.execute("SELECT id, card_key, card_key_enc FROM card_keys "
+                                   "WHERE id > %s ORDER BY id LIMIT %s", (last_id, self.batch_size))
+                    rows = cursor.fetchall()
+                ids = [row['id'] for row in rows if key_slot(row['card_key'], self.db.slots) in slots]
+                if ids:
+                    moved += self._move_rows(connection, destination, ids)
+            finally:
+                connection.close()
+
+            if len(rows) < self.batch_size:
+                break
+            last_id = rows[-1]['id']
+            if ids:
+                self._stop_event.wait(self.batch_pause)
+        return moved
+
+    def _move_rows(self, connection, destination, ids):
+        """在原分片上锁定这些行，复制到目标分片后删除"""
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute("START TRANSACTION")
+            try:
+                cursor.execute(f"SELECT {MOVE_COLUMNS} FROM card_keys WHERE id IN ({placeholders}) FOR UPDATE",
+                               ids)
+                rows = cursor.fetchall()
+                if not rows:
+                    cursor.execute("ROLLBACK")
+                    return 0
+                card_keys = [row['card_key'] for row in rows]
+                key_placeholders = ', '.join(['%s'] * len(card_keys))
+                cursor.execute(f"""
+                    SELECT card_key, change_type, change_time
+                    FROM card_status_change
+                    WHERE card_key IN ({key_placeholders})
+                      AND change_time > DATE_SUB(NOW(), INTERVAL {RECENT_EVENT_SECONDS} SECOND)
+                    ORDER BY id
+                """, card_keys)
+                # 迁移的卡密仍然存在，删除类事件不复制
+                events = [event for event in cursor.fetchall() if event['change_type'] not in REMOVAL_EVENTS]
+
+                _copy_rows(destination, rows, events)
+                cursor.execute(f"DELETE FROM card_keys WHERE id IN ({placeholders})", ids)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+
+def _copy_rows(destination, rows, events):
+    """写入目标分片并提交（已存在的卡密以目标分片为准）"""
+    columns = [column.strip() for column in MOVE_COLUMNS.split(',')]
+    connection = destination.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT IGNORE INTO card_keys ({MOVE_COLUMNS}) VALUES ({', '.join(['%s'] * len(columns))})",
+                [tuple(row[column] for column in columns) for row in rows])
+            if events:
+                cursor.executemany(
+                    "INSERT INTO card_status_change (card_key, change_type, change_time) VALUES (%s, %s, %s)",
+                    [(event['card_key'], event['change_type'], event['change_time']) for event in events])
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _count_cards(db):
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) AS count FROM card_keys")
+            return cursor.fetchone()['count']
+    finally:
+        connection.close()
+
+
+def _ranges(slots):
+    """[0, 1, 2, 5] -> '0-2, 5'"""
+    ranges = []
+    for slot in slots:
+        if ranges and ranges[-1][1] == slot - 1:
+            ranges[-1][1] = slot
+        else:
+            ranges.append([slot, slot])
+    return ', '.join(str(a) if a == b else f"{a}-{b}" for a, b in ranges) or '-'
+
+
+def main():
+    from utils.storage import get_storage
+
+    parser = argparse.ArgumentParser(description='在线重新分片')
+    parser.add_argument('--status', action='store_true', help='显示槽位分配和各分片的卡密数')
+    parser.add_argument('--slots', help='要迁移的槽，如 0-255')
+    parser.add_argument('--to', type=int, help='目标分片下标')
+    parser.add_argument('--batch', type=int, default=500, help='每批扫描的行数')
+    parser.add_argument('--pause', type=float, default=0.2, help='批次之间暂停(秒)')
+    args = parser.parse_args()
+
+    resharder = Resharder(get_storage(), batch_size=args.batch, batch_pause=args.pause)
+    if args.slots:
+        if args.to is None:
+            parser.error('--slots 需要同时指定 --to')
+        first, _, last = args.slots.partition('-')
+        moved = resharder.move(int(first), int(last or first), args.to)
+        print(f"迁移卡密: {moved}")
+
+    slots, moving, counts = resharder.status()
+    for index, (shard_slots, count) in enumerate(zip(slots, counts)):
+        print(f"分片 {index}: {count} 个卡密，槽 {_ranges(shard_slots)}")
+    for target in sorted(set(moving.values())):
+        print(f"迁移到分片 {target} 中: 槽 {_ranges([slot for slot, to in moving.items() if to == target])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""数据库访问的熔断与重试
+
+CircuitBreaker 连续失败达到阈值后打开，打开期间的调用立即抛出 CircuitOpen，
+不再等待连接超时；reset_timeout 秒后进入半开状态放行一个探测调用，成功则关闭，
+失败则重新打开。call_with_retry 在截止时间内按抖动指数退避重试，只重试熔断器
+认定的连接类错误，截止时间不够下一次重试时立即失败。
+
+同名熔断器在进程内共享（CircuitBreaker.get），界面通过 CircuitBreaker.watch 得知
+状态变化，熔断期间显示降级提示。
+"""
+import time
+import random
+import logging
+import threading
+from utils.metrics import MetricsRegistry
+from config import RESILIENCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """熔断器打开，调用被立即拒绝"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} 暂时不可用，{retry_after:.0f} 秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """在截止时间内没有成功"""
+
+
+class CircuitBreaker:
+    """熔断器：closed -> open -> half_open -> closed"""
+    _breakers = {}
+    _watchers = []
+    _registry_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, name, **options):
+        """取得进程内共享的熔断器，第一次调用时按 RESILIENCE_CONFIG 创建"""
+        with cls._registry_lock:
+            breaker = cls._breakers.get(name)
+            if breaker is None:
+                breaker = cls._breakers[name] = cls(name, **options)
+            return breaker
+
+    @classmethod
+    def watch(cls, listener):
+        """listener(名称, 旧状态, 新状态)，在触发状态变化的线程中调用"""
+        cls._watchers.append(listener)
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None, failure_types=(Exception,)):
+        self.name = name
+        self.failure_threshold = failure_threshold or RESILIENCE_CONFIG['failure_threshold']
+        self.reset_timeout = reset_timeout or RESILIENCE_CONFIG['reset_timeout']
+        self.failure_types = failure_types
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+        MetricsRegistry.get_instance().register_gauges(f"breaker_{name}", self.stats)
+
+    @property
+    def retry_after(self):
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def is_failure(self, error):
+        return isinstance(error, self.failure_types)
+
+    def allow(self):
+        """调用前检查，熔断中抛出 CircuitOpen"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, self.retry_after)
+                transition = self._set_state(HALF_OPEN)
+            else:
+                transition = None
+            # 半开状态只放行一个探测调用
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpen(self.name, self.reset_timeout)
+            self._probing = True
+        self._notify(transition)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            transition = self._set_state(CLOSED) if self.state != CLOSED else None
+        self._notify(transition)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            transition = None
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                if self.state != OPEN:
+                    transition = self._set_state(OPEN)
+        if transition:
+            logger.warning(f"{self.name} 熔断 {self.reset_timeout:g} 秒: {str(error)}")
+        self._notify(transition)
+
+    def call(self, func, *args, **kwargs):
+        """通过熔断器调用一次（不重试）"""
+        self.allow()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure(e)
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        return {
+            'state': _STATE_VALUES[self.state],
+            'failures': self.failures,
+            'rejected': self.rejected
+        }
+
+    def _set_state(self, state):
+        old, self.state = self.state, state
+        return old, state
+
+    def _notify(self, transition):
+        if not transition:
+            return
+        for listener in self._watchers:
+            try:
+                listener(self.name, *transition)
+            except Exception as e:
+                logger.error(f"熔断状态回调失败: {str(e)}")
+
+
+class RetryPolicy:
+    """抖动指数退避：第 n 次重试前等待 [0, min(cap, base * 2^n)] 之间的随机时间"""
+
+    def __init__(self, attempts=None, base=None, cap=None, deadline=None):
+        self.attempts = attempts or RESILIENCE_CONFIG['attempts']
+        self.base = base if base is not None else RESILIENCE_CONFIG['backoff_base']
+        self.cap = cap if cap is not None else RESILIENCE_CONFIG['backoff_cap']
+        self.deadline = deadline if deadline is not None else RESILIENCE_CONFIG['deadline']
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+
+class Deadline:
+    """一次调用的截止时间，用于限制连接/读写超时"""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, default):
+        """不超过剩余时间的超时秒数（驱动要求至少 1 秒）"""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return max(1, min(default, int(remaining + 0.999)))
+
+
+def call_with_retry(func, breaker=None, policy=None, deadline=None, retry_on=None):
+    """在截止时间内按退避策略重试 func(deadline)
+
+    只重试 retry_on 中的错误（默认为 breaker.failure_types），其余错误（如 SQL 错误、
+    业务校验）和 CircuitOpen 直接抛出。熔断打开时立即抛出 CircuitOpen。
+    """
+    if retry_on is None:
+        retry_on = breaker.failure_types if breaker is not None else (Exception,)
+    policy = policy or RetryPolicy()
+    deadline = deadline or Deadline(policy.deadline)
+    for attempt in range(policy.attempts):
+        if breaker is not None:
+            breaker.allow()
+        try:
+            result = func(deadline)
+        except Exception as e:
+            retryable = isinstance(e, retry_on) and not isinstance(e, CircuitOpen)
+            if breaker is not None:
+                if breaker.is_failure(e):
+                    breaker.record_failure(e)
+                else:
+                    breaker.record_success()
+            if not retryable or attempt == policy.attempts - 1:
+                raise
+            delay = policy.backoff(attempt)
+            remaining = deadline.remaining()
+            if remaining is not None and remaining <= delay:
+                raise DeadlineExceeded(f"{policy.deadline:g} 秒内未成功: {str(e)}") from e
+            logger.info(f"第 {attempt + 1} 次调用失败，{delay:.2f} 秒后重试: {str(e)}")
+            time.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
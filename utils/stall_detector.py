@@ -0,0 +1,81 @@
+"""界面线程卡顿检测
+
+界面线程中的定时器定期打点，看门狗线程发现打点停止超过阈值时抓取界面线程
+当前的调用栈写入日志，便于找出在界面线程里做了 I/O 的代码；恢复后记录这次
+卡顿的时长。
+"""
+import sys
+import time
+import logging
+import threading
+import traceback
+from PyQt5.QtCore import QObject, QTimer
+from utils.metrics import MetricsRegistry
+from config import DB_EXECUTOR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class StallDetector(QObject):
+    """检测界面事件循环的卡顿"""
+
+    def __init__(self, threshold=None, interval=0.05, parent=None):
+        super().__init__(parent)
+        self.threshold = DB_EXECUTOR_CONFIG['stall_threshold'] if threshold is None else threshold
+        self.interval = interval
+        self.stalls = []  # [(时长秒, 调用栈)]
+        self.max_lag = 0.0
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._beat)
+        self._last_beat = time.monotonic()
+        self._stack = None
+        self._stop = threading.Event()
+        self._watchdog = None
+        self._ui_thread = threading.get_ident()
+        self._lag = MetricsRegistry.get_instance().histogram('event_loop_lag')
+
+    def start(self):
+        """在界面线程中调用"""
+        self._ui_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._timer.start(int(self.interval * 1000))
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name='stall-detector', daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    @property
+    def max_stall(self):
+        return max((duration for duration, _ in self.stalls), default=0.0)
+
+    def _beat(self):
+        now = time.monotonic()
+        lag = max(0.0, now - self._last_beat - self.interval)
+        self._last_beat = now
+        self.max_lag = max(self.max_lag, lag)
+        self._lag.observe(lag)
+        if lag >= self.threshold:
+            stack, self._stack = self._stack, None
+            self.stalls.append((lag, stack))
+            logger.warning(f"界面线程卡顿 {lag * 1000:.0f}ms")
+
+    def _watch(self):
+        """看门狗线程：打点停止时抓取界面线程的调用栈"""
+        reported = None
+        while not self._stop.wait(self.interval):
+            last_beat = self._last_beat
+            if time.monotonic() - last_beat < self.interval + self.threshold or reported == last_beat:
+                continue
+            reported = last_beat
+            frame = sys._current_frames().get(self._ui_thread)
+            if frame is None:
+                continue
+            self._stack = ''.join(traceback.format_stack(frame))
+            logger.warning(f"界面线程无响应超过 {self.threshold * 1000:.0f}ms，当前调用栈:\n{self._stack}")
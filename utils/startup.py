@@ -0,0 +1,31 @@
+"""启动耗时记录
+
+run.py 最先导入本模块，之后各阶段调用 mark() 记录距启动的毫秒数。
+设置环境变量 EXAM_STARTUP_PROBE=<阶段名> 时，到达该阶段后把所有记录以
+JSON 输出到标准输出并退出程序，供 benchmarks/bench_startup.py 测量。
+"""
+import os
+import sys
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_started_at = time.perf_counter()
+marks = {}
+
+
+def mark(name):
+    """记录一个启动阶段"""
+    if name in marks:
+        return
+    marks[name] = round((time.perf_counter() - _started_at) * 1000, 1)
+    logger.info(f"启动阶段 {name}: {marks[name]}ms")
+
+    if os.environ.get('EXAM_STARTUP_PROBE') == name:
+        sys.stdout.write(json.dumps(marks) + '\n')
+        sys.stdout.flush()
+        from PyQt5.QtCore import QTimer
+        from PyQt5.QtWidgets import QApplication
+        QTimer.singleShot(0, QApplication.instance().quit)
@@ -0,0 +1,790 @@
+"""存储后端
+
+客户端、管理端和后台任务通过同一个接口访问数据库:
+    get_connection(deadline=None, **overrides)  取得连接（调用方负责关闭）
+    tuple_cursor(connection)                    元组行游标（客户端查询使用）
+    reader()                                    只读查询使用的后端
+    shard(card_key) / shards()                  卡密所在分片 / 全部分片
+    fan_out(func, *args) / group(items)         在各分片上并行执行 / 按分片分组
+    name / DB_CONFIG / CONNECTION_ERRORS / stats()
+
+- MySQLStorage: pymysql，每次调用新建连接，connection.cursor() 返回字典行（管理端、后台任务）
+- MySQLPoolStorage: mysql.connector + PooledDB 连接池（客户端）
+- SQLiteStorage: 单机部署，WAL 模式，无需数据库服务
+- ReplicatedStorage: 主库 + 只读副本，reader() 返回的后端把读取路由到副本
+- ShardedStorage: 按卡密哈希槽分片，单个卡密只访问一个分片，列表和统计扇出到所有分片
+
+代码中的 SQL 统一按 MySQL 写法书写，SQLiteDialect 在执行前转换日期运算、
+INSERT IGNORE 等差异。驱动在创建后端时才导入，不拖慢客户端启动。
+"""
+import os
+import re
+import zlib
+import time
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.db_stats import instrument
+from utils.db_crypto import DatabaseCrypto
+from utils.metrics import MetricsRegistry
+from utils.resilience import CircuitBreaker, CircuitOpen, call_with_retry
+from config import DB_CONFIG, STORAGE_CONFIG, RESILIENCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# MySQL 驱动只接受的连接参数
+_MYSQL_KEYS = ('host', 'port', 'user', 'password', 'database', 'charset')
+
+
+def pool_stats(pool):
+    """读取 PooledDB 连接池的使用情况"""
+    in_use = getattr(pool, '_connections', 0)
+    max_connections = getattr(pool, '_maxconnections', 0) or 0
+    return {
+        'in_use': in_use,
+        'idle': len(getattr(pool, '_idle_cache', ())),
+        'max_connections': max_connections,
+        'utilization': in_use / max_connections if max_connections else 0.0
+    }
+
+
+# ---- 方言 ----
+
+class Dialect:
+    """MySQL 写法，原样执行"""
+    name = 'mysql'
+
+    def translate(self, sql):
+        return sql
+
+
+def parse_time(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(value if isinstance(value, str) else value.decode())
+
+
+def _now():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def _add(value, **delta):
+    value = parse_time(value)
+    return None if value is None else str(value + datetime.timedelta(**delta))
+
+
+def _datediff(a, b):
+    a, b = parse_time(a), parse_time(b)
+    return None if a is None or b is None else (a.date() - b.date()).days
+
+
+# GET_LOCK/RELEASE_LOCK 在进程内实现（单机部署只有一个管理端进程）
+_named_locks = {}
+_named_locks_guard = threading.Lock()
+
+
+def _get_lock(name, timeout):
+    with _named_locks_guard:
+        lock = _named_locks.setdefault(name, threading.Lock())
+    if not timeout:
+        return int(lock.acquire(False))
+    return int(lock.acquire(timeout=timeout if timeout > 0 else -1))
+
+
+def _release_lock(name):
+    lock = _named_locks.get(name)
+    if lock is None or not lock.locked():
+        return None
+    lock.release()
+    return 1
+
+
+class SQLiteDialect(Dialect):
+    """把 MySQL 写法转换为 SQLite 写法，日期函数用 Python 实现"""
+    name = 'sqlite'
+
+    TRANSLATIONS = [
+        (re.compile(r"SELECT COUNT\(\*\) as table_exists\s+FROM information_schema\.tables.*",
+                    re.IGNORECASE | re.DOTALL),
+         "SELECT COUNT(*) AS table_exists FROM sqlite_master "
+         "WHERE type = 'table' AND name = 'card_keys' AND %s IS NOT NULL"),
+        # 立即取得写锁，代替 SELECT ... FOR UPDATE 的行锁
+        (re.compile(r"\bSTART TRANSACTION\b", re.IGNORECASE), "BEGIN IMMEDIATE"),
+        (re.compile(r"\bINSERT IGNORE\b", re.IGNORECASE), "INSERT OR IGNORE"),
+        (re.compile(r"\bFOR UPDATE\b", re.IGNORECASE), ""),
+        (re.compile(r"\bTRUNCATE TABLE\b", re.IGNORECASE), "DELETE FROM"),
+        # UPDATE ... ORDER BY ... LIMIT 改为按 id 子查询
+        (re.compile(r"\bUPDATE\s+(\w+)\s+(SET\s.+?)\s+WHERE\s(.+?)\s+ORDER BY\s(.+?)\s+LIMIT\s+(\S+)",
+                    re.IGNORECASE | re.DOTALL),
+         r"UPDATE \1 \2 WHERE id IN (SELECT id FROM \1 WHERE \3 ORDER BY \4 LIMIT \5)"),
+        # 读取的服务器时间需要转换回 datetime
+        (re.compile(r"\bNOW\(\d*\) as now\b", re.IGNORECASE), 'NOW() AS "now [timestamp]"'),
+        (re.compile(r"\bNOW\(\d*\)", re.IGNORECASE), "NOW()"),
+        (re.compile(r"\bNOW\(\)\s*-\s*INTERVAL\s+(\S+)\s+DAY\b", re.IGNORECASE), r"ADD_DAYS(NOW(), -\1)"),
+        (re.compile(r"\bDATE_ADD\((.+?),\s*INTERVAL\s+(\S+)\s+DAY\)", re.IGNORECASE), r"ADD_DAYS(\1, \2)"),
+        (re.compile(r"\bDATE_SUB\((.+?),\s*INTERVAL\s+(\S+)\s+SECOND\)", re.IGNORECASE), r"ADD_SECONDS(\1, -\2)"),
+        (re.compile(r"%s"), "?"),
+    ]
+
+    def __init__(self):
+        self._translated = {}
+
+    def translate(self, sql):
+        result = self._translated.get(sql)
+        if result is None:
+            result = sql
+            for pattern, replacement in self.TRANSLATIONS:
+                result = pattern.sub(replacement, result)
+            self._translated[sql] = result
+        return result
+
+    def install(self, connection):
+        """在连接上注册 MySQL 的日期和锁函数"""
+        connection.create_function('NOW', 0, _now)
+        connection.create_function('ADD_DAYS', 2, lambda value, days: _add(value, days=days))
+        connection.create_function('ADD_SECONDS', 2, lambda value, seconds: _add(value, seconds=seconds))
+        connection.create_function('DATEDIFF', 2, _datediff)
+        connection.create_function('GET_LOCK', 2, _get_lock)
+        connection.create_function('RELEASE_LOCK', 1, _release_lock)
+
+
+# ---- 后端 ----
+
+class Storage:
+    """存储后端的公共部分"""
+    name = None
+    CONNECTION_ERRORS = ()
+
+    def reader(self):
+        """只读查询（报表、全量刷新、同步）使用的后端，没有副本时就是自身"""
+        return self
+
+    def shard(self, card_key):
+        """卡密所在分片的后端，未分片时就是自身"""
+        return self
+
+    def shards(self):
+        """全部分片的后端，未分片时只有自身"""
+        return [self]
+
+    def is_moving(self, card_key):
+        """卡密所在的槽是否正在重新分片（此时查不到卡密可能只是刚被迁走）"""
+        return False
+
+    def reroute(self, card_key, queried):
+        """在分片 queried 上查不到卡密时调用，返回应再查一次的分片；返回 None 时卡密确实
+        不在 queried 所属的位置上"""
+        return None
+
+    def fan_out(self, func, *args):
+        """对每个分片调用 func(分片, *参数)，args 中每项按分片顺序排列，返回按分片排列的结果"""
+        return [func(shard, *values) for shard, *values in zip(self.shards(), *args)]
+
+    def group(self, items, key=None):
+        """按所在分片分组，返回 [(分片, 项目列表)]；key(项目) 返回卡密，缺省时项目即卡密"""
+        items = list(items)
+        return [(self, items)] if items else []
+
+    def stats(self):
+        return {}
+
+
+class MySQLStorage(Storage):
+    """MySQL（pymysql），每次调用新建连接"""
+    name = 'mysql'
+
+    def __init__(self, config=None, breaker_name='mysql'):
+        import pymysql
+
+        self.DB_CONFIG = {key: value for key, value in (config or DB_CONFIG).items() if key in _MYSQL_KEYS}
+        self.dialect = Dialect()
+        # 连接类错误计入熔断，SQL 错误不计入
+        self.CONNECTION_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError, OSError)
+        self.breaker = CircuitBreaker.get(breaker_name, failure_types=self.CONNECTION_ERRORS)
+
+    def get_connection(self, deadline=None, **overrides):
+        """获取数据库连接（overrides 用于覆盖个别连接参数，如 local_infile）
+
+        连接失败时按退避策略重试；熔断期间立即抛出 CircuitOpen。传入 deadline 时
+        连接的读写超时也不超过剩余时间。
+        """
+        import pymysql.cursors
+
+        def connect(connect_deadline):
+            config = dict(self.DB_CONFIG, **overrides)
+            config['connect_timeout'] = connect_deadline.timeout(RESILIENCE_CONFIG['connect_timeout'])
+            if deadline is not None:
+                config['read_timeout'] = config['write_timeout'] = deadline.timeout(RESILIENCE_CONFIG['deadline'])
+            conn = pymysql.connect(
+                cursorclass=pymysql.cursors.DictCursor,
+                **config
+            )
+            return instrument(conn)
+        return call_with_retry(connect, breaker=self.breaker, deadline=deadline)
+
+    def tuple_cursor(self, connection):
+        import pymysql.cursors
+        return connection.cursor(pymysql.cursors.Cursor)
+
+
+class MySQLPoolStorage(Storage):
+    """MySQL（mysql.connector + PooledDB 连接池），connection.cursor() 返回元组行"""
+    name = 'mysql'
+
+    def __init__(self, config=None, breaker_name='mysql'):
+        import mysql.connector
+        from dbutils.pooled_db import PooledDB
+
+        self.DB_CONFIG = {key: value for key, value in (config or DB_CONFIG).items() if key in _MYSQL_KEYS}
+        self.dialect = Dialect()
+        self.CONNECTION_ERRORS = (
+            mysql.connector.errors.InterfaceError,
+            mysql.connector.errors.OperationalError,
+            OSError
+        )
+        self.breaker = CircuitBreaker.get(breaker_name, failure_types=self.CONNECTION_ERRORS)
+
+        def create_pool(deadline):
+            return PooledDB(
+                creator=mysql.connector,
+                maxconnections=20,
+                mincached=2,
+                maxcached=5,
+                blocking=True,
+                maxusage=None,
+                ping=1,
+                auth_plugin='mysql_native_password',
+                use_pure=True,
+                # mysql.connector 的该超时同时作用于之后的每次读写
+                connection_timeout=deadline.timeout(RESILIENCE_CONFIG['connect_timeout']),
+                pool_reset_session=True,
+                **self.DB_CONFIG
+            )
+
+        try:
+            self._pool = call_with_retry(create_pool, breaker=self.breaker)
+            logger.info("数据库连接成功")
+        except Exception as e:
+            logger.error(f"初始化连接池失败: {str(e)}")
+            raise
+
+    def get_connection(self, deadline=None, **overrides):
+        """从连接池获取连接（熔断期间立即抛出 CircuitOpen）"""
+        try:
+            return instrument(self.breaker.call(self._pool.connection))
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            logger.error(f"获取数据库连接失败: {str(e)}")
+            raise
+
+    def tuple_cursor(self, connection):
+        return connection.cursor()
+
+    def stats(self):
+        """连接池使用情况"""
+        return pool_stats(self._pool)
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS card_keys (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    card_key VARCHAR(32) NOT NULL UNIQUE,
+    card_key_enc BLOB NULL,
+    valid_days INT NOT NULL,
+    create_time DATETIME NOT NULL,
+    status TINYINT NOT NULL DEFAULT 0,
+    use_time DATETIME NULL,
+    device_id VARCHAR(64) NULL,
+    device_id_enc BLOB NULL,
+    bind_time DATETIME NULL,
+    expiry_time DATETIME NULL,
+    version INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_updated_at ON card_keys (updated_at);
+CREATE INDEX IF NOT EXISTS idx_status_expiry ON card_keys (status, expiry_time);
+CREATE INDEX IF NOT EXISTS idx_create_time ON card_keys (create_time);
+
+CREATE TABLE IF NOT EXISTS card_keys_archive (
+    id INTEGER PRIMARY KEY,
+    card_key VARCHAR(32) NOT NULL,
+    card_key_enc BLOB NULL,
+    valid_days INT NOT NULL,
+    create_time DATETIME NOT NULL,
+    status TINYINT NOT NULL,
+    use_time DATETIME NULL,
+    device_id VARCHAR(64) NULL,
+    device_id_enc BLOB NULL,
+    bind_time DATETIME NULL,
+    expiry_time DATETIME NULL,
+    archived_at DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archive_card_key ON card_keys_archive (card_key);
+
+CREATE TABLE IF NOT EXISTS card_status_change (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    card_key VARCHAR(32) NOT NULL,
+    change_type VARCHAR(20) NOT NULL,
+    change_time DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_change_card_key ON card_status_change (card_key);
+
+CREATE TABLE IF NOT EXISTS card_shard_slots (
+    slot INTEGER PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    moving_to INTEGER NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS card_keys_version AFTER UPDATE ON card_keys
+FOR EACH ROW WHEN NEW.version = OLD.version
+BEGIN
+    UPDATE card_keys
+    SET version = OLD.version + 1,
+        updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+    WHERE id = NEW.id;
+END;
+"""
+
+
+class _SQLiteCursor:
+    def __init__(self, cursor, dialect, dict_rows):
+        self._cursor = cursor
+        self._dialect = dialect
+        if dict_rows:
+            cursor.row_factory = lambda cur, row: {
+                column[0]: value for column, value in zip(cur.description, row)
+            }
+
+    # 与 pymysql 一样返回影响的行数
+    def execute(self, query, args=None):
+        return self._cursor.execute(self._dialect.translate(query), args or ()).rowcount
+
+    def executemany(self, query, args):
+        return self._cursor.executemany(self._dialect.translate(query), args).rowcount
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _SQLiteConnection:
+    def __init__(self, connection, dialect):
+        self._connection = connection
+        self._dialect = dialect
+
+    def cursor(self, dict_rows=True):
+        return _SQLiteCursor(self._connection.cursor(), self._dialect, dict_rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._connection.close()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+_sqlite_types_registered = False
+
+
+def _register_sqlite_types(sqlite3):
+    global _sqlite_types_registered
+    if not _sqlite_types_registered:
+        sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+        sqlite3.register_converter('DATETIME', parse_time)
+        sqlite3.register_converter('TIMESTAMP', parse_time)
+        _sqlite_types_registered = True
+
+
+class SQLiteStorage(Storage):
+    """单机部署的 SQLite，每次调用新建连接（开销为微秒级），WAL 模式下读写互不阻塞"""
+    name = 'sqlite'
+    # 本地文件没有网络故障，不重试也不熔断；锁等待由 busy_timeout 处理
+    CONNECTION_ERRORS = ()
+
+    def __init__(self, path=None, pragmas=None):
+        import sqlite3
+
+        _register_sqlite_types(sqlite3)
+        self._sqlite3 = sqlite3
+        self.path = path or STORAGE_CONFIG['sqlite_path']
+        self.pragmas = STORAGE_CONFIG['sqlite_pragmas'] if pragmas is None else pragmas
+        self.DB_CONFIG = {'database': os.path.basename(self.path)}
+        self.dialect = SQLiteDialect()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self.get_connection() as connection:
+            # journal_mode 写入数据库文件，只需设置一次
+            connection.execute(f"PRAGMA journal_mode = {self.pragmas.get('journal_mode', 'WAL')}")
+            connection.executescript(SQLITE_SCHEMA)
+
+    def get_connection(self, deadline=None, **overrides):
+        sqlite3 = self._sqlite3
+        busy_timeout = self.pragmas.get('busy_timeout', 5000) / 1000
+        if deadline is not None:
+            busy_timeout = min(busy_timeout, deadline.remaining())
+        connection = sqlite3.connect(self.path, timeout=busy_timeout,
+                                     detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                                     check_same_thread=False)
+        for name, value in self.pragmas.items():
+            if name not in ('journal_mode', 'busy_timeout'):
+                connection.execute(f"PRAGMA {name} = {value}")
+        self.dialect.install(connection)
+        return instrument(_SQLiteConnection(connection, self.dialect))
+
+    def tuple_cursor(self, connection):
+        return connection.cursor(dict_rows=False)
+
+
+class _WriteTracker:
+    """主库连接包装：提交时记录时间，之后一段时间内的读取仍走主库"""
+
+    def __init__(self, connection, on_commit):
+        self._connection = connection
+        self._on_commit = on_commit
+
+    def commit(self):
+        self._connection.commit()
+        self._on_commit()
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class _ReplicaReader(Storage):
+    """ReplicatedStorage.reader()：get_connection 返回副本连接"""
+
+    def __init__(self, replicated):
+        self._replicated = replicated
+        self.name = replicated.name
+        self.DB_CONFIG = replicated.DB_CONFIG
+        self.dialect = replicated.dialect
+        self.CONNECTION_ERRORS = replicated.CONNECTION_ERRORS
+
+    def get_connection(self, deadline=None, **overrides):
+        return self._replicated.read_connection(deadline, **overrides)
+
+    def tuple_cursor(self, connection):
+        return self._replicated.primary.tuple_cursor(connection)
+
+    def stats(self):
+        return self._replicated.stats()
+
+
+class ReplicatedStorage(Storage):
+    """主库 + 只读副本
+
+    get_connection() 始终返回主库连接（写入、SELECT ... FOR UPDATE）；reader() 的
+    get_connection() 轮流使用延迟不超过 max_lag 秒的副本，没有可用副本时退回主库。
+    主库连接提交后 sticky_seconds 秒内的读取也走主库，保证管理端读到自己刚写入的数据。
+
+    副本延迟按主库与副本 MAX(updated_at) 的差估算（MySQL 复制和两个 SQLite 文件
+    都适用），每 lag_check_interval 秒在读取线程中刷新一次。
+    """
+
+    def __init__(self, primary, replicas, max_lag=None, sticky_seconds=None, lag_check_interval=None):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.name = primary.name
+        self.DB_CONFIG = primary.DB_CONFIG
+        self.dialect = primary.dialect
+        self.CONNECTION_ERRORS = primary.CONNECTION_ERRORS
+        self.max_lag = STORAGE_CONFIG['max_replica_lag'] if max_lag is None else max_lag
+        self.sticky_seconds = STORAGE_CONFIG['sticky_seconds'] if sticky_seconds is None else sticky_seconds
+        self.lag_check_interval = (STORAGE_CONFIG['lag_check_interval']
+                                   if lag_check_interval is None else lag_check_interval)
+
+        self.lags = [None] * len(self.replicas)  # 秒，None 表示未检查，inf 表示不可用
+        self._last_write = 0.0
+        self._lag_checked = 0.0
+        self._next = 0
+        self._lock = threading.Lock()
+        self._reader = _ReplicaReader(self)
+
+        registry = MetricsRegistry.get_instance()
+        self._replica_reads = registry.counter('db_reads_replica')
+        self._primary_reads = registry.counter('db_reads_primary')
+        registry.register_gauges('replicas', self.stats)
+
+    def get_connection(self, deadline=None, **overrides):
+        return _WriteTracker(self.primary.get_connection(deadline, **overrides), self._mark_write)
+
+    def tuple_cursor(self, connection):
+        return self.primary.tuple_cursor(connection)
+
+    def reader(self):
+        return self._reader
+
+    def read_connection(self, deadline=None, **overrides):
+        """只读连接：优先使用延迟合格的副本"""
+        if time.monotonic() - self._last_write >= self.sticky_seconds:
+            for index in self._candidates():
+                try:
+                    connection = self.replicas[index].get_connection(deadline, **overrides)
+                except Exception as e:
+                    logger.warning(f"只读副本 {index} 不可用，改用其他副本或主库: {str(e)}")
+                    self.lags[index] = float('inf')
+                    continue
+                self._replica_reads.inc()
+                return connection
+        self._primary_reads.inc()
+        return self.primary.get_connection(deadline, **overrides)
+
+    def stats(self):
+        stats = {'sticky': int(time.monotonic() - self._last_write < self.sticky_seconds)}
+        for index, lag in enumerate(self.lags):
+            stats[f"lag_{index}"] = -1 if lag is None or lag == float('inf') else lag
+        return stats
+
+    def _mark_write(self):
+        self._last_write = time.monotonic()
+
+    def _candidates(self):
+        """延迟合格的副本下标，从上次之后的一个开始轮流"""
+        with self._lock:
+            if time.monotonic() - self._lag_checked >= self.lag_check_interval:
+                self._lag_checked = time.monotonic()
+                self.lags = [self._measure_lag(replica) for replica in self.replicas]
+            start, self._next = self._next, self._next + 1
+        count = len(self.replicas)
+        return [index for index in ((start + n) % count for n in range(count))
+                if self.lags[index] is not None and self.lags[index] <= self.max_lag]
+
+    def _measure_lag(self, replica):
+        try:
+            latest = _last_update(self.primary)
+            applied = _last_update(replica)
+        except Exception as e:
+            logger.warning(f"检查副本延迟失败: {str(e)}")
+            return float('inf')
+        if latest is None:
+            return 0.0
+        if applied is None:
+            return float('inf')
+        return max(0.0, (latest - applied).total_seconds())
+
+
+def _last_update(storage):
+    connection = storage.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT MAX(updated_at) AS last_update FROM card_keys")
+            return parse_time(cursor.fetchone()['last_update'])
+    finally:
+        connection.close()
+
+
+def key_slot(card_key, slots=None):
+    """卡密所在的哈希槽，与 MySQL 的 CRC32(card_key) % slots 相同"""
+    return zlib.crc32(card_key.encode('utf-8')) % (slots or STORAGE_CONFIG['slots'])
+
+
+def _has_card(storage, card_key):
+    connection = storage.get_connection()
+    try:
+        cursor = storage.tuple_cursor(connection)
+        try:
+            cursor.execute("SELECT 1 FROM card_keys WHERE card_key = %s",
+                           (DatabaseCrypto.get_instance().card_key(card_key),))
+            return cursor.fetchone() is not None
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+
+class ShardedStorage(Storage):
+    """按卡密哈希槽分片
+
+    卡密按 CRC32 分到 slots 个哈希槽，槽位表 card_shard_slots（在第一个分片上）记录
+    每个槽所在的分片，首次使用时按连续区间平均分配。验证、状态检查和修改通过
+    shard(card_key) 只访问一个分片；列表、统计等通过 fan_out() 在各分片上并行执行，
+    由调用方合并结果。没有单一连接，get_connection() 不可用。
+
+    重新分片（utils/reshard.py）期间槽位带有迁移目标：已复制到目标分片的卡密以目标
+    分片为准，其余仍在原分片。槽位表每 map_refresh 秒重新读取一次。查不到卡密时
+    调用方先用 reroute() 确认它没有刚被迁走，再报告卡密不存在。
+    """
+
+    def __init__(self, shards, slots=None, map_refresh=None):
+        self._shards = list(shards)
+        self.slots = slots or STORAGE_CONFIG['slots']
+        self.map_refresh = STORAGE_CONFIG['slot_map_refresh'] if map_refresh is None else map_refresh
+        first = self._shards[0]
+        self.name = first.name
+        self.DB_CONFIG = first.DB_CONFIG
+        self.dialect = first.dialect
+        self.CONNECTION_ERRORS = first.CONNECTION_ERRORS
+
+        self._slot_map = None  # 槽 -> (分片下标, 迁移目标下标或 None)
+        self._map_loaded = 0.0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=len(self._shards), thread_name_prefix='shard')
+        self.slot_map()
+
+        registry = MetricsRegistry.get_instance()
+        self._probes = registry.counter('db_shard_probes')
+        registry.register_gauges('shards', self.stats)
+
+    def get_connection(self, deadline=None, **overrides):
+        raise TypeError("分片存储没有单一连接，请通过 shard(card_key) 或 fan_out() 访问")
+
+    def tuple_cursor(self, connection):
+        return self._shards[0].tuple_cursor(connection)
+
+    def shards(self):
+        return list(self._shards)
+
+    def shard(self, card_key):
+        return self._shards[self.shard_index(card_key)]
+
+    def shard_index(self, card_key):
+        """卡密所在分片的下标"""
+        shard, moving_to = self.slot_map()[key_slot(card_key, self.slots)]
+        if moving_to is not None:
+            self._probes.inc()
+            if _has_card(self._shards[moving_to], card_key):
+                return moving_to
+        return shard
+
+    def is_moving(self, card_key):
+        return self.slot_map()[key_slot(card_key, self.slots)][1] is not None
+
+    def reroute(self, card_key, queried):
+        """卡密可能在查找之后、查询之前被迁到目标分片：槽正在迁移时重新读取槽位表，
+        重新解析出的分片与查过的不同时返回该分片"""
+        if self.is_moving(card_key):
+            self.slot_map(refresh=True)
+        shard = self.shard(card_key)
+        return None if shard is queried else shard
+
+    def fan_out(self, func, *args):
+        return list(self._pool.map(func, self._shards, *args))
+
+    def group(self, items, key=None):
+        groups = {}
+        for item in items:
+            index = self.shard_index(key(item) if key else item)
+            groups.setdefault(index, []).append(item)
+        return [(self._shards[index], groups[index]) for index in sorted(groups)]
+
+    def slot_map(self, refresh=False):
+        """槽位表（超过 map_refresh 秒时重新读取，读取失败时继续使用旧表）"""
+        with self._lock:
+            if refresh or self._slot_map is None or time.monotonic() - self._map_loaded >= self.map_refresh:
+                try:
+                    self._slot_map = self._read_slot_map()
+                except Exception as e:
+                    if self._slot_map is None:
+                        raise
+                    logger.warning(f"读取槽位表失败，继续使用旧表: {str(e)}")
+                self._map_loaded = time.monotonic()
+            return self._slot_map
+
+    def stats(self):
+        slot_map = self._slot_map or []
+        stats = {'moving_slots': sum(moving_to is not None for _, moving_to in slot_map)}
+        for index, storage in enumerate(self._shards):
+            stats[f"slots_{index}"] = sum(shard == index for shard, _ in slot_map)
+            for key, value in storage.stats().items():
+                stats[f"shard_{index}_{key}"] = value
+        return stats
+
+    def _read_slot_map(self):
+        storage = self._shards[0]
+        connection = storage.get_connection()
+        try:
+            cursor = storage.tuple_cursor(connection)
+            try:
+                cursor.execute("SELECT slot, shard, moving_to FROM card_shard_slots")
+                rows = cursor.fetchall()
+                if len(rows) < self.slots:
+                    # 首次使用：按连续区间平均分配，之后只由重新分片修改
+                    count = len(self._shards)
+                    cursor.executemany(
+                        "INSERT IGNORE INTO card_shard_slots (slot, shard) VALUES (%s, %s)",
+                        [(slot, slot * count // self.slots) for slot in range(self.slots)])
+                    connection.commit()
+                    cursor.execute("SELECT slot, shard, moving_to FROM card_shard_slots")
+                    rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        finally:
+            connection.close()
+
+        slot_map = [None] * self.slots
+        for slot, shard, moving_to in rows:
+            if slot >= self.slots:
+                raise ValueError(f"槽位表有 {slot} 号槽，与配置的 {self.slots} 个槽不一致")
+            if shard >= len(self._shards) or (moving_to is not None and moving_to >= len(self._shards)):
+                raise ValueError(f"{slot} 号槽分配给了未配置的分片")
+            slot_map[slot] = (shard, moving_to)
+        return slot_map
+
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage(pooled=False):
+    """按 STORAGE_CONFIG 返回进程内共享的存储后端
+
+    pooled=True 时 MySQL 使用连接池（客户端）；SQLite 不区分。创建失败（如数据库
+    不可用）时不缓存，下次调用重试。
+    """
+    backend = STORAGE_CONFIG['backend']
+    if backend not in ('mysql', 'sqlite'):
+        raise ValueError(f"未知的存储后端: {backend}")
+    key = (backend, pooled and backend == 'mysql')
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is None:
+            shards = STORAGE_CONFIG['shards']
+            if shards:
+                storage = ShardedStorage([_open_shard(backend, index, shard, pooled)
+                                          for index, shard in enumerate(shards)])
+            elif backend == 'sqlite':
+                storage = SQLiteStorage()
+            elif pooled:
+                storage = MySQLPoolStorage()
+            else:
+                storage = MySQLStorage()
+            # 客户端激活和状态检查需要最新数据，只有管理端读取使用副本
+            replicas = STORAGE_CONFIG['replicas']
+            if replicas and not pooled and not shards:
+                storage = ReplicatedStorage(storage, [_open_replica(backend, index, replica)
+                                                      for index, replica in enumerate(replicas)])
+            _storages[key] = storage
+        return storage
+
+
+def _open_replica(backend, index, replica):
+    """副本配置：MySQL 为覆盖 DB_CONFIG 的字典，SQLite 为文件路径"""
+    if backend == 'sqlite':
+        return SQLiteStorage(replica)
+    return MySQLStorage(dict(DB_CONFIG, **replica), breaker_name=f"mysql_replica_{index}")
+
+
+def _open_shard(backend, index, shard, pooled):
+    """分片配置与副本相同：MySQL 为覆盖 DB_CONFIG 的字典，SQLite 为文件路径"""
+    if backend == 'sqlite':
+        return SQLiteStorage(shard)
+    storage_class = MySQLPoolStorage if pooled else MySQLStorage
+    return storage_class(dict(DB_CONFIG, **shard), breaker_name=f"mysql_shard_{index}")
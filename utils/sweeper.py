@@ -0,0 +1,172 @@
+"""过期卡密清理模块
+
+后台定时把已过期的卡密标记为过期(status = 2)，并把过期较久的卡密分批
+移入 card_keys_archive。每批单独提交，批次之间暂停，避免长时间持有行锁。
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# card_keys.status 取值
+STATUS_UNUSED = 0
+STATUS_USED = 1
+STATUS_EXPIRED = 2
+
+ARCHIVE_COLUMNS = ("id, card_key, card_key_enc, valid_days, create_time, status, use_time, "
+                   "device_id, device_id_enc, bind_time, expiry_time")
+
+
+class ExpirySweeper:
+    """过期卡密清理器"""
+
+    # 多个管理端同时运行时只允许一个清理器工作
+    LOCK_NAME = 'card_keys_sweeper'
+
+    def __init__(self, db, interval=3600, batch_size=1000, batch_pause=0.5,
+                 archive_after_days=30, on_change=None):
+        self.db = db
+        self.on_change = on_change  # 有卡密被修改/归档时回调
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.archive_after_days = archive_after_days
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, db, config, on_change=None):
+        """按 SWEEPER_CONFIG 创建；enabled 由调用方判断，拼错的配置项直接报错"""
+        options = dict(config)
+        options.pop('enabled', None)
+        return cls(db, on_change=on_change, **options)
+
+    def start(self):
+        """启动后台清理线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='ExpirySweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止后台清理线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"过期卡密清理失败: {str(e)}")
+            self._stop_event.wait(self.interval)
+
+    def run_once(self):
+        """执行一轮清理，返回 (标记过期数, 归档数)；分片部署时依次清理各分片"""
+        expired = archived = 0
+        for shard in self.db.shards():
+            shard_expired, shard_archived = self._sweep_shard(shard)
+            expired += shard_expired
+            archived += shard_archived
+
+        if expired or archived:
+            logger.info(f"过期卡密清理完成: 标记过期 {expired}，归档 {archived}")
+            if self.on_change:
+                self.on_change()
+        return expired, archived
+
+    def _sweep_shard(self, db):
+        connection = db.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, 0) AS locked", (self.LOCK_NAME,))
+                if not cursor.fetchone()['locked']:
+                    return 0, 0
+            try:
+                return self._mark_expired(connection), self._archive_expired(connection)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (self.LOCK_NAME,))
+        finally:
+            connection.close()
+
+    def _mark_expired(self, connection):
+        """分批把已过期的卡密标记为过期"""
+        total = 0
+        while not self._stop_event.is_set():
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE card_keys
+                    SET status = %s
+                    WHERE status IN (%s, %s) AND expiry_time < NOW()
+                    ORDER BY expiry_time
+                    LIMIT %s
+                """, (STATUS_EXPIRED, STATUS_UNUSED, STATUS_USED, self.batch_size))
+                count = cursor.rowcount
+            connection.commit()
+
+            total += count
+            if count < self.batch_size:
+                break
+            self._stop_event.wait(self.batch_pause)
+        return total
+
+    def _archive_expired(self, connection):
+        """分批把过期超过 archive_after_days 天的卡密移入归档表"""
+        total = 0
+        while not self._stop_event.is_set():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT id FROM card_keys
+                        WHERE status = %s
+                          AND expiry_time < NOW() - INTERVAL %s DAY
+                        ORDER BY expiry_time
+                        LIMIT %s
+                        FOR UPDATE
+                    """, (STATUS_EXPIRED, self.archive_after_days, self.batch_size))
+                    ids = [row['id'] for row in cursor.fetchall()]
+                    if not ids:
+                        connection.commit()
+                        break
+
+                    placeholders = ', '.join(['%s'] * len(ids))
+                    cursor.execute(f"""
+                        INSERT IGNORE INTO card_keys_archive
+                        ({ARCHIVE_COLUMNS}, archived_at)
+                        SELECT {ARCHIVE_COLUMNS}, NOW()
+                        FROM card_keys WHERE id IN ({placeholders})
+                    """, ids)
+                    # 通知管理端这些卡密已移出主表
+                    cursor.execute(f"""
+                        INSERT INTO card_status_change (card_key, change_type, change_time)
+                        SELECT card_key, 'archive', NOW()
+                        FROM card_keys WHERE id IN ({placeholders})
+                    """, ids)
+                    cursor.execute(f"DELETE FROM card_keys WHERE id IN ({placeholders})", ids)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+
+            total += len(ids)
+            if len(ids) < self.batch_size:
+                break
+            self._stop_event.wait(self.batch_pause)
+        return total
+
+
+def main():
+    """单独运行一轮清理（可配合计划任务使用）"""
+    from utils.storage import get_storage
+    from config import SWEEPER_CONFIG
+
+    expired, archived = ExpirySweeper.from_config(get_storage(), SWEEPER_CONFIG).run_once()
+    print(f"标记过期: {expired}，归档: {archived}")
+
+
+if __name__ == '__main__':
+    main()